@@ -1,20 +1,53 @@
-import streamlit as st
 import os
-import asyncio
-import tempfile
+import sys
+import time
+
+# Streamlit re-executes this script on every interaction; the first run in a
+# process is the cold start that pays for importing the pipeline modules
+_RUN_STARTED = time.perf_counter()
+_COLD_START = "jobs" not in sys.modules
+
+import streamlit as st
+import streamlit.components.v1 as components
 from dotenv import load_dotenv
 
-# Import our modules
-import utils
+# Import our modules (heavy libraries like moviepy and google.generativeai
+# are only loaded when their pipeline phase runs)
 import llm_engine
 import media_gen
+import media_server
+import metrics
+import jobs
 import video_editor
 
+IMPORT_SECONDS = time.perf_counter() - _RUN_STARTED
+
 # Load environment variables
 load_dotenv()
 
 import random
 
+# Seconds between status refreshes while a job is running
+JOB_POLL_INTERVAL = 2
+
+# Plays the HLS playlist of a job that is still rendering (hls.js; Safari plays HLS natively)
+HLS_PLAYER_HTML = """
+<video id="player" controls playsinline style="width: 100%; max-height: 480px; background: #000;"></video>
+<script src="https://cdn.jsdelivr.net/npm/hls.js@1"></script>
+<script>
+  const video = document.getElementById("player");
+  const source = "{source}";
+  if (window.Hls && Hls.isSupported()) {{
+    // The playlist grows while rendering; start from the first scene, not the live edge
+    const hls = new Hls({{startPosition: 0}});
+    hls.loadSource(source);
+    hls.attachMedia(video);
+  }} else if (video.canPlayType("application/vnd.apple.mpegurl")) {{
+    video.src = source;
+  }}
+</script>
+"""
+
 # Set page config
 st.set_page_config(page_title="AI Video Storyteller", page_icon="🎬", layout="wide")
 
@@ -56,10 +89,173 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+def render_cache_stats(container):
+    """Shows hit/miss counters of the persistent asset caches."""
+    with container.container():
+        st.caption("Asset Cache (this server process)")
+        audio_col, clip_col, index_col = st.columns(3)
+        audio_stats = media_gen.AUDIO_CACHE.stats()
+        footage_stats = media_gen.footage_stats()
+        audio_col.metric("TTS Hits / Misses", f"{audio_stats['hits']} / {audio_stats['misses']}")
+        clip_col.metric("Footage Hits / Misses", f"{footage_stats['hits']} / {footage_stats['misses']}")
+        index_col.metric("Indexed Clips", media_gen.FOOTAGE_INDEX.stats()["clips"])
+
+def render_job_metrics(spans):
+    """Shows where a finished job's time went, one row per span name."""
+    rows = metrics.summarize(spans)
+    if not rows:
+        return
+    for row in rows:
+        row["MB"] = round(row.pop("bytes") / 1024**2, 2)
+    with st.sidebar:
+        st.caption("Time Breakdown (last run)")
+        st.dataframe(rows, hide_index=True)
+
+def report_script_timing():
+    """Records and shows how long this script run (and its imports) took."""
+    run_s = time.perf_counter() - _RUN_STARTED
+    metrics.record("app_run", run_s, cold=_COLD_START, import_s=round(IMPORT_SECONDS, 4))
+    with st.sidebar:
+        kind = "Cold start" if _COLD_START else "Rerun"
+        st.caption(f"{kind}: {run_s:.2f}s (imports {IMPORT_SECONDS:.2f}s)")
+
+@st.cache_resource
+def start_metrics_server():
+    """Serves Prometheus metrics on METRICS_PORT, once per server process."""
+    return metrics.start_http_server(metrics.METRICS_PORT)
+
+@st.cache_resource
+def start_media_server():
+    """Streams published job videos from disk on MEDIA_PORT, once per server process."""
+    return media_server.start_http_server(media_server.MEDIA_PORT)
+
+def media_available():
+    """True if the browser can stream published job videos (see media_server)."""
+    return bool(media_server.MEDIA_PORT) or bool(st.get_option("server.enableStaticServing"))
+
+def media_url(job_id, relative_path, download=False):
+    """Browser URL of a published job output."""
+    return media_server.media_url(job_id, relative_path, st.context.headers, download)
+
+def is_published(job_id, relative_path):
+    """True if a job output can be streamed from its published copy (see media_server)."""
+    return bool(relative_path) and media_available() and os.path.exists(
+        os.path.join(media_server.publish_dir(job_id), relative_path)
+    )
+
+@st.cache_resource
+def get_job_manager():
+    """One background job queue per server process, shared by all sessions."""
+    return jobs.JobManager()
+
+def _player_key(status):
+    # One player per run of the job; a retry publishes a new playlist
+    return f"player_{status['id']}_{status.get('started_at')}"
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def show_job_progress(job_id):
+    """Polls a running job and reruns the page once it has finished."""
+    status = get_job_manager().status(job_id)
+    if status is None:
+        return
+    if media_available() and status.get("playlist") and not st.session_state.get(_player_key(status)):
+        # The first scenes are playable; rerun the page to show the player
+        st.rerun()
+    if status["state"] in jobs.ACTIVE_STATES:
+        st.progress(status["progress"])
+        st.markdown(f"**{status['message']}**")
+    else:
+        st.rerun()
+
+def show_job(job_id, cache_stats):
+    """Shows a job's progress, warnings, script and (once done) its video."""
+    manager = get_job_manager()
+    status = manager.status(job_id)
+    if status is None:
+        st.warning("This job no longer exists.")
+        return
+
+    st.subheader(f"Job {job_id}: {status['filename']}")
+    for warning in status.get("warnings", []):
+        st.warning(warning)
+
+    if status.get("script_ready"):
+        if status["state"] in jobs.ACTIVE_STATES:
+            with st.expander("View Generated Script"):
+                st.json(manager.script(job_id))
+        else:
+            with st.expander("Edit Script & Re-render Changed Scenes"):
+                edited_script = st.data_editor(
+                    manager.script(job_id), disabled=["scene_id"], key=f"script_editor_{job_id}"
+                )
+                if st.button("Re-render Changed Scenes"):
+                    manager.retry(job_id, script=edited_script)
+                    st.rerun()
+
+    if status["state"] in jobs.ACTIVE_STATES:
+        if media_available() and status.get("playlist"):
+            st.caption("Playing the scenes rendered so far; the rest are added as they finish.")
+            components.html(HLS_PLAYER_HTML.format(source=media_url(job_id, status["playlist"])), height=500)
+            st.session_state[_player_key(status)] = True
+        show_job_progress(job_id)
+        return
+
+    render_job_metrics(manager.spans(job_id))
+    if status["state"] == jobs.FAILED:
+        st.error(status["error"])
+        if st.button("Retry (resume from last checkpoint)"):
+            manager.retry(job_id)
+            st.rerun()
+    elif status["state"] == jobs.DONE:
+        render_cache_stats(cache_stats)
+        st.progress(100)
+        st.success("Video Generation Complete!")
+        if not st.session_state.get(f"celebrated_{job_id}"):
+            st.session_state[f"celebrated_{job_id}"] = True
+            st.balloons()
+
+        result = status["output_path"]
+        name = os.path.basename(result)
+        # Published videos are streamed from disk instead of loaded into this process;
+        # ones too large to publish (or already pruned) are served by Streamlit itself
+        published = is_published(job_id, name)
+        if is_published(job_id, status.get("playlist")):
+            components.html(HLS_PLAYER_HTML.format(source=media_url(job_id, status["playlist"])), height=500)
+        elif published and media_server.MEDIA_PORT:
+            st.video(media_url(job_id, name))
+        else:
+            st.video(result)
+
+        if status["options"].get("render_profile", "final") != "final":
+            st.info("This is a low-resolution preview.")
+            if st.button("Finalize (Render Full Quality)", type="primary"):
+                manager.finalize(job_id)
+                st.rerun()
+        
+        if published:
+            st.markdown(
+                f'<a href="{media_url(job_id, name, download=True)}" download="{media_server.DOWNLOAD_FILENAME}">'
+                f'⬇️ Download Video</a>',
+                unsafe_allow_html=True
+            )
+        else:
+            with open(result, "rb") as file:
+                st.download_button(
+                    label="Download Video",
+                    data=file,
+                    file_name=media_server.DOWNLOAD_FILENAME,
+                    mime="video/mp4"
+                )
+
 def main():
     st.title("🎬 AI Video Storyteller (Stock Footage Edition)")
     st.markdown("### Turn your documents into cinematic video essays with Stock Footage.")
 
+    if metrics.METRICS_PORT:
+        start_metrics_server()
+    if media_server.MEDIA_PORT:
+        start_media_server()
+
     # Sidebar for Configuration
     with st.sidebar:
         st.header("Configuration")
@@ -73,7 +269,68 @@ def main():
             "gemini-3-pro-preview"
         ]
         selected_model = st.selectbox("Select Gemini Model", model_options, index=0)
+        bypass_script_cache = st.checkbox(
+            "Bypass Script Cache",
+            value=False,
+            help="Always ask Gemini for a fresh script instead of reusing one generated earlier for the same document and model."
+        )
+        stream_script = st.checkbox(
+            "Stream Script",
+            value=True,
+            help="Start narration and footage for each scene as soon as Gemini has written it, instead of waiting for the whole script."
+        )
+        long_document = st.checkbox(
+            "Long Document Mode",
+            value=llm_engine.LONG_DOCUMENTS,
+            help="Script the whole document in parallel chunks instead of only its first ~30,000 characters."
+        )
+
+        # Performance
+        asset_concurrency = st.slider(
+            "Asset Concurrency (scenes fetched at once)",
+            min_value=1, max_value=16, value=media_gen.DEFAULT_ASSET_CONCURRENCY
+        )
+        bandwidth_budget_mb = st.number_input(
+            "Footage Download Budget per Job (MB, 0 = unlimited)",
+            min_value=0, value=int(media_gen.BANDWIDTH_BUDGET_MB), step=50
+        )
+        partial_downloads = st.checkbox(
+            "Download Only Needed Footage",
+            value=media_gen.PARTIAL_DOWNLOADS,
+            help="Fetch just the first seconds of each stock clip that the scene's narration needs."
+        )
+        reuse_similar_footage = st.checkbox(
+            "Reuse Similar Footage",
+            value=media_gen.FOOTAGE_REUSE,
+            help="Serve a scene from a cached clip fetched for a closely matching query (e.g. 'waves ocean' after 'ocean waves') instead of searching Pexels."
+        )
+        batch_narration = st.checkbox(
+            "Batch Narration",
+            value=media_gen.BATCH_NARRATION,
+            help="Synthesize the narration of all scenes in one Edge TTS request and split it at word boundaries. Waits for the whole script, so it turns off script streaming."
+        )
+        parallel_render = st.checkbox(
+            "Parallel Scene Rendering",
+            value=True,
+            help="Render each scene on its own CPU core and join the segments without re-encoding."
+        )
+        render_backend = st.selectbox(
+            "Render Backend",
+            video_editor.RENDER_BACKENDS,
+            index=video_editor.RENDER_BACKENDS.index(video_editor.DEFAULT_RENDER_BACKEND),
+            help="'ffmpeg' renders each scene in one native ffmpeg filtergraph; 'moviepy' composites frames in Python (slower, used as a fallback)."
+        )
+        profile_names = list(video_editor.RENDER_PROFILES)
+        render_profile = st.selectbox(
+            "Render Quality",
+            profile_names,
+            index=profile_names.index(video_editor.DEFAULT_RENDER_PROFILE),
+            help="'preview' renders a quick 480p draft; finalize it later at full quality from the same assets."
+        )
         
+        cache_stats = st.empty()
+        render_cache_stats(cache_stats)
+
         st.divider()
         st.info("API Keys (Google & Pexels) are loaded from environment variables.")
 
@@ -88,94 +345,34 @@ def main():
                 st.error("Missing API Keys in .env file (GOOGLE_API_KEY or PEXELS_API_KEY).")
                 return
 
-            # Create a temporary directory for processing
-            with tempfile.TemporaryDirectory() as temp_dir:
-                progress_bar = st.progress(0)
-                status_text = st.empty()
-                
-                # Phase 1: Analyze Text
-                status_text.markdown("**Phase 1: Analyzing Document...**")
-                text_content = ""
-                if uploaded_file.name.endswith(".pdf"):
-                    text_content = utils.extract_text_from_pdf(uploaded_file)
-                else:
-                    text_content = str(uploaded_file.read(), "utf-8")
-                
-                cleaned_text = utils.clean_text(text_content)
-                if not cleaned_text:
-                    st.error("Could not extract text from file.")
-                    return
-                progress_bar.progress(10)
-
-                # Phase 2: Generate Script
-                status_text.markdown(f"**Phase 2: Generating Script with {selected_model}...**")
-                script_data, error = llm_engine.generate_script(cleaned_text, selected_model)
-                if error:
-                    st.error(f"Failed to generate script: {error}")
-                    return
-                
-                with st.expander("View Generated Script"):
-                    st.json(script_data)
-                progress_bar.progress(30)
-
-                # Phase 3: Generate Assets (Audio & Stock Video)
-                status_text.markdown("**Phase 3: Fetching Stock Footage & Generating Audio...**")
-                audio_files = []
-                video_files = []
-                text_scripts = []
-                
-                total_scenes = len(script_data)
-                for i, scene in enumerate(script_data):
-                    scene_id = scene.get("scene_id", i+1)
-                    status_text.text(f"Processing Scene {scene_id}/{total_scenes}...")
-                    
-                    # Store text for subtitles
-                    text_scripts.append(scene["text"])
-
-                    # Audio
-                    audio_path = os.path.join(temp_dir, f"audio_{scene_id}.mp3")
-                    asyncio.run(media_gen.generate_audio(scene["text"], audio_path))
-                    audio_files.append(audio_path)
-                    
-                    # Stock Video (Pexels)
-                    video_path = os.path.join(temp_dir, f"video_{scene_id}.mp4")
-                    query = scene.get("stock_video_query", "abstract background")
-                    
-                    success, error_msg = media_gen.download_pexels_video(query, video_path)
-                    if not success:
-                        st.warning(f"Scene {scene_id}: {error_msg}. Using fallback.")
-                        # Video editor handles missing files as black screen, 
-                        # but we could also download a default fallback here if we wanted.
-                    
-                    video_files.append(video_path)
-                    
-                    # Update progress based on scenes
-                    current_progress = 30 + int((i + 1) / total_scenes * 40)
-                    progress_bar.progress(current_progress)
-
-                # Phase 4: Assemble Video
-                status_text.markdown("**Phase 4: Assembling Video (Subtitles & Clips)...**")
-                output_video_path = "final_output.mp4"
-                
-                # Note: Updated video_editor.create_video signature
-                result, error = video_editor.create_video(audio_files, video_files, text_scripts, output_video_path)
-                
-                if error:
-                    st.error(f"Failed to assemble video: {error}")
-                elif result:
-                    progress_bar.progress(100)
-                    status_text.success("Video Generation Complete!")
-                    st.balloons()
-                    
-                    st.video(result)
-                    
-                    with open(result, "rb") as file:
-                        st.download_button(
-                            label="Download Video",
-                            data=file,
-                            file_name="ai_stock_video.mp4",
-                            mime="video/mp4"
-                        )
+            # Render in the background; the page only polls the job's status
+            options = {
+                "model": selected_model,
+                "use_script_cache": not bypass_script_cache,
+                "asset_concurrency": asset_concurrency,
+                "bandwidth_budget_mb": bandwidth_budget_mb,
+                "partial_downloads": partial_downloads,
+                "reuse_similar_footage": reuse_similar_footage,
+                "parallel_render": parallel_render,
+                "stream_script": stream_script,
+                "long_document": long_document,
+                "batch_narration": batch_narration,
+                "render_profile": render_profile,
+                "render_backend": render_backend,
+                # Only worth publishing (and remuxing to HLS) if the browser can stream it
+                "publish_media": media_available(),
+                "progressive_output": media_available(),
+            }
+            job_id = get_job_manager().submit(uploaded_file.name, uploaded_file.getvalue(), options)
+            st.session_state["job_id"] = job_id
+            # Keep the job in the URL so a browser refresh reattaches to it
+            st.query_params["job"] = job_id
+
+    job_id = st.session_state.get("job_id") or st.query_params.get("job")
+    if job_id:
+        show_job(job_id, cache_stats)
+
+    report_script_timing()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,242 @@
+"""
+Headless batch conversion of many documents to videos.
+
+Documents run through pipeline.run_pipeline in one process, so they share the
+on-disk caches, the Pexels client and its rate limiter. Several documents are
+in flight at once, each capped per phase: while one is rendering, others can
+be extracting, waiting on Gemini or fetching assets.
+
+Every document gets its own work directory under --output-dir, named after
+the file and a hash of its path. Running the same batch again resumes every
+document from its last checkpoint. A JSON report with one entry per document
+is rewritten as each document finishes.
+
+Usage:
+    python batch.py docs/ --output-dir out/
+    python batch.py --manifest documents.txt --docs 8 --render-limit 2
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+import utils
+import metrics
+import pipeline
+import media_gen
+import video_editor
+
+load_dotenv()
+
+DOCUMENT_EXTENSIONS = (".pdf", ".txt")
+REPORT_FILENAME = "report.json"
+
+def find_documents(inputs, manifest_path=None):
+    """
+    Collects the documents to convert.
+
+    Args:
+        inputs (list): Files and directories (searched recursively for PDF/TXT files).
+        manifest_path (str): Optional file listing one document path per line
+            ('#' starts a comment); relative paths are relative to the manifest.
+
+    Returns:
+        list: Absolute document paths, in order, without duplicates.
+    """
+    paths = []
+    if manifest_path:
+        base_dir = os.path.dirname(os.path.abspath(manifest_path))
+        with open(manifest_path, encoding="utf-8") as f:
+            for line in f:
+                line = line.split("#", 1)[0].strip()
+                if line:
+                    paths.append(os.path.join(base_dir, line))
+
+    for path in inputs:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                paths.extend(os.path.join(root, name) for name in sorted(files)
+                             if name.lower().endswith(DOCUMENT_EXTENSIONS))
+        else:
+            paths.append(path)
+
+    documents = []
+    for path in map(os.path.abspath, paths):
+        if path not in documents:
+            documents.append(path)
+    return documents
+
+def work_dir_for(output_dir, source_path):
+    """Stable per-document work directory, so a rerun resumes the same job."""
+    stem = os.path.splitext(os.path.basename(source_path))[0]
+    digest = hashlib.sha256(source_path.encode()).hexdigest()[:8]
+    return os.path.join(output_dir, f"{stem}-{digest}")
+
+def _write_report(path, report):
+    # Atomic, so the report is never half-written if the batch is killed
+    utils.write_atomic(path, json.dumps(report, indent=2))
+
+def convert(source_path, work_dir, options, limits):
+    """
+    Converts one document.
+
+    Returns:
+        dict: The document's report entry.
+    """
+    name = os.path.basename(source_path)
+    warnings = []
+
+    def report(progress=None, message=None, warning=None, script=None, playlist=None):
+        if message:
+            print(f"[{name}] {message}", flush=True)
+        if warning:
+            warnings.append(warning)
+
+    started = time.time()
+    try:
+        output_path, error = pipeline.run_pipeline(source_path, work_dir, options, report, limits=limits)
+    except Exception as e:
+        output_path, error = None, f"Unexpected error: {e}"
+
+    spans = metrics.load(os.path.join(work_dir, metrics.METRICS_FILENAME))
+    return {
+        "source": source_path,
+        "work_dir": work_dir,
+        "status": "failed" if error else "done",
+        "output_path": output_path,
+        "error": error,
+        "warnings": warnings,
+        "started_at": started,
+        "duration_s": round(time.time() - started, 2),
+        "phases": {row["span"]: row["total_s"] for row in metrics.summarize(spans)
+                   if row["span"].startswith(("phase_", "wait_"))},
+    }
+
+def run_batch(documents, output_dir, options=None, max_docs=4, limits=None, report_path=None):
+    """
+    Converts documents concurrently.
+
+    Args:
+        documents (list): Document paths.
+        output_dir (str): Parent of the per-document work directories.
+        options (dict): Pipeline options (see pipeline.DEFAULT_OPTIONS).
+        max_docs (int): Documents in flight at once.
+        limits (dict): Max documents per phase at once, e.g. {"render": 1}
+            (see pipeline.PHASES); phases not listed are only bound by max_docs.
+        report_path (str): JSON report, rewritten as each document finishes.
+
+    Returns:
+        dict: The report: {"documents": [entry, ...], "done": n, "failed": n, ...}.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    report_path = report_path or os.path.join(output_dir, REPORT_FILENAME)
+    semaphores = {phase: threading.BoundedSemaphore(n) for phase, n in (limits or {}).items() if n}
+    entries = {}
+    lock = threading.Lock()
+    started = time.time()
+
+    def snapshot():
+        results = [entries[path] for path in documents if path in entries]
+        return {
+            "started_at": started,
+            "duration_s": round(time.time() - started, 2),
+            "total": len(documents),
+            "done": sum(1 for entry in results if entry["status"] == "done"),
+            "failed": sum(1 for entry in results if entry["status"] == "failed"),
+            "options": options or {},
+            "documents": results,
+        }
+
+    with ThreadPoolExecutor(max_workers=max(1, max_docs), thread_name_prefix="batch") as executor:
+        futures = {
+            executor.submit(convert, path, work_dir_for(output_dir, path), options, semaphores): path
+            for path in documents
+        }
+        for future in as_completed(futures):
+            entry = future.result()
+            with lock:
+                entries[futures[future]] = entry
+                _write_report(report_path, snapshot())
+            outcome = entry["output_path"] if entry["status"] == "done" else entry["error"]
+            print(f"[{len(entries)}/{len(documents)}] {entry['status']}: {entry['source']} -> {outcome}", flush=True)
+
+    report = snapshot()
+    _write_report(report_path, report)
+    return report
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="*", help="PDF/TXT files or directories to convert.")
+    parser.add_argument("--manifest", help="File listing one document path per line.")
+    parser.add_argument("--output-dir", default="batch_output", help="Where work directories and the report go.")
+    parser.add_argument("--report", help=f"JSON report path (default: <output-dir>/{REPORT_FILENAME}).")
+    parser.add_argument("--docs", type=int, default=4, help="Documents in flight at once.")
+    parser.add_argument("--extract-limit", type=int, default=0, help="Documents extracting text at once (0 = --docs).")
+    parser.add_argument("--llm-limit", type=int, default=2, help="Documents waiting on Gemini at once (0 = --docs).")
+    parser.add_argument("--asset-limit", type=int, default=0, help="Documents fetching narration/footage at once (0 = --docs).")
+    parser.add_argument("--render-limit", type=int, default=1, help="Documents rendering at once (0 = --docs).")
+    parser.add_argument("--render-workers", type=int, default=None,
+                        help="Render processes per document (default: CPUs / --render-limit).")
+    parser.add_argument("--model", default=pipeline.DEFAULT_OPTIONS["model"])
+    parser.add_argument("--render-profile", default=pipeline.DEFAULT_OPTIONS["render_profile"])
+    parser.add_argument("--render-backend", default=pipeline.DEFAULT_OPTIONS["render_backend"],
+                        choices=video_editor.RENDER_BACKENDS)
+    parser.add_argument("--asset-concurrency", type=int, default=media_gen.DEFAULT_ASSET_CONCURRENCY,
+                        help="Scenes fetched at once per document.")
+    parser.add_argument("--stream-script", action="store_true",
+                        help="Stream scripts into asset fetching (holds an LLM slot through Phase 3).")
+    parser.add_argument("--no-footage-reuse", action="store_true",
+                        help="Only reuse footage cached for the exact same query.")
+    parser.add_argument("--batch-narration", action="store_true", help="One Edge TTS request per document.")
+    parser.add_argument("--script-concurrency", type=int, default=pipeline.DEFAULT_OPTIONS["script_concurrency"],
+                        help="Gemini requests in flight at once per long document (one per chunk).")
+    parser.add_argument("--no-script-cache", action="store_true")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    documents = find_documents(args.inputs, args.manifest)
+    if not documents:
+        print("No PDF/TXT documents given.")
+        return 2
+    if not os.getenv("GOOGLE_API_KEY") or not os.getenv("PEXELS_API_KEY"):
+        print("Missing API Keys in .env file (GOOGLE_API_KEY or PEXELS_API_KEY).")
+        return 2
+
+    render_limit = args.render_limit or args.docs
+    options = {
+        "model": args.model,
+        "use_script_cache": not args.no_script_cache,
+        "asset_concurrency": args.asset_concurrency,
+        "stream_script": args.stream_script,
+        "script_concurrency": args.script_concurrency,
+        "batch_narration": args.batch_narration,
+        "reuse_similar_footage": media_gen.FOOTAGE_REUSE and not args.no_footage_reuse,
+        "render_profile": args.render_profile,
+        "render_backend": args.render_backend,
+        # Nobody watches a batch render while it runs
+        "progressive_output": False,
+        # Concurrent renders share the CPUs instead of each starting one process per core
+        "render_workers": args.render_workers or max(1, (os.cpu_count() or 1) // render_limit),
+    }
+    limits = {
+        "extract": args.extract_limit,
+        "script": args.llm_limit,
+        "assets": args.asset_limit,
+        "render": args.render_limit,
+    }
+
+    print(f"Converting {len(documents)} documents into {os.path.abspath(args.output_dir)}...")
+    report = run_batch(documents, args.output_dir, options, args.docs, limits, args.report)
+    print(f"\n{report['done']} done, {report['failed']} failed in {report['duration_s']}s")
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,665 @@
+"""
+Offline end-to-end benchmark for the document-to-video pipeline.
+
+Gemini, Edge TTS and Pexels are replaced by local stand-ins with configurable
+latency and payload sizes, and the inputs (a PDF, stock clips, narration) are
+synthesized with ffmpeg, so runs are repeatable and need no API keys or network.
+
+Each phase is measured separately:
+    startup        importing the modules the Streamlit app loads, in a fresh interpreter
+    utils          PDF extraction and cleaning
+    llm_engine     script generation (streamed or one-shot)
+    media_gen      narration + footage fetching from a local Pexels stand-in
+    video_editor   scene rendering and concatenation
+
+Usage:
+    python benchmark.py --scenes 8 --pages 40 --json results.json
+    python benchmark.py --baseline results.json   # exits 1 on a regression
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import resource
+import socket
+import threading
+import subprocess
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+import metrics
+
+MODEL_NAME = "gemini-2.0-flash-lite"
+FAKE_API_KEY = "benchmark"
+
+# Relative slowdown (wall time / peak RSS) beyond which --baseline fails;
+# wall time changes below MIN_REGRESSION_SECONDS are treated as noise
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.1
+
+def load_pipeline(bench_root):
+    """
+    Points the caches at the scratch directory, then imports the pipeline modules.
+
+    Done from main() rather than at import time: the PDF and render pools
+    spawn workers that re-import this module, and each would otherwise create
+    its own scratch directory and pay for these imports inside the measured phase.
+    """
+    global utils, llm_engine, media_gen, pexels_client, subtitles, video_editor
+    os.environ["CACHE_DIR"] = os.path.join(bench_root, "cache")
+    # The stand-in services listen on localhost; never route them through a proxy
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+    import utils
+    import llm_engine
+    import media_gen
+    import pexels_client
+    import subtitles
+    import video_editor
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+WORDS = (
+    "ocean forest city mountain river history science energy future market "
+    "climate network signal culture design system planet motion light data"
+).split()
+
+def _ffmpeg(*args):
+    ffmpeg = utils.ffmpeg_binary(required=True)
+    subprocess.run([ffmpeg, "-y", "-loglevel", "error", *args], check=True)
+
+def make_pdf(path, pages, words_per_page):
+    """Writes a minimal text PDF with `pages` pages of `words_per_page` words each."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [{}] /Count {} >>".format(
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(pages)), pages
+        ),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    for page in range(pages):
+        words = [WORDS[(page * 7 + i) % len(WORDS)] for i in range(words_per_page)]
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        text = " T* ".join(f"({line}.)Tj" for line in lines)
+        stream = f"BT /F1 11 Tf 14 TL 72 740 Td {text} ET"
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * page} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+def make_clip(path, size, fps, seconds):
+    """Encodes a synthetic H.264 stock clip (moving test pattern)."""
+    _ffmpeg(
+        "-f", "lavfi", "-i", f"testsrc2=size={size[0]}x{size[1]}:rate={fps}:duration={seconds}",
+        "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        "-g", str(fps * 2), "-movflags", "+faststart", path
+    )
+
+def make_narration(path, seconds):
+    """Encodes a tone shaped like Edge TTS output (24kHz 48kbit/s mono MP3)."""
+    _ffmpeg(
+        "-f", "lavfi", "-i", f"sine=frequency=220:duration={seconds}",
+        "-ac", "1", "-ar", "24000", "-b:a", "48k", path
+    )
+
+# ---------------------------------------------------------------------------
+# Service stand-ins
+# ---------------------------------------------------------------------------
+
+class FakeGemini:
+    """
+    Stands in for google.generativeai.GenerativeModel.
+
+    Returns a script of `scenes` scenes after `latency` seconds; streamed
+    responses spread that latency over `chunks` chunks.
+    """
+
+    def __init__(self, scenes, words_per_scene, latency, chunks=20):
+        self.scenes = scenes
+        self.words_per_scene = words_per_scene
+        self.latency = latency
+        self.chunks = chunks
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def script_text(self):
+        script = []
+        for i in range(self.scenes):
+            words = [WORDS[(i * 3 + j) % len(WORDS)] for j in range(self.words_per_scene)]
+            script.append({
+                "scene_id": i + 1,
+                "text": f"Scene {i + 1}: " + " ".join(words) + ".",
+                "stock_video_query": f"{WORDS[i % len(WORDS)]} {i}",
+                "duration_estimate": 6,
+            })
+        return json.dumps(script, indent=2)
+
+    def GenerativeModel(self, model_name):
+        return self
+
+    def generate_content(self, prompt, generation_config=None, stream=False):
+        self.bytes_in += len(prompt.encode())
+        text = self.script_text()
+        self.bytes_out += len(text.encode())
+        if not stream:
+            time.sleep(self.latency)
+            return _FakeChunk(text)
+        return self._stream(text)
+
+    def _stream(self, text):
+        size = max(1, -(-len(text) // self.chunks))
+        for start in range(0, len(text), size):
+            time.sleep(self.latency / self.chunks)
+            yield _FakeChunk(text[start:start + size])
+
+class _FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+class FakeTTS:
+    """
+    Stands in for edge_tts.Communicate; every narration is the same fixture MP3.
+
+    A batched request (paragraphs joined by media_gen.NARRATION_SEPARATOR)
+    streams the fixture once per paragraph, with evenly spaced word boundaries.
+    """
+
+    def __init__(self, narration_path, latency, narration_seconds):
+        self.narration_path = narration_path
+        self.latency = latency
+        self.narration_seconds = narration_seconds
+        self.calls = 0
+
+    def Communicate(self, text, voice, rate="+0%", volume="+0%", pitch="+0Hz", boundary="SentenceBoundary"):
+        tts = self
+
+        class Communicate:
+            async def save(self, output_filename):
+                tts.calls += 1
+                await asyncio.sleep(tts.latency)
+                shutil.copyfile(tts.narration_path, output_filename)
+
+            async def stream(self):
+                tts.calls += 1
+                await asyncio.sleep(tts.latency)
+                with open(tts.narration_path, "rb") as f:
+                    audio = f.read()
+                for n, paragraph in enumerate(text.split(media_gen.NARRATION_SEPARATOR)):
+                    words = paragraph.split()
+                    step = tts.narration_seconds / (len(words) + 1)
+                    for k, word in enumerate(words):
+                        offset = n * tts.narration_seconds + (k + 0.5) * step
+                        yield {"type": "WordBoundary", "offset": int(offset * media_gen.TICKS_PER_SECOND),
+                               "duration": int(step / 2 * media_gen.TICKS_PER_SECOND), "text": word}
+                    yield {"type": "audio", "data": audio}
+
+        return Communicate()
+
+class FakePexelsServer:
+    """
+    A local HTTP server standing in for the Pexels search API and video CDN.
+
+    Every query gets its own video id and link, all backed by the same fixture
+    clip. Clip downloads honor Range requests (as the CDN does) and can be
+    throttled to `bandwidth` bytes/s. bytes_sent counts the response bodies served.
+    """
+
+    def __init__(self, clip_path, clip_seconds, clip_size, fps, latency, bandwidth=0):
+        self.clip_path = clip_path
+        self.clip_seconds = clip_seconds
+        self.clip_size = clip_size
+        self.fps = fps
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.bytes_sent = 0
+        self.searches = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _count(self, num_bytes):
+        with self._lock:
+            self.bytes_sent += num_bytes
+
+    def search_response(self, query):
+        with self._lock:
+            self.searches += 1
+            video_id = self.searches
+        return {"videos": [{
+            "id": video_id,
+            "duration": self.clip_seconds,
+            "video_files": [{
+                "id": video_id,
+                "width": self.clip_size[0],
+                "height": self.clip_size[1],
+                "fps": self.fps,
+                "file_type": "video/mp4",
+                "link": f"{self.url}/clips/{video_id}.mp4",
+            }],
+        }]}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                # A small send buffer keeps bytes_sent close to what the client actually read
+                self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 64 * 1024)
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                if url.path == "/videos/search":
+                    time.sleep(server.latency)
+                    query = parse_qs(url.query).get("query", [""])[0]
+                    body = json.dumps(server.search_response(query)).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.send_header("X-Ratelimit-Limit", "1000000")
+                    self.send_header("X-Ratelimit-Remaining", "1000000")
+                    self.send_header("X-Ratelimit-Reset", str(int(time.time()) + 3600))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    server._count(len(body))
+                elif url.path.startswith("/clips/"):
+                    self.send_clip()
+                else:
+                    self.send_error(404)
+
+            def send_clip(self):
+                size = os.path.getsize(server.clip_path)
+                start, end = 0, size - 1
+                byte_range = self.headers.get("Range", "")
+                if byte_range.startswith("bytes="):
+                    first, _, last = byte_range[6:].partition("-")
+                    start = int(first or 0)
+                    end = min(int(last), size - 1) if last else size - 1
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+                else:
+                    self.send_response(200)
+                self.send_header("Accept-Ranges", "bytes")
+                self.send_header("Content-Type", "video/mp4")
+                self.send_header("Content-Length", str(end - start + 1))
+                self.end_headers()
+
+                chunk_size = 64 * 1024
+                with open(server.clip_path, "rb") as f:
+                    f.seek(start)
+                    remaining = end - start + 1
+                    try:
+                        while remaining > 0:
+                            chunk = f.read(min(chunk_size, remaining))
+                            self.wfile.write(chunk)
+                            server._count(len(chunk))
+                            remaining -= len(chunk)
+                            if server.bandwidth:
+                                time.sleep(len(chunk) / server.bandwidth)
+                    except (BrokenPipeError, ConnectionResetError):
+                        # ffmpeg hangs up once it has the seconds it needs
+                        pass
+
+        return Handler
+
+def install_fakes(gemini, tts, pexels):
+    """Points llm_engine, media_gen and pexels_client at the stand-ins."""
+    llm_engine.GOOGLE_API_KEY = FAKE_API_KEY
+    llm_engine.get_model = gemini.GenerativeModel
+    # media_gen imports edge_tts lazily, so patch the module it will get
+    import edge_tts
+    edge_tts.Communicate = tts.Communicate
+    media_gen.PEXELS_API_KEY = FAKE_API_KEY
+    pexels_client.PEXELS_API_URL = f"{pexels.url}/videos/search"
+
+def reset_caches():
+    """Empties every disk and in-memory cache so a run measures the cold path."""
+    for disk_cache in (media_gen.CLIP_CACHE, media_gen.QUERY_CACHE, media_gen.AUDIO_CACHE,
+                       llm_engine.SCRIPT_CACHE, subtitles.CAPTION_CACHE):
+        disk_cache.clear()
+    media_gen.FOOTAGE_INDEX.clear()
+    subtitles._caption_array.cache_clear()
+    media_gen._pexels_client = None
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def _read_hwm_kb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _reset_hwm():
+    # Linux only: restarts the peak RSS counter so each phase gets its own peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+class Phase:
+    """
+    Context manager recording wall time and peak RSS for one phase.
+
+    peak_rss_mb is the process high-water mark during the phase (reset at its
+    start on Linux), so it includes memory still held from earlier phases.
+    """
+
+    def __init__(self, name, results):
+        self.name = name
+        self.metrics = results.setdefault(name, {})
+
+    def __enter__(self):
+        self.per_phase_rss = _reset_hwm()
+        self.start = time.perf_counter()
+        return self.metrics
+
+    def __exit__(self, *exc):
+        self.metrics["wall_s"] = round(time.perf_counter() - self.start, 3)
+        hwm_kb = _read_hwm_kb() if self.per_phase_rss else None
+        self.metrics["peak_rss_mb"] = round(hwm_kb / 1024, 1) if hwm_kb else metrics.peak_rss_mb()
+        self.metrics["children_peak_rss_mb"] = metrics.peak_rss_mb(resource.RUSAGE_CHILDREN)
+        return False
+
+def _file_bytes(paths):
+    return sum(os.path.getsize(path) for path in paths if path and os.path.exists(path))
+
+def _media_duration(path):
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return ffmpeg_parse_infos(path).get("duration") or 0.0
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+# Modules the app imports at startup, and libraries that should only load
+# once their pipeline phase runs
+APP_MODULES = ("media_gen", "metrics", "jobs", "video_editor")
+HEAVY_MODULES = ("moviepy", "google.generativeai", "edge_tts", "PyPDF2", "numpy")
+
+STARTUP_PROBE = f"""
+import sys, json, time
+started = time.perf_counter()
+import {", ".join(APP_MODULES)}
+print(json.dumps({{
+    "import_s": time.perf_counter() - started,
+    "heavy_modules": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+def measure_startup():
+    """Imports the app's modules in a fresh interpreter (a cold start)."""
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_PROBE], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    probe = json.loads(result.stdout.strip().splitlines()[-1])
+    if probe["heavy_modules"]:
+        print(f"startup loaded heavy modules: {', '.join(probe['heavy_modules'])}")
+    return {"import_s": round(probe["import_s"], 3), "heavy_modules": len(probe["heavy_modules"])}
+
+def run_once(args, fixtures, gemini, pexels, work_dir):
+    """Runs every phase once and returns {phase: metrics}."""
+    results = {}
+    os.makedirs(work_dir, exist_ok=True)
+
+    with Phase("startup", results) as m:
+        m.update(measure_startup())
+
+    with Phase("utils", results) as m:
+        max_chars = llm_engine.MAX_DOCUMENT_CHARS if args.long_document else llm_engine.MAX_INPUT_CHARS
+        pages = utils.iter_pdf_pages(fixtures["pdf"], max_chars=max_chars, workers=utils.PDF_WORKERS)
+        text = utils.clean_pages(pages)
+    m["pages"] = args.pages
+    m["pages_per_s"] = round(args.pages / max(m["wall_s"], 1e-9), 1)
+    m["bytes_read"] = os.path.getsize(fixtures["pdf"])
+    m["chars_out"] = len(text)
+
+    gemini.bytes_in = gemini.bytes_out = 0
+    with Phase("llm_engine", results) as m:
+        if args.no_stream:
+            generate = llm_engine.generate_long_script if args.long_document else llm_engine.generate_script
+            scenes, error = generate(text, MODEL_NAME)
+            if error:
+                raise RuntimeError(error)
+        else:
+            start = time.perf_counter()
+            scenes = []
+            stream = llm_engine.stream_long_script if args.long_document else llm_engine.stream_script
+            for scene in stream(text, MODEL_NAME):
+                if not scenes:
+                    m["first_scene_s"] = round(time.perf_counter() - start, 3)
+                scenes.append(scene)
+    m["scenes"] = len(scenes)
+    m["parts"] = len(llm_engine.split_document(text)) if args.long_document else 1
+    m["bytes_sent"] = gemini.bytes_in
+    m["bytes_received"] = gemini.bytes_out
+
+    served_before = pexels.bytes_sent
+    with Phase("media_gen", results) as m:
+        assets = asyncio.run(media_gen.generate_scene_assets(
+            scenes, work_dir,
+            max_concurrency=args.concurrency,
+            partial_downloads=not args.full_downloads,
+            batch_narration=args.batch_narration,
+            bandwidth_budget_mb=args.budget_mb
+        ))
+    errors = [error for result in assets for error in result["errors"]]
+    if errors:
+        print(f"media_gen reported {len(errors)} errors, e.g. {errors[0]}")
+    m["scenes_per_min"] = round(len(assets) / max(m["wall_s"], 1e-9) * 60, 1)
+    m["bytes_downloaded"] = pexels.bytes_sent - served_before
+    m["bytes_written"] = _file_bytes([r["audio_path"] for r in assets] + [r["video_path"] for r in assets])
+    m["errors"] = len(errors)
+
+    segment_dir = os.path.join(work_dir, "segments")
+    os.makedirs(segment_dir, exist_ok=True)
+    output_path = os.path.join(work_dir, "output.mp4")
+    tasks = [
+        (i, r["audio_path"], r["video_path"], r["text"], os.path.join(segment_dir, f"scene_{i + 1:04d}.mp4"))
+        for i, r in enumerate(assets)
+    ]
+    with Phase("video_editor", results) as m:
+        segments, error = video_editor.render_scene_segments(tasks, workers=args.render_workers,
+                                                             profile=args.render_profile,
+                                                             backend=args.render_backend)
+        if error:
+            raise RuntimeError(error)
+        segment_paths = [segments[i] for i in sorted(segments) if segments[i]]
+        video_editor.concat_segments(segment_paths, output_path)
+    duration = _media_duration(output_path)
+    frames = duration * video_editor.get_render_profile(args.render_profile)["fps"]
+    m["output_seconds"] = round(duration, 2)
+    m["render_fps"] = round(frames / max(m["wall_s"], 1e-9), 2)
+    m["scenes_per_min"] = round(len(segment_paths) / max(m["wall_s"], 1e-9) * 60, 1)
+    m["bytes_read"] = _file_bytes([t[1] for t in tasks] + [t[2] for t in tasks])
+    m["bytes_written"] = _file_bytes(segment_paths + [output_path])
+
+    results["total"] = {"wall_s": round(sum(results[p]["wall_s"] for p in ("utils", "llm_engine", "media_gen", "video_editor")), 3)}
+    return results
+
+def _median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle - 1] + values[middle]) / 2
+
+def summarize(runs):
+    """Median of every numeric metric across runs."""
+    summary = {}
+    for phase in runs[0]:
+        summary[phase] = {
+            key: round(_median([run[phase][key] for run in runs]), 3)
+            for key in runs[0][phase]
+        }
+    return summary
+
+def print_report(summary):
+    for phase, metrics in summary.items():
+        print(f"\n{phase}")
+        for key, value in metrics.items():
+            if key.startswith("bytes"):
+                value = f"{value / 1024**2:.2f} MB"
+            print(f"  {key:<22} {value}")
+
+def compare(summary, baseline, tolerance):
+    """
+    Returns a list of regressions: wall time or peak RSS that grew by more than
+    `tolerance` (relative) over the baseline.
+    """
+    regressions = []
+    if baseline.get("settings") != summary.get("settings"):
+        print("Warning: baseline was recorded with different settings; comparison may be meaningless.")
+    for phase, metrics in summary.items():
+        if phase == "settings":
+            continue
+        for key in ("wall_s", "peak_rss_mb"):
+            old = baseline.get(phase, {}).get(key)
+            new = metrics.get(key)
+            if key == "wall_s" and new is not None and old is not None and new - old < MIN_REGRESSION_SECONDS:
+                continue
+            if old and new is not None and new > old * (1 + tolerance):
+                regressions.append(f"{phase}.{key}: {old} -> {new} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmark of the document-to-video pipeline.")
+    parser.add_argument("--pages", type=int, default=40, help="Pages in the synthetic PDF.")
+    parser.add_argument("--words-per-page", type=int, default=300)
+    parser.add_argument("--scenes", type=int, default=6, help="Scenes in the fake Gemini script.")
+    parser.add_argument("--words-per-scene", type=int, default=12)
+    parser.add_argument("--narration-seconds", type=float, default=4.0, help="Length of every fake narration.")
+    parser.add_argument("--clip-seconds", type=float, default=15.0, help="Length of the stock clip served.")
+    parser.add_argument("--clip-size", default="1280x720", help="Resolution of the stock clip served (WxH).")
+    parser.add_argument("--llm-latency", type=float, default=2.0, help="Seconds the fake Gemini takes per script.")
+    parser.add_argument("--tts-latency", type=float, default=0.5, help="Seconds the fake Edge TTS takes per scene.")
+    parser.add_argument("--pexels-latency", type=float, default=0.2, help="Seconds the fake Pexels takes per search.")
+    parser.add_argument("--bandwidth-mbps", type=float, default=0, help="Clip download throttle in Mbit/s (0 = unlimited).")
+    parser.add_argument("--concurrency", type=int, default=media_gen.DEFAULT_ASSET_CONCURRENCY)
+    parser.add_argument("--render-workers", type=int, default=video_editor.RENDER_WORKERS)
+    parser.add_argument("--render-profile", default=video_editor.DEFAULT_RENDER_PROFILE,
+                        choices=list(video_editor.RENDER_PROFILES), help="Encoder settings to render with.")
+    parser.add_argument("--render-backend", default=video_editor.DEFAULT_RENDER_BACKEND,
+                        choices=video_editor.RENDER_BACKENDS, help="How scenes are rendered (see video_editor).")
+    parser.add_argument("--budget-mb", type=float, default=0, help="Footage download budget per run (0 = unlimited).")
+    parser.add_argument("--full-downloads", action="store_true", help="Disable partial footage downloads.")
+    parser.add_argument("--batch-narration", action="store_true", help="Synthesize all narration in one TTS request.")
+    parser.add_argument("--no-stream", action="store_true", help="Request the script in one shot instead of streaming.")
+    parser.add_argument("--long-document", action="store_true",
+                        help="Script the whole PDF in concurrent chunks (the fake Gemini returns --scenes per chunk).")
+    parser.add_argument("--runs", type=int, default=1, help="Runs to take the median of.")
+    parser.add_argument("--warm", action="store_true", help="Keep caches between runs (measures the warm path after run 1).")
+    parser.add_argument("--json", help="Write the median metrics to this file.")
+    parser.add_argument("--baseline", help="Compare against a previous --json file; exit 1 on a regression.")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch directory.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    bench_root = tempfile.mkdtemp(prefix="storyteller-bench-")
+    keep = False
+    try:
+        load_pipeline(bench_root)
+        args = parse_args(argv)
+        keep = args.keep
+        return _run(args, bench_root)
+    finally:
+        if keep:
+            print(f"Kept {bench_root}")
+        else:
+            shutil.rmtree(bench_root, ignore_errors=True)
+
+def _run(args, bench_root):
+    clip_size = tuple(int(v) for v in args.clip_size.lower().split("x"))
+    fixture_dir = os.path.join(bench_root, "fixtures")
+    os.makedirs(fixture_dir)
+
+    print(f"Preparing fixtures in {fixture_dir}...")
+    fixtures = {
+        "pdf": os.path.join(fixture_dir, "document.pdf"),
+        "clip": os.path.join(fixture_dir, "stock.mp4"),
+        "narration": os.path.join(fixture_dir, "narration.mp3"),
+    }
+    make_pdf(fixtures["pdf"], args.pages, args.words_per_page)
+    make_clip(fixtures["clip"], clip_size, media_gen.TARGET_FPS, args.clip_seconds)
+    make_narration(fixtures["narration"], args.narration_seconds)
+
+    gemini = FakeGemini(args.scenes, args.words_per_scene, args.llm_latency)
+    tts = FakeTTS(fixtures["narration"], args.tts_latency, args.narration_seconds)
+    pexels = FakePexelsServer(
+        fixtures["clip"], args.clip_seconds, clip_size, media_gen.TARGET_FPS,
+        args.pexels_latency, bandwidth=args.bandwidth_mbps * 1e6 / 8
+    ).start()
+    install_fakes(gemini, tts, pexels)
+
+    runs = []
+    try:
+        for run in range(args.runs):
+            if run == 0 or not args.warm:
+                reset_caches()
+            print(f"Run {run + 1}/{args.runs}...")
+            runs.append(run_once(args, fixtures, gemini, pexels, os.path.join(bench_root, f"run{run + 1}")))
+    finally:
+        pexels.stop()
+
+    summary = summarize(runs)
+    print_report(summary)
+    settings = {key: value for key, value in vars(args).items() if key not in ("json", "baseline", "tolerance", "keep")}
+    summary["settings"] = settings
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+        if regressions:
+            print("\nRegressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print("\nNo regressions against baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,8 @@
 # Exit on error
 set -o errexit
 
-# Install system dependencies
-apt-get update && apt-get install -y ffmpeg imagemagick
-
-# Modify ImageMagick policy to allow text (often disabled by default)
-sed -i 's/none/read,write/g' /etc/ImageMagick-6/policy.xml
+# Install system dependencies (fonts are used to rasterize subtitles)
+apt-get update && apt-get install -y ffmpeg fonts-dejavu-core
 
 # Install Python dependencies
 pip install --upgrade pip
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked eviction
+    fcntl = None
+
+CACHE_ROOT = os.getenv("CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ai_video_storyteller")
+
+def make_key(*parts):
+    """
+    Builds a stable cache key from arbitrary JSON-serializable parts.
+
+    Returns:
+        str: Hex SHA-256 digest of the parts.
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _replace_from(src_path, dest_path):
+    # Copy to a temp file next to the destination, then rename over it, so readers
+    # never see a partial file and an existing hard link at dest_path is never written through.
+    dest_dir = os.path.dirname(os.path.abspath(dest_path))
+    fd, tmp_path = tempfile.mkstemp(dir=dest_dir, prefix=".tmp-")
+    os.close(fd)
+    try:
+        shutil.copyfile(src_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class DiskCache:
+    """
+    A persistent, size-bounded file cache that is safe to share between processes.
+
+    Entries are stored under a hash of their key. Writes go through a temp file
+    and an atomic rename; eviction runs under an exclusive file lock. Each entry's
+    mtime records when it was written (used for max_age) and its atime records
+    when it was last read (used for LRU eviction against max_bytes).
+    """
+
+    def __init__(self, name, max_bytes=None, max_age=None, root=None):
+        """
+        Args:
+            name (str): Sub-directory of the cache root for this cache.
+            max_bytes (int): Byte budget; least recently used entries are evicted past it.
+            max_age (float): Seconds after which an entry expires.
+            root (str): Cache root directory (defaults to CACHE_DIR).
+        """
+        self.directory = os.path.join(root or CACHE_ROOT, name)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock_path = os.path.join(self.directory, ".lock")
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, "a") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lookup(self, key):
+        """Returns the path of a live entry (marking it as recently used), or None."""
+        path = self._path(key)
+        try:
+            stat = os.stat(path)
+            if self.max_age is not None and time.time() - stat.st_mtime > self.max_age:
+                os.remove(path)
+                return None
+            os.utime(path, (time.time(), stat.st_mtime))
+            return path
+        except FileNotFoundError:
+            return None
+
+    def contains(self, key):
+        return self._lookup(key) is not None
+
+    def fetch(self, key, dest_path):
+        """
+        Materializes a cached entry at dest_path (hard link, or copy across filesystems).
+
+        Returns:
+            bool: True on a cache hit.
+        """
+        path = self._lookup(key)
+        if path:
+            try:
+                if os.path.lexists(dest_path):
+                    os.remove(dest_path)
+                try:
+                    os.link(path, dest_path)
+                except OSError:
+                    _replace_from(path, dest_path)
+                self.hits += 1
+                return True
+            except FileNotFoundError:
+                # Evicted by another process between lookup and link
+                pass
+        self.misses += 1
+        return False
+
+    def put(self, key, src_path):
+        """
+        Stores a copy of src_path under key and enforces the cache limits.
+
+        Returns:
+            str: Path of the cached entry.
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _replace_from(src_path, path)
+        self.evict()
+        return path
+
+    def get_bytes(self, key):
+        path = self._lookup(key)
+        if path:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                self.hits += 1
+                return data
+            except FileNotFoundError:
+                pass
+        self.misses += 1
+        return None
+
+    def put_bytes(self, key, data):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.evict()
+        return path
+
+    def get_json(self, key):
+        data = self.get_bytes(key)
+        if data is None:
+            return None
+        try:
+            return json.loads(data)
+        except ValueError:
+            return None
+
+    def put_json(self, key, value):
+        return self.put_bytes(key, json.dumps(value).encode("utf-8"))
+
+    def _entries(self):
+        for sub in os.listdir(self.directory):
+            sub_dir = os.path.join(self.directory, sub)
+            if not os.path.isdir(sub_dir):
+                continue
+            for name in os.listdir(sub_dir):
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(sub_dir, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+    def evict(self):
+        """
+        Removes expired entries, then least recently used ones until under max_bytes.
+
+        Returns:
+            int: Number of entries removed.
+        """
+        if self.max_bytes is None and self.max_age is None:
+            return 0
+
+        removed = 0
+        now = time.time()
+        with self._locked():
+            live = []
+            for path, stat in self._entries():
+                if self.max_age is not None and now - stat.st_mtime > self.max_age:
+                    self._remove(path)
+                    removed += 1
+                else:
+                    live.append((stat.st_atime, stat.st_size, path))
+
+            if self.max_bytes is not None:
+                total = sum(size for _, size, _ in live)
+                live.sort()
+                for _, size, path in live:
+                    if total <= self.max_bytes:
+                        break
+                    self._remove(path)
+                    total -= size
+                    removed += 1
+        return removed
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def stats(self):
+        """
+        Returns:
+            dict: hits, misses, entries and bytes currently on disk.
+        """
+        entries = 0
+        total = 0
+        for _, stat in self._entries():
+            entries += 1
+            total += stat.st_size
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": total}
+
+    def clear(self):
+        with self._locked():
+            for path, _ in list(self._entries()):
+                self._remove(path)
@@ -0,0 +1,206 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+# Words that carry no meaning in a stock footage query
+STOPWORDS = {"a", "an", "and", "at", "by", "for", "from", "in", "into", "of", "on", "or", "the", "to", "with"}
+
+# Weight of a match on the clip's Pexels tags/URL words relative to one on a
+# query it was already fetched for
+DESCRIPTION_WEIGHT = 0.9
+
+# Query terms a description must share before it counts as a match; one shared
+# word ("people", "city") says little about a clip with dozens of tags
+MIN_DESCRIPTION_TERMS = 2
+
+def tokenize(text):
+    """
+    Splits a query or description into normalized terms.
+
+    Lowercases, drops stopwords and strips plural "s", so "Ocean Waves" and
+    "the wave of an ocean" give the same terms.
+
+    Returns:
+        set: The terms.
+    """
+    terms = set()
+    for word in re.findall(r"[a-z0-9]+", (text or "").lower()):
+        if word in STOPWORDS or word.isdigit():
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.add(word)
+    return terms
+
+def describe_video(video_data):
+    """Returns the descriptive words Pexels gives a video (its tags and page URL slug)."""
+    tags = video_data.get("tags") or []
+    words = [tag.get("name", "") if isinstance(tag, dict) else str(tag) for tag in tags]
+    # Page URLs look like https://www.pexels.com/video/waves-crashing-on-a-beach-855014/
+    slug = urlparse(video_data.get("url") or "").path.rstrip("/").rsplit("/", 1)[-1]
+    words.append(slug.replace("-", " "))
+    return " ".join(words)
+
+def _dice(a, b):
+    return 2 * len(a & b) / (len(a) + len(b)) if a and b else 0.0
+
+class FootageIndex:
+    """
+    A local, searchable index of every clip in the footage cache.
+
+    Each clip is stored with the queries it was fetched for, its Pexels tags
+    and URL words, duration and resolution, in SQLite (safe to share between
+    processes), with an inverted term table for fast candidate lookup. A new
+    query matches a clip by term overlap, so "waves ocean" or "ocean wave"
+    reuse footage fetched for "ocean waves" without calling Pexels.
+
+    Args:
+        path (str): SQLite database file.
+        threshold (float): Minimum match score (0-1) for find() to return a clip.
+    """
+
+    def __init__(self, path, threshold=0.75):
+        self.path = path
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    clip_key TEXT PRIMARY KEY,
+                    video_id TEXT,
+                    queries TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    duration REAL,
+                    width INTEGER,
+                    height INTEGER,
+                    added_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS terms (
+                    term TEXT NOT NULL,
+                    clip_key TEXT NOT NULL,
+                    PRIMARY KEY (term, clip_key)
+                );
+            """)
+
+    @contextmanager
+    def _connect(self):
+        # One short-lived connection per call, so threads and processes never share one
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def add(self, clip_key, query, video_id=None, description="", duration=None, width=None, height=None):
+        """
+        Indexes a cached clip, or adds another query to an indexed one.
+
+        Args:
+            clip_key (str): The clip's key in the footage cache.
+            query (str): Search query the clip was fetched for.
+            video_id: Pexels video id.
+            description (str): Pexels tags/URL words (see describe_video).
+            duration (float): Seconds of footage in the cached file (None = whole clip, unknown).
+            width, height (int): Resolution of the cached rendition.
+        """
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT queries FROM clips WHERE clip_key = ?", (clip_key,)).fetchone()
+            queries = json.loads(row[0]) if row else []
+            if query not in queries:
+                queries.append(query)
+            db.execute(
+                "INSERT OR REPLACE INTO clips VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (clip_key, None if video_id is None else str(video_id), json.dumps(queries),
+                 description or "", duration, width, height, time.time())
+            )
+            terms = tokenize(description).union(*(tokenize(q) for q in queries))
+            db.executemany("INSERT OR IGNORE INTO terms VALUES (?, ?)", [(term, clip_key) for term in terms])
+
+    def add_query(self, clip_key, query):
+        """Records that an indexed clip also served `query`, so it matches that wording directly next time."""
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT queries FROM clips WHERE clip_key = ?", (clip_key,)).fetchone()
+            if row is None:
+                return
+            queries = json.loads(row[0])
+            if query not in queries:
+                queries.append(query)
+                db.execute("UPDATE clips SET queries = ? WHERE clip_key = ?", (json.dumps(queries), clip_key))
+                db.executemany("INSERT OR IGNORE INTO terms VALUES (?, ?)",
+                               [(term, clip_key) for term in tokenize(query)])
+
+    def remove(self, clip_key):
+        """Drops a clip (e.g. once it has been evicted from the footage cache)."""
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM clips WHERE clip_key = ?", (clip_key,))
+            db.execute("DELETE FROM terms WHERE clip_key = ?", (clip_key,))
+
+    @staticmethod
+    def score(query_terms, queries, description):
+        """
+        Scores how well an indexed clip matches a query (0-1).
+
+        The best Dice overlap with one of the clip's past queries, or the share
+        of query terms found in its Pexels description (weighted down) when
+        they share at least MIN_DESCRIPTION_TERMS terms.
+        """
+        query_score = max((_dice(query_terms, tokenize(q)) for q in queries), default=0.0)
+        shared = len(query_terms & tokenize(description))
+        description_score = shared / len(query_terms) if shared >= MIN_DESCRIPTION_TERMS else 0.0
+        return max(query_score, DESCRIPTION_WEIGHT * description_score)
+
+    def find(self, query, min_duration=None, min_size=None, exclude=()):
+        """
+        Returns the best indexed clip for a query, or None.
+
+        Args:
+            query (str): Scene search query.
+            min_duration (float): Seconds of footage needed; partial clips must be at least this long.
+            min_size (tuple): (width, height) the clip must cover, when its resolution is known.
+            exclude (collection): Pexels video ids (as str) that must not be returned.
+
+        Returns:
+            dict or None: clip_key, video_id, score, duration, width, height.
+        """
+        query_terms = tokenize(query)
+        if not query_terms:
+            return None
+        placeholders = ",".join("?" * len(query_terms))
+        with self._connect() as db:
+            rows = db.execute(
+                f"SELECT clip_key, video_id, queries, description, duration, width, height FROM clips "
+                f"WHERE clip_key IN (SELECT clip_key FROM terms WHERE term IN ({placeholders}))",
+                sorted(query_terms)
+            ).fetchall()
+
+        best = None
+        for clip_key, video_id, queries, description, duration, width, height in rows:
+            if video_id in exclude:
+                continue
+            # A leading portion only serves scenes it is long enough for
+            if duration is not None and (not min_duration or duration < min_duration):
+                continue
+            if min_size and width and height and (width < min_size[0] or height < min_size[1]):
+                continue
+            score = self.score(query_terms, json.loads(queries), description)
+            if score >= self.threshold and (best is None or score > best["score"]):
+                best = {"clip_key": clip_key, "video_id": video_id, "score": round(score, 3),
+                        "duration": duration, "width": width, "height": height}
+        return best
+
+    def stats(self):
+        with self._connect() as db:
+            clips, = db.execute("SELECT COUNT(*) FROM clips").fetchone()
+        return {"clips": clips}
+
+    def clear(self):
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM clips")
+            db.execute("DELETE FROM terms")
@@ -0,0 +1,258 @@
+import os
+import re
+import json
+import time
+import uuid
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import utils
+import manifest
+import metrics
+import pipeline
+import media_server
+
+# Every job gets its own directory here with its input, assets, status and output
+JOBS_DIR = os.getenv("JOBS_DIR", "jobs")
+
+# Renders that may run at once in this process; further jobs wait in the queue
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+
+# Finished jobs (and their outputs) are deleted after this many seconds
+JOB_RETENTION = float(os.getenv("JOB_RETENTION", str(24 * 3600)))
+
+STATUS_FILENAME = "status.json"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+class JobManager:
+    """
+    Runs pipeline jobs on a bounded pool of background workers.
+
+    Job state lives in <jobs_dir>/<job_id>/status.json, so the UI can poll a job
+    from any rerun or browser session and a page refresh does not lose work.
+    """
+
+    def __init__(self, jobs_dir=JOBS_DIR, max_workers=JOB_WORKERS):
+        self.jobs_dir = os.path.abspath(jobs_dir)
+        os.makedirs(self.jobs_dir, exist_ok=True)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._mark_interrupted()
+        self.prune()
+
+    @staticmethod
+    def is_valid_id(job_id):
+        return bool(job_id) and re.fullmatch(r"[0-9a-f]{12}", job_id) is not None
+
+    def job_dir(self, job_id):
+        if not self.is_valid_id(job_id):
+            raise ValueError(f"Invalid job id: {job_id!r}")
+        return os.path.join(self.jobs_dir, job_id)
+
+    def _status_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), STATUS_FILENAME)
+
+    def _job_ids(self):
+        return [name for name in os.listdir(self.jobs_dir) if self.is_valid_id(name)]
+
+    def _mark_interrupted(self):
+        # Jobs left active by a server process that is gone will never finish
+        for job_id in self._job_ids():
+            status = self.status(job_id)
+            if status and status["state"] in ACTIVE_STATES and not _pid_alive(status.get("owner_pid")):
+                self._update(job_id, state=FAILED, error="Interrupted by a server restart. Retry to resume.")
+
+    def prune(self, max_age=JOB_RETENTION):
+        """Deletes finished jobs older than max_age seconds."""
+        now = time.time()
+        for job_id in self._job_ids():
+            status = self.status(job_id)
+            if status and status["state"] not in ACTIVE_STATES and now - status.get("updated_at", now) > max_age:
+                self.delete(job_id)
+
+    def status(self, job_id):
+        """
+        Returns:
+            dict or None: The job's status, or None if the job does not exist.
+        """
+        if not self.is_valid_id(job_id):
+            return None
+        try:
+            with open(self._status_path(job_id)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _update(self, job_id, warning=None, **fields):
+        with self._lock:
+            status = self.status(job_id) or {}
+            status.update(fields)
+            if warning:
+                status.setdefault("warnings", []).append(warning)
+            status["updated_at"] = time.time()
+            # Atomic, so pollers never read a half-written status
+            utils.write_atomic(self._status_path(job_id), json.dumps(status, indent=2))
+            return status
+
+    def submit(self, filename, data, options=None):
+        """
+        Queues a new job for an uploaded document.
+
+        Args:
+            filename (str): Original file name (its extension selects PDF/TXT handling).
+            data (bytes): File contents.
+            options (dict): Pipeline options (see pipeline.DEFAULT_OPTIONS).
+
+        Returns:
+            str: The new job id.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job_dir = self.job_dir(job_id)
+        os.makedirs(job_dir)
+
+        _, ext = os.path.splitext(filename)
+        source_path = os.path.join(job_dir, "input" + ext.lower())
+        with open(source_path, "wb") as f:
+            f.write(data)
+
+        self._update(
+            job_id,
+            id=job_id,
+            filename=filename,
+            source_path=source_path,
+            options=options or {},
+            state=QUEUED,
+            progress=0,
+            message="Waiting for a free worker...",
+            warnings=[],
+            error=None,
+            output_path=None,
+            playlist=None,
+            owner_pid=os.getpid(),
+            created_at=time.time()
+        )
+        self.executor.submit(self._run, job_id)
+        return job_id
+
+    def retry(self, job_id, script=None, options=None):
+        """
+        Re-queues a finished or failed job in its existing directory.
+
+        The pipeline resumes from the job's manifest, so completed phases and
+        scenes are not redone.
+
+        Args:
+            job_id (str): The job to retry.
+            script (list): Optional edited script; only scenes whose text or
+                query changed get new audio, footage and render segments.
+            options (dict): Optional overrides of the job's pipeline options.
+
+        Returns:
+            bool: False if the job does not exist or is still active.
+        """
+        status = self.status(job_id)
+        if status is None or status["state"] in ACTIVE_STATES:
+            return False
+
+        if script is not None:
+            job_dir = self.job_dir(job_id)
+            job_manifest = manifest.JobManifest.load(job_dir)
+            entry = job_manifest.phase("script")
+            if entry:
+                script_path = os.path.join(job_dir, pipeline.SCRIPT_FILENAME)
+                with open(script_path, "w") as f:
+                    json.dump(script, f, indent=2)
+                job_manifest.complete_phase("script", job_manifest.make_entry(script_path, entry["input_hash"]))
+
+        self._update(
+            job_id,
+            options=dict(status["options"], **(options or {})),
+            state=QUEUED,
+            progress=0,
+            message="Waiting for a free worker...",
+            warnings=[],
+            error=None,
+            playlist=None,
+            owner_pid=os.getpid()
+        )
+        self.executor.submit(self._run, job_id)
+        return True
+
+    def finalize(self, job_id):
+        """
+        Re-renders a finished preview job at full quality.
+
+        Audio, footage and the script are reused from the preview run; only the
+        scene segments and the output are rendered again.
+
+        Returns:
+            bool: False if the job does not exist or is still active.
+        """
+        return self.retry(job_id, options={"render_profile": "final"})
+
+    def _run(self, job_id):
+        status = self._update(job_id, state=RUNNING, started_at=time.time())
+
+        def report(progress=None, message=None, warning=None, script=None, playlist=None):
+            fields = {}
+            if progress is not None:
+                fields["progress"] = progress
+            if message is not None:
+                fields["message"] = message
+            if script is not None:
+                fields["script_ready"] = True
+            if playlist is not None:
+                # Relative to the job directory; see media_server
+                fields["playlist"] = playlist
+            self._update(job_id, warning=warning, **fields)
+
+        options = dict(status["options"])
+        if options.pop("publish_media", False):
+            # Playable outputs go where the browser can stream them (see media_server)
+            options["publish_dir"] = media_server.publish_dir(job_id)
+            # Make room for this job's segments before it starts publishing them
+            media_server.prune(keep=job_id)
+        try:
+            output_path, error = pipeline.run_pipeline(
+                status["source_path"], self.job_dir(job_id), options, report
+            )
+        except Exception as e:
+            output_path, error = None, f"Unexpected error: {e}"
+
+        if error:
+            self._update(job_id, state=FAILED, error=error, finished_at=time.time())
+        else:
+            self._update(job_id, state=DONE, output_path=output_path, finished_at=time.time())
+
+    def script(self, job_id):
+        """Returns the job's generated script, or None if not generated yet."""
+        try:
+            with open(os.path.join(self.job_dir(job_id), pipeline.SCRIPT_FILENAME)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def spans(self, job_id):
+        """Returns the timing spans of the job's latest run (see metrics.span)."""
+        return metrics.load(os.path.join(self.job_dir(job_id), metrics.METRICS_FILENAME))
+
+    def delete(self, job_id):
+        shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        media_server.unpublish(job_id)
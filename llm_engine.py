@@ -1,38 +1,82 @@
 import os
 import json
-import google.generativeai as genai
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+import cache
+import metrics
+import utils
+
 load_dotenv()
 
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY") or os.getenv("GEMINI_API_KEY")
 if GOOGLE_API_KEY:
     GOOGLE_API_KEY = GOOGLE_API_KEY.strip()
-    genai.configure(api_key=GOOGLE_API_KEY)
 
-def generate_script(text_content, model_name='gemini-1.5-flash'):
+# Gemini model clients, created on first use and shared by every job in the process
+_models = {}
+_models_lock = threading.Lock()
+
+# Max characters of source text sent to the model in one request
+MAX_INPUT_CHARS = 30000
+
+# Long-document mode: the text (up to MAX_DOCUMENT_CHARS) is split into chunks
+# of about SCRIPT_CHUNK_TOKENS tokens, whose scenes are generated concurrently
+# and joined into one script (see generate_long_script)
+LONG_DOCUMENTS = os.getenv("LONG_DOCUMENTS", "1") == "1"
+MAX_DOCUMENT_CHARS = int(os.getenv("MAX_DOCUMENT_CHARS", "400000"))
+SCRIPT_CHUNK_TOKENS = int(os.getenv("SCRIPT_CHUNK_TOKENS", "6000"))
+# Chunk requests in flight at once per document
+SCRIPT_CONCURRENCY = int(os.getenv("SCRIPT_CONCURRENCY", "4"))
+# Rough size of a Gemini token in English text, to budget chunks without a count_tokens call
+CHARS_PER_TOKEN = 4
+
+# Bump whenever the prompt changes so cached scripts from the old prompt are not reused
+PROMPT_VERSION = 1
+
+# Generated scripts, keyed by (cleaned text, model, prompt version)
+SCRIPT_CACHE_MAX_BYTES = int(os.getenv("SCRIPT_CACHE_MAX_BYTES", str(64 * 1024**2)))
+SCRIPT_CACHE_TTL = float(os.getenv("SCRIPT_CACHE_TTL", str(7 * 24 * 3600)))
+SCRIPT_CACHE = cache.DiskCache("scripts", max_bytes=SCRIPT_CACHE_MAX_BYTES, max_age=SCRIPT_CACHE_TTL)
+
+def get_model(model_name):
     """
-    Generates a video script from the provided text content using Google Gemini.
-    
-    Args:
-        text_content (str): The source text to analyze.
-        model_name (str): The Gemini model to use.
-        
-    Returns:
-        tuple: (list of dicts, error message)
+    Returns the process-wide GenerativeModel for model_name.
+
+    google.generativeai (grpc, protobuf) is imported and configured here on
+    first use rather than at import time, so pages that never call Gemini
+    do not load it.
     """
-    if not GOOGLE_API_KEY:
-        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+    with _models_lock:
+        if model_name not in _models:
+            import google.generativeai as genai
+            genai.configure(api_key=GOOGLE_API_KEY)
+            _models[model_name] = genai.GenerativeModel(model_name)
+        return _models[model_name]
 
-    model = genai.GenerativeModel(model_name)
+def _part_instruction(part, parts):
+    # Empty for a whole document, so its prompt (and cached script) is unchanged
+    if parts <= 1:
+        return ""
+    opening = "Open with a short introduction to the topic." if part == 1 else \
+        "Continue the narration; do not introduce the topic again."
+    ending = "End with a short conclusion." if part == parts else \
+        "Do not conclude or sign off; the next part continues the video."
+    return f"""
+    
+    **CONTEXT:** The text below is part {part} of {parts} of a longer document. The scripts
+    of all parts are played back to back as one video. Only cover this part. {opening} {ending}"""
 
-    prompt = f"""
+def _build_prompt(text_content, part=1, parts=1):
+    return f"""
     You are an expert video essayist and documentarian. 
     Analyze the following text and create a compelling video script.
     
     **CRITICAL INSTRUCTION:** Break the script into MANY short scenes. 
     Each scene must be between **5 to 10 seconds** long. 
-    Do not write long paragraphs. Split long sentences into multiple scenes.
+    Do not write long paragraphs. Split long sentences into multiple scenes.{_part_instruction(part, parts)}
     
     The output MUST be a strictly valid JSON string representing a list of scenes.
     
@@ -43,13 +87,54 @@ def generate_script(text_content, model_name='gemini-1.5-flash'):
     - "duration_estimate": Integer, estimated duration in seconds (aim for 5-10).
     
     Text to analyze:
-    {text_content[:30000]}
+    {text_content[:MAX_INPUT_CHARS]}
+    """
+
+def generate_script(text_content, model_name='gemini-1.5-flash', use_cache=True):
+    """
+    Generates a video script from the provided text content using Google Gemini.
+    
+    Valid scripts are cached in SCRIPT_CACHE, so retrying the same document with
+    the same model returns instantly without an API call.
+    
+    Args:
+        text_content (str): The source text to analyze.
+        model_name (str): The Gemini model to use.
+        use_cache (bool): Whether to read from / write to the script cache.
+        
+    Returns:
+        tuple: (list of dicts, error message)
     """
+    script_key = cache.make_key("script", PROMPT_VERSION, model_name, text_content)
+    with metrics.span("llm", model=model_name, streaming=False, cache_hit=False) as llm_span:
+        if use_cache:
+            script_data = SCRIPT_CACHE.get_json(script_key)
+            if script_data is not None:
+                llm_span["cache_hit"] = True
+                return script_data, None
 
+        script_data, error = _request_script(_build_prompt(text_content), model_name, llm_span)
+        if use_cache and isinstance(script_data, list) and script_data:
+            SCRIPT_CACHE.put_json(script_key, script_data)
+        return script_data, error
+
+def _request_script(prompt, model_name, llm_span):
+    """
+    Sends one script prompt to Gemini and parses the JSON reply.
+    
+    Returns:
+        tuple: (parsed JSON, error message)
+    """
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
+    model = get_model(model_name)
+    response_text = ""
     try:
         # Use JSON mode for reliability
         response = model.generate_content(prompt, generation_config={"response_mime_type": "application/json"})
         response_text = response.text.strip()
+        llm_span["bytes"] = len(response_text.encode())
         
         # Clean up potential markdown code blocks if the model ignores the instruction (less likely with JSON mode but good safety)
         if response_text.startswith("```json"):
@@ -59,14 +144,276 @@ def generate_script(text_content, model_name='gemini-1.5-flash'):
         if response_text.endswith("```"):
             response_text = response_text[:-3]
             
-        script_data = json.loads(response_text)
-        return script_data, None
+        return json.loads(response_text), None
 
     except json.JSONDecodeError as e:
+        llm_span["error"] = True
         error_msg = f"JSON Decode Error: {e}\nRaw Output: {response_text}"
         print(error_msg)
         return None, error_msg
     except Exception as e:
+        llm_span["error"] = True
         error_msg = f"Gemini API Error: {e}"
         print(error_msg)
         return None, error_msg
+
+def split_document(text_content, chunk_tokens=SCRIPT_CHUNK_TOKENS):
+    """
+    Splits a document into the chunks long-document mode sends to Gemini.
+    
+    Args:
+        text_content (str): Cleaned source text; only the first MAX_DOCUMENT_CHARS are used.
+        chunk_tokens (int): Approximate token budget per chunk (capped at MAX_INPUT_CHARS).
+        
+    Returns:
+        list: Chunks in document order.
+    """
+    max_chars = min(chunk_tokens * CHARS_PER_TOKEN, MAX_INPUT_CHARS)
+    return utils.chunk_text(text_content[:MAX_DOCUMENT_CHARS], max_chars)
+
+def _generate_part(chunk, part, parts, model_name, use_cache):
+    """
+    Generates the scenes of one chunk, cached per chunk so a retry only
+    requests the parts that failed.
+    
+    Raises:
+        RuntimeError: If the reply is not a non-empty list of scenes.
+    """
+    part_key = cache.make_key("script_part", PROMPT_VERSION, model_name, part, parts, chunk)
+    with metrics.span("llm", model=model_name, streaming=False, cache_hit=False, part=part, parts=parts) as llm_span:
+        if use_cache:
+            script_data = SCRIPT_CACHE.get_json(part_key)
+            if script_data is not None:
+                llm_span["cache_hit"] = True
+                return script_data
+
+        script_data, error = _request_script(_build_prompt(chunk, part, parts), model_name, llm_span)
+        if error:
+            raise RuntimeError(f"Part {part}/{parts}: {error}")
+        if not isinstance(script_data, list) or not script_data:
+            llm_span["error"] = True
+            raise RuntimeError(f"Part {part}/{parts}: expected a non-empty list of scenes.")
+        if use_cache:
+            SCRIPT_CACHE.put_json(part_key, script_data)
+        return script_data
+
+def _iter_parts(chunks, model_name, use_cache, max_workers):
+    """
+    Generates the scenes of all chunks concurrently (at most max_workers
+    requests at once) and yields each chunk's scene list in document order.
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks))), thread_name_prefix="script")
+    try:
+        futures = [
+            executor.submit(metrics.bind(_generate_part), chunk, part, len(chunks), model_name, use_cache)
+            for part, chunk in enumerate(chunks, 1)
+        ]
+        for future in futures:
+            yield future.result()
+    finally:
+        # A failed part makes the rest useless; don't start them
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def merge_scripts(parts):
+    """
+    Joins per-chunk scene lists into one script.
+    
+    Args:
+        parts (iterable): Scene lists in document order.
+        
+    Returns:
+        list: All scenes, with scene_id renumbered from 1.
+    """
+    script_data = []
+    for part in parts:
+        for scene in part:
+            script_data.append(dict(scene, scene_id=len(script_data) + 1))
+    return script_data
+
+def generate_long_script(text_content, model_name='gemini-1.5-flash', use_cache=True,
+                         max_workers=SCRIPT_CONCURRENCY, chunk_tokens=SCRIPT_CHUNK_TOKENS):
+    """
+    Generates a video script for a document of any length (up to MAX_DOCUMENT_CHARS).
+    
+    The text is split into token-budgeted chunks (see split_document) whose
+    scenes are requested concurrently and merged in order, so latency grows
+    with chunks / max_workers rather than with document length. A document
+    that fits in one chunk is handled exactly like generate_script.
+    
+    Args:
+        text_content (str): The source text to analyze.
+        model_name (str): The Gemini model to use.
+        use_cache (bool): Whether to read from / write to the script cache.
+        max_workers (int): Chunk requests in flight at once.
+        chunk_tokens (int): Approximate token budget per chunk.
+        
+    Returns:
+        tuple: (list of dicts, error message)
+    """
+    chunks = split_document(text_content, chunk_tokens)
+    if len(chunks) <= 1:
+        return generate_script(text_content, model_name, use_cache)
+    try:
+        return merge_scripts(_iter_parts(chunks, model_name, use_cache, max_workers)), None
+    except RuntimeError as e:
+        return None, str(e)
+
+class IncrementalJSONArrayParser:
+    """
+    Parses a JSON array as it streams in and returns each top-level element as
+    soon as it is complete.
+    
+    Anything before the opening '[' (such as a markdown code fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start = None
+        self.done = False
+
+    def feed(self, chunk):
+        """
+        Args:
+            chunk (str): Next piece of the response text.
+            
+        Returns:
+            list: Elements completed by this chunk (possibly empty).
+        """
+        self._buffer += chunk
+        elements = []
+        while self._pos < len(self._buffer) and not self.done:
+            char = self._buffer[self._pos]
+            if not self._started:
+                self._started = char == "["
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0:
+                    self._element_start = self._pos
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 0:
+                    # Closing bracket of the top-level array
+                    self.done = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        elements.append(json.loads(self._buffer[self._element_start:self._pos + 1]))
+                        self._element_start = None
+            self._pos += 1
+
+        # Drop consumed text, keeping any element still in progress
+        keep_from = self._pos if self._element_start is None else self._element_start
+        self._buffer = self._buffer[keep_from:]
+        self._pos -= keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+def stream_script(text_content, model_name='gemini-1.5-flash', use_cache=True):
+    """
+    Generates a video script like generate_script, but yields each scene as soon
+    as Gemini has streamed it, so per-scene work can start before the script is
+    complete.
+    
+    Args:
+        text_content (str): The source text to analyze.
+        model_name (str): The Gemini model to use.
+        use_cache (bool): Whether to read from / write to the script cache.
+        
+    Yields:
+        dict: One scene at a time.
+        
+    Raises:
+        ValueError: If the response is not a valid JSON list of scenes.
+        RuntimeError: If the Gemini API call fails.
+    """
+    script_key = cache.make_key("script", PROMPT_VERSION, model_name, text_content)
+    if use_cache:
+        started = time.perf_counter()
+        script_data = SCRIPT_CACHE.get_json(script_key)
+        if script_data is not None:
+            metrics.record("llm", time.perf_counter() - started, model=model_name, streaming=True, cache_hit=True)
+            yield from script_data
+            return
+
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables.")
+
+    model = get_model(model_name)
+    parser = IncrementalJSONArrayParser()
+    script_data = []
+    # Only time spent waiting on Gemini counts; a span around the loop would
+    # also time the consumer between yields
+    llm_span = {"model": model_name, "streaming": True, "cache_hit": False, "bytes": 0, "error": True}
+    waited = 0.0
+    try:
+        started = time.perf_counter()
+        response = iter(model.generate_content(
+            _build_prompt(text_content),
+            generation_config={"response_mime_type": "application/json"},
+            stream=True
+        ))
+        while True:
+            chunk = next(response, None)
+            waited += time.perf_counter() - started
+            if chunk is None:
+                break
+            llm_span["bytes"] += len(chunk.text.encode())
+            for scene in parser.feed(chunk.text):
+                if not script_data:
+                    llm_span["first_scene_s"] = round(waited, 3)
+                script_data.append(scene)
+                yield scene
+            started = time.perf_counter()
+        llm_span["error"] = not parser.done or not script_data
+    except json.JSONDecodeError as e:
+        raise ValueError(f"JSON Decode Error: {e}") from e
+    except Exception as e:
+        raise RuntimeError(f"Gemini API Error: {e}") from e
+    finally:
+        metrics.record("llm", waited, scenes=len(script_data), **llm_span)
+
+    if not parser.done or not script_data:
+        raise ValueError("JSON Decode Error: incomplete or empty scene list in streamed response.")
+    if use_cache:
+        SCRIPT_CACHE.put_json(script_key, script_data)
+
+def stream_long_script(text_content, model_name='gemini-1.5-flash', use_cache=True,
+                       max_workers=SCRIPT_CONCURRENCY, chunk_tokens=SCRIPT_CHUNK_TOKENS):
+    """
+    Streaming counterpart of generate_long_script.
+    
+    A document that fits in one chunk streams scene by scene (see
+    stream_script). Otherwise the chunks are generated concurrently and the
+    scenes of each are yielded, renumbered, as soon as it and every earlier
+    chunk are complete.
+    
+    Yields:
+        dict: One scene at a time.
+        
+    Raises:
+        ValueError: If the API key is missing or a streamed response is invalid.
+        RuntimeError: If a Gemini API call fails.
+    """
+    chunks = split_document(text_content, chunk_tokens)
+    if len(chunks) <= 1:
+        yield from stream_script(text_content, model_name, use_cache)
+        return
+    scene_id = 0
+    for part in _iter_parts(chunks, model_name, use_cache, max_workers):
+        for scene in part:
+            scene_id += 1
+            yield dict(scene, scene_id=scene_id)
@@ -0,0 +1,89 @@
+import os
+import json
+import hashlib
+
+import utils
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+def file_sha256(path):
+    """Returns the hex SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+class JobManifest:
+    """
+    Persistent record of a job's completed phases and per-scene outputs.
+
+    Every output is stored as an entry {"path", "sha256", "input_hash"}: the
+    file (relative to the job directory), a hash of its contents, and a hash of
+    the inputs it was produced from. An entry is fresh only if the file still
+    exists with the recorded contents and was built from the same inputs, so a
+    retry redoes exactly the work whose inputs changed or whose output is missing.
+    """
+
+    def __init__(self, job_dir, data=None):
+        self.job_dir = job_dir
+        self.data = data or {"version": MANIFEST_VERSION, "phases": {}, "scenes": []}
+
+    @classmethod
+    def load(cls, job_dir):
+        try:
+            with open(os.path.join(job_dir, MANIFEST_FILENAME)) as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                return cls(job_dir, data)
+        except (OSError, ValueError):
+            pass
+        return cls(job_dir)
+
+    def save(self):
+        utils.write_atomic(os.path.join(self.job_dir, MANIFEST_FILENAME), json.dumps(self.data, indent=2))
+
+    def make_entry(self, path, input_hash):
+        """Builds an entry for an output file that was just written."""
+        return {
+            "path": os.path.relpath(path, self.job_dir),
+            "sha256": file_sha256(path),
+            "input_hash": input_hash,
+        }
+
+    def is_fresh(self, entry, input_hash):
+        """True if the entry's file is intact and was produced from input_hash."""
+        if not entry or entry.get("input_hash") != input_hash:
+            return False
+        path = self.path(entry)
+        return os.path.exists(path) and file_sha256(path) == entry.get("sha256")
+
+    def path(self, entry):
+        return os.path.join(self.job_dir, entry["path"])
+
+    # Phases: extract, script, render (render_<profile> for non-final profiles)
+
+    def phase(self, name):
+        return self.data["phases"].get(name)
+
+    def complete_phase(self, name, entry):
+        self.data["phases"][name] = entry
+        self.save()
+
+    # Scenes: audio, video and segment (segment_<profile>) entries per scene index
+
+    def scene(self, index):
+        scenes = self.data["scenes"]
+        while len(scenes) <= index:
+            scenes.append({})
+        return scenes[index]
+
+    def set_scene_output(self, index, kind, entry):
+        self.scene(index)[kind] = entry
+        self.save()
+
+    def truncate_scenes(self, count):
+        """Drops records of scenes past the end of a (shorter) new script."""
+        del self.data["scenes"][count:]
+        self.save()
@@ -1,94 +1,854 @@
 import os
+import math
 import time
+import bisect
+import tempfile
+import shutil
+import subprocess
 import asyncio
-import edge_tts
-import requests
+import threading
+import functools
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
+import utils
+import cache
+import metrics
+import footage_index
+import pexels_client
+
 load_dotenv()
 
 PEXELS_API_KEY = os.getenv("PEXELS_API_KEY")
 if PEXELS_API_KEY:
     PEXELS_API_KEY = PEXELS_API_KEY.strip()
-PEXELS_API_URL = "https://api.pexels.com/videos/search"
 
-async def generate_audio(text, output_filename, voice="en-US-ChristopherNeural"):
+_pexels_client = None
+_pexels_client_lock = threading.Lock()
+
+# Output resolution/frame rate the footage is rendered at (see video_editor.OUTPUT_SIZE)
+TARGET_SIZE = (1920, 1080)
+TARGET_FPS = 24
+
+# Typical H.264 bits per pixel per frame for stock footage, used for size estimates
+BITS_PER_PIXEL = 0.1
+
+# Optional per-job footage download budget in MB (0 = unlimited)
+BANDWIDTH_BUDGET_MB = float(os.getenv("PEXELS_BANDWIDTH_BUDGET_MB", "0"))
+
+# Partial footage downloads: fetch the needed seconds plus a margin, but only
+# when that skips a meaningful part of the stock clip
+PARTIAL_DOWNLOADS = os.getenv("PARTIAL_DOWNLOADS", "1") == "1"
+PARTIAL_MARGIN_SECONDS = 1.0
+PARTIAL_MIN_SAVINGS_SECONDS = 5.0
+PARTIAL_DOWNLOAD_TIMEOUT = 120
+
+# Chunk sizes for full downloads, scaled to the file size
+MIN_CHUNK_SIZE = 64 * 1024
+MAX_CHUNK_SIZE = 1024 * 1024
+
+# Edge TTS outputs 24kHz 48kbit/s mono MP3, so duration follows from file size
+EDGE_TTS_BITRATE = 48000
+
+# Persistent clip cache shared by all jobs (and processes) on this machine
+CLIP_CACHE_MAX_BYTES = int(os.getenv("CLIP_CACHE_MAX_BYTES", str(2 * 1024**3)))
+CLIP_CACHE = cache.DiskCache("clips", max_bytes=CLIP_CACHE_MAX_BYTES)
+# Which clip each normalized query resolved to (small JSON records)
+QUERY_CACHE = cache.DiskCache("footage_queries")
+
+# Footage lookups of this process: hits are served from disk without a Pexels call
+# (counted once per download_pexels_video call, unlike the per-key cache counters)
+FOOTAGE_STATS = {"hits": 0, "misses": 0}
+_footage_stats_lock = threading.Lock()
+
+# Searchable index of the cached clips: a scene query that closely matches the
+# query/tags of a clip we already have is served from disk without a Pexels call
+FOOTAGE_REUSE = os.getenv("FOOTAGE_REUSE", "1") == "1"
+FOOTAGE_MATCH_THRESHOLD = float(os.getenv("FOOTAGE_MATCH_THRESHOLD", "0.75"))
+FOOTAGE_INDEX = footage_index.FootageIndex(
+    os.path.join(cache.CACHE_ROOT, "footage_index.sqlite3"), threshold=FOOTAGE_MATCH_THRESHOLD
+)
+
+# Memoized Edge TTS narrations, evicted by age and size
+AUDIO_CACHE_MAX_BYTES = int(os.getenv("AUDIO_CACHE_MAX_BYTES", str(512 * 1024**2)))
+AUDIO_CACHE_MAX_AGE = float(os.getenv("AUDIO_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+AUDIO_CACHE = cache.DiskCache("audio", max_bytes=AUDIO_CACHE_MAX_BYTES, max_age=AUDIO_CACHE_MAX_AGE)
+
+# Max number of scenes fetched at once (TTS jobs and Pexels calls each)
+DEFAULT_ASSET_CONCURRENCY = int(os.getenv("ASSET_CONCURRENCY", "4"))
+
+# Synthesize the narration of all scenes in one Edge TTS request and split it
+# at word boundaries, instead of one request per scene
+BATCH_NARRATION = os.getenv("BATCH_NARRATION", "0") == "1"
+# Scene texts are joined with a paragraph break, which Edge TTS reads as a pause
+NARRATION_SEPARATOR = "\n\n"
+# Edge TTS reports offsets in 100 ns ticks
+TICKS_PER_SECOND = 10_000_000
+
+async def generate_audio(text, output_filename, voice="en-US-ChristopherNeural",
+                         rate="+0%", volume="+0%", pitch="+0Hz", use_cache=True):
     """
     Generates audio from text using Edge TTS.
     
+    Narrations are memoized in AUDIO_CACHE by (text, voice, rate, volume, pitch),
+    so a hit costs a hard link/copy instead of a network synthesis.
+    
     Args:
         text (str): The text to convert to speech.
         output_filename (str): Path to save the audio file.
         voice (str): The voice to use.
+        rate (str): Speaking rate adjustment, e.g. "+10%".
+        volume (str): Volume adjustment, e.g. "-5%".
+        pitch (str): Pitch adjustment, e.g. "+0Hz".
+        use_cache (bool): Whether to read from / write to the audio cache.
     """
+    audio_key = cache.make_key("tts", text, voice, rate, volume, pitch)
+    with metrics.span("tts", chars=len(text)) as tts_span:
+        tts_span["cache_hit"] = bool(use_cache and AUDIO_CACHE.fetch(audio_key, output_filename))
+        if not tts_span["cache_hit"]:
+            await _synthesize_audio(text, output_filename, voice, rate, volume, pitch)
+            if use_cache and os.path.exists(output_filename):
+                AUDIO_CACHE.put(audio_key, output_filename)
+        if os.path.exists(output_filename):
+            tts_span["bytes"] = os.path.getsize(output_filename)
+        else:
+            tts_span["error"] = True
+
+async def _synthesize_audio(text, output_filename, voice, rate, volume, pitch):
+    # edge_tts (aiohttp) is only loaded once a narration is actually synthesized
+    import edge_tts
+
+    tmp_filename = output_filename + ".part"
     try:
-        communicate = edge_tts.Communicate(text, voice)
-        await communicate.save(output_filename)
+        communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
+        await communicate.save(tmp_filename)
         
         # Verify file exists and is not empty
-        if not os.path.exists(output_filename) or os.path.getsize(output_filename) == 0:
+        if not os.path.exists(tmp_filename) or os.path.getsize(tmp_filename) == 0:
             raise ValueError(f"Audio file generation failed: {output_filename} is missing or empty.")
+
+        os.replace(tmp_filename, output_filename)
             
     except Exception as e:
         print(f"Error generating audio: {e}")
-        # Ensure we don't leave a 0-byte file
-        if os.path.exists(output_filename) and os.path.getsize(output_filename) == 0:
-            os.remove(output_filename)
+    finally:
+        # Ensure we don't leave a partial or 0-byte file
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+def narration_cut_points(texts, boundaries):
+    """
+    Computes where a narration of NARRATION_SEPARATOR.join(texts) must be cut
+    so that every piece holds exactly one text.
+
+    Each word boundary is located in the joined text to find the scene it
+    belongs to. A cut lies halfway through the pause between the last word of
+    one scene and the first word of the next.
+
+    Args:
+        texts (list): Scene texts, in narration order.
+        boundaries (list): (offset_s, duration_s, word) tuples from Edge TTS.
+
+    Returns:
+        list: len(texts) - 1 cut times in seconds, or None if some scene has no
+            word boundary (the split would be unreliable).
+    """
+    joined = NARRATION_SEPARATOR.join(texts)
+    starts = []
+    position = 0
+    for text in texts:
+        starts.append(position)
+        position += len(text) + len(NARRATION_SEPARATOR)
+
+    first_word = [None] * len(texts)
+    last_word_end = [None] * len(texts)
+    cursor = 0
+    for offset, duration, word in boundaries:
+        found = joined.find(word, cursor)
+        if found < 0:
+            # Edge TTS normalized the word (e.g. numbers); it stays with the current scene
+            found = cursor
+        else:
+            cursor = found + len(word)
+        scene = bisect.bisect_right(starts, found) - 1
+        if first_word[scene] is None:
+            first_word[scene] = offset
+        last_word_end[scene] = offset + duration
+
+    if None in first_word:
+        return None
+    return [(last_word_end[i - 1] + first_word[i]) / 2 for i in range(1, len(texts))]
 
-def download_pexels_video(query, output_filename):
+async def _synthesize_with_boundaries(text, output_filename, voice, rate, volume, pitch):
+    """Synthesizes text in one Edge TTS request, returning its (offset_s, duration_s, word) boundaries."""
+    import edge_tts
+
+    try:
+        communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch, boundary="WordBoundary")
+    except TypeError:
+        # edge-tts < 7 always reports word boundaries and has no boundary argument
+        communicate = edge_tts.Communicate(text, voice, rate=rate, volume=volume, pitch=pitch)
+
+    boundaries = []
+    with open(output_filename, "wb") as f:
+        async for chunk in communicate.stream():
+            if chunk["type"] == "audio":
+                f.write(chunk["data"])
+            elif chunk["type"] == "WordBoundary":
+                boundaries.append((chunk["offset"] / TICKS_PER_SECOND, chunk["duration"] / TICKS_PER_SECOND, chunk["text"]))
+    return boundaries
+
+def _split_audio(audio_path, cut_points, output_filenames):
+    """
+    Splits an MP3 at cut_points (seconds, at least one) into output_filenames
+    with one ffmpeg stream copy (no re-encode).
+
+    Returns:
+        bool: True if every piece was written.
+    """
+    ffmpeg = utils.ffmpeg_binary()
+    if not ffmpeg:
+        return False
+
+    split_dir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(output_filenames[0])), prefix=".narration-")
+    try:
+        cmd = [
+            ffmpeg, "-y", "-loglevel", "error", "-i", audio_path, "-map", "0:a:0", "-c", "copy",
+            "-f", "segment", "-segment_times", ",".join(f"{t:.3f}" for t in cut_points),
+            # Without a Xing header the pieces stay plain CBR, so audio_duration() holds
+            "-reset_timestamps", "1", "-segment_format_options", "write_xing=0",
+            os.path.join(split_dir, "%04d.mp3")
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        pieces = [os.path.join(split_dir, f"{i:04d}.mp3") for i in range(len(output_filenames))]
+        if result.returncode != 0 or not all(os.path.exists(p) and os.path.getsize(p) for p in pieces):
+            print(f"Splitting narration failed: {result.stderr.strip()}")
+            return False
+        for piece, output_filename in zip(pieces, output_filenames):
+            os.replace(piece, output_filename)
+        return True
+    finally:
+        shutil.rmtree(split_dir, ignore_errors=True)
+
+async def generate_batch_audio(texts, output_filenames, voice="en-US-ChristopherNeural",
+                               rate="+0%", volume="+0%", pitch="+0Hz", use_cache=True):
+    """
+    Generates the narration of several scenes with a single Edge TTS request.
+
+    Scenes already in AUDIO_CACHE are linked into place; the rest are read as
+    one text, and the narration is cut into per-scene MP3s at the word
+    boundaries Edge TTS reports (see narration_cut_points). This saves a
+    connection handshake and synthesis request per scene. Scenes whose file
+    is missing afterwards (the batch failed) must fall back to generate_audio.
+
+    Args:
+        texts (list): Scene texts.
+        output_filenames (list): Path to save each scene's audio file.
+        voice, rate, volume, pitch: As for generate_audio.
+        use_cache (bool): Whether to read from / write to the audio cache.
+    """
+    keys = [cache.make_key("tts", text, voice, rate, volume, pitch) for text in texts]
+    pending = [
+        i for i, (key, output_filename) in enumerate(zip(keys, output_filenames))
+        if not (use_cache and AUDIO_CACHE.fetch(key, output_filename))
+    ]
+    if not pending:
+        return
+    if len(pending) == 1:
+        # Nothing to split; a single scene is already one request
+        i, = pending
+        await generate_audio(texts[i], output_filenames[i], voice, rate, volume, pitch, use_cache=use_cache)
+        return
+
+    pending_texts = [texts[i] for i in pending]
+    fd, narration_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(output_filenames[0])), prefix=".narration-", suffix=".mp3"
+    )
+    os.close(fd)
+    with metrics.span("tts", batch=True, scenes=len(pending), chars=sum(map(len, pending_texts))) as tts_span:
+        try:
+            boundaries = await _synthesize_with_boundaries(
+                NARRATION_SEPARATOR.join(pending_texts), narration_path, voice, rate, volume, pitch
+            )
+            tts_span["bytes"] = os.path.getsize(narration_path)
+            cut_points = narration_cut_points(pending_texts, boundaries)
+            if cut_points is None:
+                raise ValueError("Word boundaries do not cover every scene.")
+            if not _split_audio(narration_path, cut_points, [output_filenames[i] for i in pending]):
+                raise ValueError("Could not split the narration into scenes.")
+        except Exception as e:
+            print(f"Error generating batched narration, falling back to per-scene audio: {e}")
+            tts_span["error"] = True
+            return
+        finally:
+            os.remove(narration_path)
+
+    if use_cache:
+        for i in pending:
+            AUDIO_CACHE.put(keys[i], output_filenames[i])
+
+class BandwidthBudget:
+    """
+    A per-job download byte budget shared by all scenes (thread-safe).
+    
+    Each scene may use an equal share of whatever budget is still unspent,
+    split across the scenes that have not finished fetching footage yet.
+    """
+
+    def __init__(self, total_bytes, scenes=0):
+        self.remaining = total_bytes
+        self.pending = scenes
+        self._lock = threading.Lock()
+
+    def add_scene(self):
+        with self._lock:
+            self.pending += 1
+
+    def scene_done(self):
+        with self._lock:
+            self.pending = max(0, self.pending - 1)
+
+    def allowance(self):
+        with self._lock:
+            return max(0, self.remaining) // max(1, self.pending)
+
+    def consume(self, num_bytes):
+        with self._lock:
+            self.remaining -= num_bytes
+
+class VideoClaims:
+    """
+    The Pexels videos already used by one job (thread-safe), so the same clip
+    is not repeated within a single video.
+    """
+
+    def __init__(self):
+        self._ids = set()
+        self._lock = threading.Lock()
+
+    def claim(self, video_id):
+        """Marks a video as used; False if another scene already uses it (unknown ids always succeed)."""
+        if video_id is None:
+            return True
+        with self._lock:
+            if str(video_id) in self._ids:
+                return False
+            self._ids.add(str(video_id))
+            return True
+
+    def release(self, video_id):
+        with self._lock:
+            self._ids.discard(str(video_id))
+
+    def __contains__(self, video_id):
+        with self._lock:
+            return str(video_id) in self._ids
+
+    def snapshot(self):
+        with self._lock:
+            return frozenset(self._ids)
+
+def estimate_rendition_bytes(video_file, duration, download_seconds=None):
+    """
+    Estimates the download size of a Pexels rendition.
+    
+    Uses the reported file size when available, otherwise pixels * fps * duration
+    at a typical stock-footage H.264 bit depth. With `download_seconds`, only
+    that leading portion of the clip is counted.
+    """
+    if download_seconds and duration and download_seconds < duration:
+        fraction = download_seconds / duration
+    else:
+        fraction = 1.0
+    if video_file.get("size"):
+        return int(int(video_file["size"]) * fraction)
+    width = video_file.get("width") or 0
+    height = video_file.get("height") or 0
+    fps = video_file.get("fps") or TARGET_FPS
+    return int(width * height * fps * (duration or 0) * fraction * BITS_PER_PIXEL / 8)
+
+def select_rendition(video_files, target_size=TARGET_SIZE, target_fps=TARGET_FPS, max_bytes=None, duration=None,
+                     download_seconds=None):
+    """
+    Picks the Pexels rendition to download for a target output resolution.
+    
+    Prefers the smallest file that still covers the target (so the editor only
+    ever scales down a little), with the closest frame rate as tie-breaker. If
+    nothing covers the target, the largest available rendition is used. With
+    `max_bytes`, renditions whose estimated size exceeds the budget are skipped
+    (falling back to the smallest one if none fit).
+    
+    Args:
+        video_files (list): The "video_files" list of a Pexels video.
+        target_size (tuple): (width, height) of the rendered output.
+        target_fps (float): Frame rate of the rendered output.
+        max_bytes (int): Optional byte budget for this download.
+        duration (float): Clip duration in seconds (for size estimates).
+        download_seconds (float): Seconds actually downloaded, for a partial download.
+        
+    Returns:
+        dict or None: The chosen entry of video_files.
+    """
+    candidates = [f for f in video_files if f.get("link") and f.get("width") and f.get("height")]
+    if not candidates:
+        return None
+
+    target_width, target_height = target_size
+
+    def area(f):
+        return f["width"] * f["height"]
+
+    def fps_penalty(f):
+        return abs((f.get("fps") or target_fps) - target_fps)
+
+    if max_bytes is not None:
+        def estimate(f):
+            return estimate_rendition_bytes(f, duration, download_seconds)
+
+        affordable = [f for f in candidates if estimate(f) <= max_bytes]
+        if not affordable:
+            return min(candidates, key=lambda f: (estimate(f), fps_penalty(f)))
+        candidates = affordable
+
+    covering = [f for f in candidates if f["width"] >= target_width and f["height"] >= target_height]
+    if covering:
+        return min(covering, key=lambda f: (area(f), fps_penalty(f)))
+    return max(candidates, key=lambda f: (area(f), -fps_penalty(f)))
+
+def get_pexels_client():
+    """
+    Returns the process-wide PexelsClient (pooled session, shared rate limiter).
+    """
+    global _pexels_client
+    with _pexels_client_lock:
+        if _pexels_client is None:
+            _pexels_client = pexels_client.PexelsClient(PEXELS_API_KEY)
+        return _pexels_client
+
+def _normalize_query(query):
+    return " ".join(query.lower().split())
+
+def _download_file(url, output_filename, budget=None):
+    """
+    Streams a whole file to disk with chunk sizes scaled to its length.
+    
+    Returns:
+        tuple: (success (bool), error_message (str))
+    """
+    with metrics.span("download", cache_hit=False, partial=False) as download_span:
+        video_response = get_pexels_client().get(url, stream=True)
+        if video_response.status_code != 200:
+            download_span["error"] = True
+            return False, f"Failed to download video file: {video_response.status_code}"
+
+        content_length = int(video_response.headers.get("Content-Length") or 0)
+        chunk_size = min(MAX_CHUNK_SIZE, max(MIN_CHUNK_SIZE, content_length // 64))
+
+        # Write to a temp file and rename, so a failed download never leaves a partial clip
+        tmp_filename = output_filename + ".part"
+        downloaded = 0
+        try:
+            with open(tmp_filename, "wb") as f:
+                for chunk in video_response.iter_content(chunk_size=chunk_size):
+                    f.write(chunk)
+                    downloaded += len(chunk)
+            os.replace(tmp_filename, output_filename)
+        finally:
+            download_span["bytes"] = downloaded
+            if budget:
+                budget.consume(downloaded)
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+        return True, None
+
+def _download_leading_portion(url, output_filename, seconds, budget=None):
+    """
+    Fetches only the first `seconds` of a remote MP4 with ffmpeg stream copy.
+    
+    ffmpeg reads the index with HTTP range requests and stops reading once enough
+    media has arrived, so most of a long clip is never transferred.
+    
+    Returns:
+        bool: True if a playable clip was written.
+    """
+    ffmpeg = utils.ffmpeg_binary()
+    if not ffmpeg:
+        return False
+
+    tmp_filename = output_filename + ".part.mp4"
+    cmd = [
+        ffmpeg, "-y", "-loglevel", "error",
+        "-t", str(seconds), "-i", url,
+        "-map", "0:v:0", "-c", "copy", "-movflags", "+faststart", tmp_filename
+    ]
+    download_span = {"cache_hit": False, "partial": True, "seconds": seconds, "error": True}
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=PARTIAL_DOWNLOAD_TIMEOUT)
+        if result.returncode != 0 or not os.path.exists(tmp_filename) or os.path.getsize(tmp_filename) == 0:
+            print(f"Partial download failed, fetching full clip: {result.stderr.strip()}")
+            return False
+        download_span.update(bytes=os.path.getsize(tmp_filename), error=False)
+        if budget:
+            budget.consume(download_span["bytes"])
+        os.replace(tmp_filename, output_filename)
+        return True
+    except Exception as e:
+        print(f"Partial download failed, fetching full clip: {e}")
+        return False
+    finally:
+        metrics.record("download", time.perf_counter() - started, **download_span)
+        if os.path.exists(tmp_filename):
+            os.remove(tmp_filename)
+
+def _fetch_cached_clip(clip_key, output_filename):
+    """Links a cached clip into place, recording the hit as a download span."""
+    started = time.perf_counter()
+    if not CLIP_CACHE.fetch(clip_key, output_filename):
+        return False
+    metrics.record("download", time.perf_counter() - started, cache_hit=True,
+                   bytes=os.path.getsize(output_filename))
+    return True
+
+def _audio_path(output_dir, scene_id):
+    return os.path.join(output_dir, f"audio_{scene_id}.mp3")
+
+def _serve_cached_clip(entry, output_filename, used_videos=None):
+    """Links a cached clip into place unless another scene of the job already uses its video."""
+    video_id = entry.get("video_id")
+    if used_videos is not None and not used_videos.claim(video_id):
+        return False
+    if _fetch_cached_clip(entry["clip_key"], output_filename):
+        return True
+    if used_videos is not None and video_id is not None:
+        used_videos.release(video_id)
+    return False
+
+def _count_footage_lookup(outcome):
+    # Scenes look up footage from the asset executor's threads
+    with _footage_stats_lock:
+        FOOTAGE_STATS[outcome] += 1
+
+def footage_stats():
+    """
+    Returns:
+        dict: Footage hits and misses of this process (see FOOTAGE_STATS).
+    """
+    with _footage_stats_lock:
+        return dict(FOOTAGE_STATS)
+
+def _claim_video(videos, used_videos=None):
+    """Claims the first search result no other scene of the job uses yet (else the top result)."""
+    if used_videos is not None:
+        # claim() checks and marks in one step, so two scenes never take the same result
+        for video in videos:
+            if used_videos.claim(video.get("id")):
+                return video
+    # Every result is in use already; a repeated clip beats no footage
+    return videos[0]
+
+def _index_clip(clip_key, query, video_data, rendition, duration):
+    # The index only speeds up later lookups; never fail a download over it
+    try:
+        FOOTAGE_INDEX.add(
+            clip_key, query, video_id=video_data.get("id"), description=footage_index.describe_video(video_data),
+            duration=duration, width=rendition.get("width"), height=rendition.get("height")
+        )
+    except Exception as e:
+        print(f"Could not index clip for '{query}': {e}")
+
+def _find_similar_clip(query, query_key, output_filename, target_size, min_duration, used_videos):
+    """Serves the closest indexed clip for the query, if any matches well enough."""
+    with metrics.span("index_lookup", cache_hit=False) as lookup_span:
+        exclude = used_videos.snapshot() if used_videos is not None else ()
+        try:
+            match = FOOTAGE_INDEX.find(query, min_duration=min_duration, min_size=target_size, exclude=exclude)
+        except Exception as e:
+            print(f"Footage index lookup failed: {e}")
+            return False
+        if match is None:
+            return False
+        if not _serve_cached_clip(match, output_filename, used_videos):
+            if match["clip_key"] and not CLIP_CACHE.contains(match["clip_key"]):
+                # Evicted from the clip cache since it was indexed
+                FOOTAGE_INDEX.remove(match["clip_key"])
+            return False
+        lookup_span.update(cache_hit=True, score=match["score"])
+
+    # Next time this exact wording is a direct hit
+    QUERY_CACHE.put_json(query_key, {"clip_key": match["clip_key"], "video_id": match["video_id"],
+                                    "duration": match["duration"]})
+    FOOTAGE_INDEX.add_query(match["clip_key"], query)
+    return True
+
+def audio_duration(audio_path):
+    """
+    Returns the duration in seconds of an Edge TTS MP3 (constant bitrate), or None.
+    """
+    try:
+        return os.path.getsize(audio_path) * 8 / EDGE_TTS_BITRATE
+    except OSError:
+        return None
+
+def download_pexels_video(query, output_filename, use_cache=True, target_size=TARGET_SIZE, budget=None,
+                          min_duration=None, used_videos=None, reuse_similar=FOOTAGE_REUSE):
     """
     Searches for a video on Pexels and downloads it.
     
+    Clips are kept in the on-disk CLIP_CACHE keyed by Pexels video id, and
+    QUERY_CACHE remembers which video each query resolved to, so a repeated query is served
+    locally without any network call. A query that only closely matches one
+    seen before (e.g. "waves ocean" after "ocean waves") is served from
+    FOOTAGE_INDEX.
+    
     Args:
         query (str): Search query for the video.
         output_filename (str): Path to save the video file.
+        use_cache (bool): Whether to read from / write to the clip cache.
+        target_size (tuple): (width, height) of the rendered output, used to pick the rendition.
+        budget (BandwidthBudget): Optional per-job download budget.
+        min_duration (float): Seconds of footage the scene needs. When the stock clip
+            is much longer, only its leading portion is downloaded.
+        used_videos (VideoClaims): Videos other scenes of the job already use; they
+            are not picked again while another result is available.
+        reuse_similar (bool): Serve closely matching indexed clips (see FOOTAGE_INDEX).
         
     Returns:
         tuple: (success (bool), error_message (str))
     """
+    query_key = cache.make_key("query", _normalize_query(query))
+    if use_cache:
+        entry = QUERY_CACHE.get_json(query_key)
+        # A cached leading portion only serves scenes it is long enough for
+        long_enough = entry and (entry.get("duration") is None or (min_duration and entry["duration"] >= min_duration))
+        if (long_enough and _serve_cached_clip(entry, output_filename, used_videos)) or (
+                reuse_similar and _find_similar_clip(query, query_key, output_filename, target_size,
+                                                     min_duration, used_videos)):
+            _count_footage_lookup("hits")
+            return True, None
+        _count_footage_lookup("misses")
+
     if not PEXELS_API_KEY:
         return False, "PEXELS_API_KEY not found."
 
-    headers = {"Authorization": PEXELS_API_KEY}
     params = {
-        "query": query,
-        "per_page": 1,
         "orientation": "landscape",
         "size": "medium" # Use medium to save bandwidth/storage
     }
 
     try:
-        response = requests.get(PEXELS_API_URL, headers=headers, params=params)
+        # Pooled, rate-limited and retried; identical queries share one search
+        with metrics.span("search", query=query) as search_span:
+            videos = get_pexels_client().search_videos(query, **params)
+            search_span["results"] = len(videos)
         
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("videos"):
-                video_data = data["videos"][0]
-                video_files = video_data.get("video_files", [])
-                
-                # Find the best quality video file (e.g., HD)
-                # Sort by width to get decent quality
-                video_files.sort(key=lambda x: x.get("width", 0), reverse=True)
-                
-                # Pick the first one (highest res) or a specific quality if available
-                best_video = video_files[0]
-                download_link = best_video.get("link")
-                
-                if download_link:
-                    video_response = requests.get(download_link, stream=True)
-                    if video_response.status_code == 200:
-                        with open(output_filename, "wb") as f:
-                            for chunk in video_response.iter_content(chunk_size=8192):
-                                f.write(chunk)
+        if videos:
+            video_data = _claim_video(videos, used_videos)
+            video_files = video_data.get("video_files", [])
+
+            # Only fetch the leading portion when the stock clip is much longer than the scene
+            partial_seconds = None
+            clip_duration = video_data.get("duration") or 0
+            if min_duration and clip_duration > min_duration + PARTIAL_MIN_SAVINGS_SECONDS:
+                partial_seconds = math.ceil(min_duration + PARTIAL_MARGIN_SECONDS)
+            
+            # Smallest rendition that covers the output resolution (and whose
+            # downloaded portion fits the budget)
+            best_video = select_rendition(
+                video_files,
+                target_size=target_size,
+                max_bytes=budget.allowance() if budget else None,
+                duration=video_data.get("duration"),
+                download_seconds=partial_seconds
+            )
+            download_link = best_video.get("link") if best_video else None
+            
+            if download_link:
+                clip_key = cache.make_key("clip", video_data.get("id"), best_video.get("id"), download_link)
+                entry = {"clip_key": clip_key, "video_id": video_data.get("id"), "duration": None}
+
+                # Same video may already be cached under a different query
+                if use_cache and _fetch_cached_clip(clip_key, output_filename):
+                    QUERY_CACHE.put_json(query_key, entry)
+                    _index_clip(clip_key, query, video_data, best_video, None)
+                    return True, None
+
+                if partial_seconds:
+                    partial_key = cache.make_key("clip", video_data.get("id"), best_video.get("id"),
+                                                 download_link, partial_seconds)
+                    partial_entry = dict(entry, clip_key=partial_key, duration=partial_seconds)
+                    if use_cache and _fetch_cached_clip(partial_key, output_filename):
+                        QUERY_CACHE.put_json(query_key, partial_entry)
+                        _index_clip(partial_key, query, video_data, best_video, partial_seconds)
                         return True, None
-                    else:
-                        return False, f"Failed to download video file: {video_response.status_code}"
-                else:
-                    return False, "No download link found for video."
+                    if _download_leading_portion(download_link, output_filename, partial_seconds, budget):
+                        if use_cache:
+                            CLIP_CACHE.put(partial_key, output_filename)
+                            QUERY_CACHE.put_json(query_key, partial_entry)
+                            _index_clip(partial_key, query, video_data, best_video, partial_seconds)
+                        return True, None
+                    # Fall back to the full file below
+
+                success, error_msg = _download_file(download_link, output_filename, budget)
+                if success and use_cache:
+                    CLIP_CACHE.put(clip_key, output_filename)
+                    QUERY_CACHE.put_json(query_key, entry)
+                    _index_clip(clip_key, query, video_data, best_video, None)
+                return success, error_msg
             else:
-                return False, f"No videos found for query: {query}"
+                return False, "No download link found for video."
         else:
-            return False, f"Pexels API Error {response.status_code}: {response.text}"
+            return False, f"No videos found for query: {query}"
             
+    except pexels_client.PexelsError as e:
+        return False, str(e)
     except Exception as e:
         return False, f"Exception requesting video: {e}"
+
+async def generate_scene_assets(scenes, output_dir, max_concurrency=DEFAULT_ASSET_CONCURRENCY, on_scene_done=None,
+                                target_size=TARGET_SIZE, bandwidth_budget_mb=BANDWIDTH_BUDGET_MB,
+                                partial_downloads=PARTIAL_DOWNLOADS, existing_assets=None,
+                                batch_narration=False, reuse_similar_footage=FOOTAGE_REUSE):
+    """
+    Generates narration audio and downloads stock footage for every scene concurrently.
+    
+    All Edge TTS jobs run on the current event loop, while the blocking Pexels
+    search/download calls run on a bounded thread pool. At most `max_concurrency`
+    scenes are in flight at any time. `scenes` may also be an async iterable
+    (e.g. a script still being streamed from the LLM): each scene starts as soon
+    as it arrives.
+    
+    Args:
+        scenes (list or async iterable): Scene dicts from the LLM.
+        output_dir (str): Directory to write audio_<id>.mp3 / video_<id>.mp4 into.
+        max_concurrency (int): Max number of scenes processed at once.
+        on_scene_done (callable): Optional callback(index, result, completed, total),
+            called on the event loop thread as each scene finishes. total is None
+            while scenes are still arriving.
+        target_size (tuple): (width, height) of the rendered output.
+        bandwidth_budget_mb (float): Footage download budget for the whole job (0 = unlimited).
+        partial_downloads (bool): Synthesize each scene's narration first and download
+            only as much footage as it needs.
+        existing_assets (callable): Optional existing_assets(index, scene) returning the
+            subset of {"audio", "video"} already on disk that must not be produced again.
+        batch_narration (bool): Synthesize the audio of all scenes with one request
+            (see generate_batch_audio). Needs `scenes` to be a list.
+        reuse_similar_footage (bool): Serve scenes from closely matching clips in
+            FOOTAGE_INDEX. Within the job no Pexels video is used twice while
+            another result is available.
+        
+    Returns:
+        list: One dict per scene (in script order) with keys
+            scene_id, text, audio_path, video_path, errors (list of str).
+    """
+    max_concurrency = max(1, int(max_concurrency))
+    semaphore = asyncio.Semaphore(max_concurrency)
+    loop = asyncio.get_running_loop()
+    total = len(scenes) if isinstance(scenes, (list, tuple)) else None
+    completed = 0
+    budget = BandwidthBudget(int(bandwidth_budget_mb * 1024**2)) if bandwidth_budget_mb else None
+    used_videos = VideoClaims()
+
+    existing_by_scene = {}
+    narration = None
+    if batch_narration and isinstance(scenes, (list, tuple)):
+        # The batch needs every scene up front; footage fetching starts meanwhile
+        for i, scene in enumerate(scenes):
+            existing_by_scene[i] = existing_assets(i, scene) if existing_assets else ()
+        narrated = [i for i, scene in enumerate(scenes) if "audio" not in existing_by_scene[i]]
+        if narrated:
+            narration = asyncio.ensure_future(generate_batch_audio(
+                [scenes[i]["text"] for i in narrated],
+                [_audio_path(output_dir, scenes[i].get("scene_id", i+1)) for i in narrated]
+            ))
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="pexels") as executor:
+
+        async def process_scene(i, scene):
+            nonlocal completed
+            scene_id = scene.get("scene_id", i+1)
+            result = {
+                "scene_id": scene_id,
+                "text": scene["text"],
+                "audio_path": _audio_path(output_dir, scene_id),
+                "video_path": os.path.join(output_dir, f"video_{scene_id}.mp4"),
+                "errors": [],
+            }
+            query = scene.get("stock_video_query", "abstract background")
+            if i in existing_by_scene:
+                existing = existing_by_scene[i]
+            else:
+                existing = existing_assets(i, scene) if existing_assets else ()
+
+            async def make_audio():
+                if "audio" in existing:
+                    return
+                if narration:
+                    try:
+                        await asyncio.shield(narration)
+                    except Exception as e:
+                        print(f"Error generating batched narration: {e}")
+                    if os.path.exists(result["audio_path"]):
+                        return
+                await generate_audio(result["text"], result["audio_path"])
+
+            async def make_video(min_duration=None):
+                if "video" in existing:
+                    return True, None
+                # bind() carries the scene's metrics labels over to the worker thread
+                return await loop.run_in_executor(
+                    executor, metrics.bind(functools.partial(
+                        download_pexels_video, query, result["video_path"], target_size=target_size,
+                        budget=budget, min_duration=min_duration, used_videos=used_videos,
+                        reuse_similar=reuse_similar_footage
+                    ))
+                )
+
+            async with semaphore:
+                with metrics.labels(scene=scene_id), metrics.span("scene_assets"):
+                    if partial_downloads:
+                        # The narration length decides how much footage to fetch
+                        audio_outcome, = await asyncio.gather(make_audio(), return_exceptions=True)
+                        video_outcome, = await asyncio.gather(
+                            make_video(audio_duration(result["audio_path"])), return_exceptions=True
+                        )
+                    else:
+                        audio_outcome, video_outcome = await asyncio.gather(make_audio(), make_video(), return_exceptions=True)
+            if budget:
+                budget.scene_done()
+
+            if isinstance(audio_outcome, Exception) or not os.path.exists(result["audio_path"]):
+                result["errors"].append("Audio generation failed")
+            if isinstance(video_outcome, Exception):
+                result["errors"].append(f"Exception requesting video: {video_outcome}")
+            else:
+                success, error_msg = video_outcome
+                if not success:
+                    result["errors"].append(error_msg)
+
+            completed += 1
+            if on_scene_done:
+                on_scene_done(i, result, completed, total)
+            return result
+
+        tasks = []
+
+        def start(scene):
+            if budget:
+                budget.add_scene()
+            tasks.append(asyncio.ensure_future(process_scene(len(tasks), scene)))
+
+        if hasattr(scenes, "__aiter__"):
+            try:
+                async for scene in scenes:
+                    start(scene)
+            except Exception:
+                # Let scenes already started finish (their assets stay reusable), then fail
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            total = len(tasks)
+        else:
+            for scene in scenes:
+                start(scene)
+
+        return await asyncio.gather(*tasks)
@@ -0,0 +1,268 @@
+"""
+Publishes job videos and progressive HLS playlists and serves them from disk.
+
+st.video and st.download_button load a whole file into the app's memory and
+cannot play a video that is still being rendered. Instead, playable outputs
+of a job (its HLS playlist and segments, and the finished MP4) are written to
+MEDIA_ROOT/<job_id>/, which the browser fetches directly, in chunks and with
+Range requests for seeking:
+
+- By default MEDIA_ROOT is inside Streamlit's static folder, so the app's own
+  port serves it at app/static/media/ (needs server.enableStaticServing, see
+  .streamlit/config.toml). This works on single-port hosts such as Render.
+- With MEDIA_PORT set, start_http_server serves it on its own port instead.
+
+Streamlit's static route refuses files over STATIC_MAX_FILE_BYTES and turns
+static serving off at startup once the folder passes 1GB, so larger videos
+are not published (the app serves them itself) and every publish prunes
+MEDIA_ROOT to MEDIA_MAX_BYTES and MEDIA_RETENTION.
+"""
+import os
+import re
+import shutil
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs, unquote
+
+# Published job outputs; Streamlit serves <app dir>/static at app/static/
+MEDIA_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "media")
+STATIC_URL_PATH = "app/static/"
+
+# Port of a dedicated media server (0 = served by Streamlit's static file handler)
+MEDIA_PORT = int(os.getenv("MEDIA_PORT", "0"))
+
+# Base URL browsers reach the dedicated server at, e.g. behind an HTTPS proxy
+# (default: <scheme of the app request>://<app host>:MEDIA_PORT)
+MEDIA_URL = os.getenv("MEDIA_URL", "").rstrip("/")
+
+# Largest file Streamlit's static route serves (MAX_APP_STATIC_FILE_SIZE)
+STATIC_MAX_FILE_BYTES = 200 * 1024**2
+
+# Byte budget of MEDIA_ROOT, below Streamlit's 1GB static folder limit; the
+# least recently published jobs are unpublished past it
+MEDIA_MAX_BYTES = int(os.getenv("MEDIA_MAX_BYTES", str(768 * 1024**2)))
+# Seconds a job's outputs stay published (as long as the job itself, see jobs.py)
+MEDIA_RETENTION = float(os.getenv("JOB_RETENTION", str(24 * 3600)))
+
+CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_FILENAME = "ai_stock_video.mp4"
+
+# Only published outputs are served: rendered MP4s and HLS playlists/segments
+SERVABLE_PATH = re.compile(r"^/media/([0-9a-f]{12})/((?:hls[\w-]*/)?[\w-]+\.(?:mp4|m3u8|ts))$")
+
+CONTENT_TYPES = {
+    ".mp4": "video/mp4",
+    ".m3u8": "application/vnd.apple.mpegurl",
+    ".ts": "video/mp2t",
+}
+
+def publish_dir(job_id):
+    """Directory a job's playable outputs are published to."""
+    return os.path.join(MEDIA_ROOT, job_id)
+
+def unpublish(job_id):
+    shutil.rmtree(publish_dir(job_id), ignore_errors=True)
+
+def can_publish(path):
+    """True if the server the browser loads media from will serve this file."""
+    return bool(MEDIA_PORT) or os.path.getsize(path) <= STATIC_MAX_FILE_BYTES
+
+def _usage(directory):
+    # (bytes, newest mtime) of everything under a job's publish directory
+    total, newest = 0, os.path.getmtime(directory)
+    for dirpath, _, filenames in os.walk(directory):
+        for name in filenames:
+            try:
+                stat = os.stat(os.path.join(dirpath, name))
+            except FileNotFoundError:
+                continue
+            total += stat.st_size
+            newest = max(newest, stat.st_mtime)
+    return total, newest
+
+def prune(keep=None, max_bytes=MEDIA_MAX_BYTES, max_age=MEDIA_RETENTION, root=None):
+    """
+    Unpublishes jobs not published to for max_age seconds, then the least
+    recently published ones until the published outputs fit in max_bytes.
+
+    Args:
+        keep (str): Job being published; never removed.
+        root (str): Publish root (defaults to MEDIA_ROOT).
+
+    Returns:
+        list: The unpublished job ids.
+    """
+    root = root or MEDIA_ROOT
+    if not os.path.isdir(root):
+        return []
+    jobs = []
+    for job_id in os.listdir(root):
+        directory = os.path.join(root, job_id)
+        if job_id != keep and os.path.isdir(directory):
+            jobs.append((job_id, directory) + _usage(directory))
+    total = sum(size for _, _, size, _ in jobs)
+    if keep and os.path.isdir(os.path.join(root, keep)):
+        total += _usage(os.path.join(root, keep))[0]
+
+    removed = []
+    now = time.time()
+    for job_id, directory, size, newest in sorted(jobs, key=lambda job: job[3]):
+        if now - newest <= max_age and total <= max_bytes:
+            break
+        shutil.rmtree(directory, ignore_errors=True)
+        total -= size
+        removed.append(job_id)
+    return removed
+
+def publish_file(path, directory):
+    """
+    Publishes a finished output under the same name (hard link, or a copy
+    across file systems), replacing an earlier version, then prunes the
+    other published jobs (see prune).
+
+    Returns:
+        str or None: The published path, or None if the file is too large to
+            be served (see can_publish).
+    """
+    os.makedirs(directory, exist_ok=True)
+    published = os.path.join(directory, os.path.basename(path))
+    if os.path.exists(published):
+        os.remove(published)
+    if not can_publish(path):
+        return None
+    try:
+        os.link(path, published)
+    except OSError:
+        shutil.copyfile(path, published)
+    prune(keep=os.path.basename(directory), root=os.path.dirname(directory))
+    return published
+
+def media_path(job_id, relative_path, download=False):
+    """
+    Returns the URL path (without a leading slash) a published output is
+    served at, relative to the media server or Streamlit's static root.
+
+    Args:
+        job_id (str): The job.
+        relative_path (str): Output relative to the job's publish_dir, e.g. "output.mp4".
+        download (bool): Serve it as an attachment instead of inline (only the
+            dedicated server honors this; Streamlit's route ignores it).
+    """
+    path = f"media/{job_id}/{relative_path.replace(os.sep, '/')}"
+    return path + "?download=1" if download else path
+
+def media_url(job_id, relative_path, request_headers=None, download=False):
+    """
+    Returns the URL the browser loads a published output from.
+
+    Served by Streamlit, this is a path relative to the app page (same origin).
+    From a dedicated server it is MEDIA_URL or the app's host on MEDIA_PORT,
+    with the scheme the app itself was requested over, so an HTTPS page never
+    loads media over plain HTTP.
+
+    Args:
+        request_headers (Mapping): Headers of the app's request (st.context.headers).
+    """
+    if not MEDIA_PORT:
+        return STATIC_URL_PATH + media_path(job_id, relative_path)
+    path = media_path(job_id, relative_path, download)
+    base = MEDIA_URL
+    if not base:
+        headers = request_headers or {}
+        host = re.sub(r":\d+$", "", headers.get("Host") or "localhost")
+        scheme = (headers.get("X-Forwarded-Proto") or "").split(",")[0].strip()
+        if not scheme:
+            scheme = "https" if (headers.get("Origin") or "").startswith("https:") else "http"
+        base = f"{scheme}://{host}:{MEDIA_PORT}"
+    return f"{base}/{path}"
+
+def _parse_range(header, size):
+    # Only single ranges ("bytes=start-end", "bytes=start-", "bytes=-suffix") are supported
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    return (start, end) if start <= end < size else None
+
+def start_http_server(port=MEDIA_PORT, host="0.0.0.0", root=MEDIA_ROOT):
+    """
+    Serves the published outputs at http://host:port/media/<job_id>/<file>.
+
+    Returns:
+        ThreadingHTTPServer: The running server (on a daemon thread).
+    """
+    os.makedirs(root, exist_ok=True)
+    root = os.path.realpath(root)
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_HEAD(self):
+            self._serve(send_body=False)
+
+        def do_GET(self):
+            self._serve(send_body=True)
+
+        def _serve(self, send_body):
+            url = urlparse(self.path)
+            match = SERVABLE_PATH.match(unquote(url.path))
+            path = os.path.realpath(os.path.join(root, *match.groups())) if match else None
+            if not path or not path.startswith(root + os.sep) or not os.path.isfile(path):
+                self.send_error(404)
+                return
+
+            size = os.path.getsize(path)
+            start, end = 0, size - 1
+            byte_range = _parse_range(self.headers["Range"], size) if self.headers["Range"] else None
+            if self.headers["Range"] and byte_range is None:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.end_headers()
+                return
+            if byte_range:
+                start, end = byte_range
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+
+            extension = os.path.splitext(path)[1]
+            self.send_header("Content-Type", CONTENT_TYPES[extension])
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            # The player runs on the Streamlit origin
+            self.send_header("Access-Control-Allow-Origin", "*")
+            if extension == ".m3u8":
+                # Grows while the job renders
+                self.send_header("Cache-Control", "no-cache")
+            if parse_qs(url.query).get("download"):
+                self.send_header("Content-Disposition", f'attachment; filename="{DOWNLOAD_FILENAME}"')
+            self.end_headers()
+            if not send_body:
+                return
+
+            remaining = end - start + 1
+            try:
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    while remaining > 0:
+                        block = f.read(min(CHUNK_SIZE, remaining))
+                        if not block:
+                            break
+                        self.wfile.write(block)
+                        remaining -= len(block)
+            except (BrokenPipeError, ConnectionResetError):
+                # The player seeked or the download was cancelled
+                pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="media-http").start()
+    print(f"Serving job videos on http://{host}:{server.server_address[1]}/media/")
+    return server
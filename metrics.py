@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import time
+import resource
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Optional JSON-lines file every span of every job is appended to
+METRICS_LOG = os.getenv("METRICS_LOG")
+
+# Port of the Prometheus text endpoint (/metrics); 0 disables it
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+
+METRICS_FILENAME = "metrics.jsonl"
+PROMETHEUS_PREFIX = "storyteller"
+
+# Numeric span attributes that are summed into counters
+COUNTED_ATTRS = ("bytes", "frames")
+
+_current = contextvars.ContextVar("metrics_recorder", default=None)
+_labels = contextvars.ContextVar("metrics_labels", default={})
+_log_lock = threading.Lock()
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    """
+    Returns the resident memory high-water mark in MB of this process, or of
+    its finished child processes with who=resource.RUSAGE_CHILDREN.
+    """
+    maxrss = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    return round(maxrss / (1024**2 if sys.platform == "darwin" else 1024), 1)
+
+def open_fds():
+    """Returns the number of file descriptors this process has open, or None if unknown."""
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+class Recorder:
+    """
+    Collects the spans of one job and appends them to a JSON-lines file.
+
+    Args:
+        path (str): Optional metrics.jsonl path; spans are only kept in memory without it.
+        labels (dict): Fields added to every span (e.g. {"job": job_id}).
+    """
+
+    def __init__(self, path=None, labels=None):
+        self.path = path
+        self.labels = labels or {}
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        span = dict(self.labels, **span)
+        with self._lock:
+            self.spans.append(span)
+            if self.path:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(span) + "\n")
+        return span
+
+class Registry:
+    """Process-wide per-span-name totals, exported in Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def add(self, span):
+        with self._lock:
+            totals = self._totals.setdefault(span["name"], {
+                "count": 0, "seconds": 0.0, "errors": 0, "cache_hits": 0, "cache_misses": 0,
+                **{attr: 0 for attr in COUNTED_ATTRS}
+            })
+            totals["count"] += 1
+            totals["seconds"] += span["duration_s"]
+            totals["errors"] += 1 if span.get("error") else 0
+            if "cache_hit" in span:
+                totals["cache_hits" if span["cache_hit"] else "cache_misses"] += 1
+            for attr in COUNTED_ATTRS:
+                totals[attr] += span.get(attr) or 0
+
+    def prometheus_text(self):
+        """Returns all totals in the Prometheus text exposition format."""
+        with self._lock:
+            totals = {name: dict(values) for name, values in self._totals.items()}
+
+        lines = [
+            f"# HELP {PROMETHEUS_PREFIX}_span_seconds Wall time of spans.",
+            f"# TYPE {PROMETHEUS_PREFIX}_span_seconds summary",
+        ]
+        for name, values in sorted(totals.items()):
+            lines.append(f'{PROMETHEUS_PREFIX}_span_seconds_sum{{span="{name}"}} {round(values["seconds"], 4)}')
+            lines.append(f'{PROMETHEUS_PREFIX}_span_seconds_count{{span="{name}"}} {values["count"]}')
+
+        metric_names = [
+            ("span_errors_total", "errors", "counter", "Spans that ended with an exception."),
+            ("span_cache_hits_total", "cache_hits", "counter", "Spans served from a cache."),
+            ("span_cache_misses_total", "cache_misses", "counter", "Spans that missed a cache."),
+            ("span_bytes_total", "bytes", "counter", "Bytes downloaded or written by spans."),
+            ("span_frames_total", "frames", "counter", "Video frames encoded by spans."),
+        ]
+        for metric, key, kind, help_text in metric_names:
+            lines.append(f"# HELP {PROMETHEUS_PREFIX}_{metric} {help_text}")
+            lines.append(f"# TYPE {PROMETHEUS_PREFIX}_{metric} {kind}")
+            for name, values in sorted(totals.items()):
+                lines.append(f'{PROMETHEUS_PREFIX}_{metric}{{span="{name}"}} {values[key]}')
+        lines.append(f"# HELP {PROMETHEUS_PREFIX}_peak_rss_megabytes Resident memory high-water mark.")
+        lines.append(f"# TYPE {PROMETHEUS_PREFIX}_peak_rss_megabytes gauge")
+        lines.append(f"{PROMETHEUS_PREFIX}_peak_rss_megabytes {peak_rss_mb()}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+@contextmanager
+def recording(recorder):
+    """Makes `recorder` receive the spans recorded in this context (and tasks/threads started from it)."""
+    token = _current.set(recorder)
+    try:
+        yield recorder
+    finally:
+        _current.reset(token)
+
+@contextmanager
+def labels(**fields):
+    """Adds fields (e.g. scene=3) to every span recorded in this context."""
+    token = _labels.set(dict(_labels.get(), **fields))
+    try:
+        yield
+    finally:
+        _labels.reset(token)
+
+def bind(func):
+    """Wraps func to run in a copy of the current context, e.g. on an executor thread."""
+    return functools.partial(contextvars.copy_context().run, func)
+
+def record(name, duration_s, start=None, **attrs):
+    """
+    Records a finished span.
+
+    Args:
+        name (str): Span name, e.g. "tts" or "render".
+        duration_s (float): Wall time in seconds.
+        start (float): Optional start time (epoch seconds).
+        **attrs: Extra fields (scene, bytes, cache_hit, fps, ...). peak_rss_mb
+            defaults to this process's high-water mark.
+
+    Returns:
+        dict: The recorded span.
+    """
+    attrs.setdefault("peak_rss_mb", peak_rss_mb())
+    span = {"name": name, "start": round(start or time.time() - duration_s, 3),
+            "duration_s": round(duration_s, 4), **_labels.get(), **attrs}
+    recorder = _current.get()
+    if recorder:
+        span = recorder.add(span)
+    REGISTRY.add(span)
+    if METRICS_LOG:
+        with _log_lock, open(METRICS_LOG, "a") as f:
+            f.write(json.dumps(span) + "\n")
+    return span
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times the enclosed block and records it as a span.
+
+    Yields a dict the block can add attributes to (bytes, cache_hit, ...).
+
+    Example:
+        with metrics.span("download", scene=3) as s:
+            s["bytes"] = fetch(url)
+    """
+    fields = dict(attrs)
+    start = time.time()
+    started = time.perf_counter()
+    try:
+        yield fields
+    except BaseException:
+        fields["error"] = True
+        raise
+    finally:
+        record(name, time.perf_counter() - started, start=start, **fields)
+
+class TimedIterator:
+    """
+    Wraps an iterator (e.g. a generator of parsed pages) and records one span for
+    the time spent producing its items, excluding the consumer's time between
+    them. The span is recorded once the iterator is exhausted or fails.
+    """
+
+    def __init__(self, iterable, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.elapsed = 0.0
+        self.count = 0
+        self._iterator = iter(iterable)
+        self._start = time.time()
+        self._recorded = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            self.elapsed += time.perf_counter() - started
+            self._finish()
+            raise
+        except BaseException:
+            self.elapsed += time.perf_counter() - started
+            self._finish(error=True)
+            raise
+        self.elapsed += time.perf_counter() - started
+        self.count += 1
+        return item
+
+    def _finish(self, **extra):
+        if not self._recorded:
+            self._recorded = True
+            record(self.name, self.elapsed, start=self._start, items=self.count, **self.attrs, **extra)
+
+def load(path):
+    """Reads the spans of a metrics.jsonl file (empty list if missing)."""
+    spans = []
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    spans.append(json.loads(line))
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return spans
+
+def summarize(spans):
+    """
+    Aggregates spans by name.
+
+    Returns:
+        list: One dict per span name (in first-seen order) with count, total and
+            max seconds, bytes, cache hits/misses, frames, mean fps and peak RSS.
+    """
+    rows = {}
+    for span in spans:
+        row = rows.setdefault(span["name"], {
+            "span": span["name"], "count": 0, "total_s": 0.0, "max_s": 0.0,
+            "bytes": 0, "cache_hits": 0, "cache_misses": 0, "frames": 0, "fps": None, "peak_rss_mb": 0.0
+        })
+        row["count"] += 1
+        row["total_s"] += span.get("duration_s", 0)
+        row["max_s"] = max(row["max_s"], span.get("duration_s", 0))
+        row["bytes"] += span.get("bytes") or 0
+        row["frames"] += span.get("frames") or 0
+        if "cache_hit" in span:
+            row["cache_hits" if span["cache_hit"] else "cache_misses"] += 1
+        row["peak_rss_mb"] = max(row["peak_rss_mb"], span.get("peak_rss_mb") or 0)
+
+    for row in rows.values():
+        row["total_s"] = round(row["total_s"], 2)
+        row["max_s"] = round(row["max_s"], 2)
+        if row["frames"] and row["total_s"]:
+            row["fps"] = round(row["frames"] / row["total_s"], 1)
+    return list(rows.values())
+
+def start_http_server(port=METRICS_PORT, host="0.0.0.0"):
+    """
+    Serves REGISTRY in Prometheus text format at http://host:port/metrics.
+
+    Returns:
+        ThreadingHTTPServer: The running server (on a daemon thread).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = REGISTRY.prometheus_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    print(f"Serving metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
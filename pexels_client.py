@@ -0,0 +1,237 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import Future
+
+import requests
+from requests.adapters import HTTPAdapter
+
+PEXELS_API_URL = "https://api.pexels.com/videos/search"
+
+# Results requested per search; later scenes with the same query reuse them
+SEARCH_PER_PAGE = int(os.getenv("PEXELS_PER_PAGE", "5"))
+SEARCH_CACHE_TTL = 15 * 60
+SEARCH_CACHE_MAX_ENTRIES = 512
+
+POOL_SIZE = 16
+REQUEST_TIMEOUT = 30
+MAX_RETRIES = 4
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 30.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Request rate used until the first X-Ratelimit-* headers arrive
+DEFAULT_RATE = 5.0
+DEFAULT_BURST = 10
+
+# Longest wait for an exhausted quota to reset; longer (e.g. the monthly
+# quota) fails the request instead of stalling every scene
+MAX_QUOTA_WAIT = 10.0
+
+class PexelsError(Exception):
+    """A Pexels API request that failed after all retries."""
+
+    def __init__(self, status_code, text):
+        super().__init__(f"Pexels API Error {status_code}: {text}")
+        self.status_code = status_code
+
+class RateLimiter:
+    """
+    A token bucket capped by Pexels' rate-limit headers.
+
+    Requests burst at DEFAULT_RATE while quota is left. X-Ratelimit-Remaining
+    is a hard cap: tokens never exceed the requests the quota still allows,
+    and once it is used up requests wait for X-Ratelimit-Reset if that is at
+    most MAX_QUOTA_WAIT away. The reset time is not used to pace requests,
+    because Pexels sets it to the end of the monthly quota period.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.capacity = burst
+        self.tokens = float(burst)
+        self.blocked_until = 0.0
+        # Quota left until reset_at (monotonic), from the last response; None = unknown
+        self.remaining = None
+        self.reset_at = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self.remaining is not None and now >= self.reset_at:
+            # A new quota period has started
+            self.remaining = None
+        capacity = self.capacity if self.remaining is None else min(self.capacity, self.remaining)
+        self.tokens = min(capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Blocks until a request may be sent.
+
+        Raises:
+            PexelsError: If the quota is used up for longer than MAX_QUOTA_WAIT.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self.blocked_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    if self.remaining is not None:
+                        self.remaining -= 1
+                    return
+                if self.remaining == 0:
+                    wait = self.reset_at - now
+                    if wait > MAX_QUOTA_WAIT:
+                        raise PexelsError(429, f"Rate limit quota used up, resets in {wait:.0f}s")
+                else:
+                    wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate if self.rate > 0 else 1.0)
+            time.sleep(min(max(wait, 0.01), BACKOFF_MAX))
+
+    def update(self, headers):
+        """Caps the bucket from X-Ratelimit-Remaining/Reset response headers."""
+        try:
+            remaining = int(headers["X-Ratelimit-Remaining"])
+            reset = float(headers["X-Ratelimit-Reset"])
+        except (KeyError, TypeError, ValueError):
+            return
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.remaining = max(0, remaining)
+            self.reset_at = now + max(1.0, reset - time.time())
+            self.tokens = min(self.tokens, self.remaining)
+
+    def block_for(self, seconds):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class PexelsClient:
+    """
+    A thread-safe Pexels client shared by all scenes and jobs in a process.
+
+    It keeps a pooled keep-alive Session, paces API calls with a RateLimiter,
+    retries 429/5xx responses with jittered exponential backoff (honoring
+    Retry-After), and runs identical concurrent searches only once.
+    """
+
+    def __init__(self, api_key, pool_size=POOL_SIZE, per_page=SEARCH_PER_PAGE):
+        self.api_key = api_key
+        self.per_page = per_page
+        self.limiter = RateLimiter()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._search_lock = threading.Lock()
+        self._inflight = {}
+        self._results = {}
+
+    def _backoff(self, attempt, response=None):
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after:
+            try:
+                return min(BACKOFF_MAX, float(retry_after))
+            except ValueError:
+                pass
+        delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
+
+    def request(self, method, url, rate_limited=False, **kwargs):
+        """
+        Sends a request with retries.
+
+        Args:
+            method (str): HTTP method.
+            url (str): Request URL.
+            rate_limited (bool): Whether the call counts against the API quota.
+
+        Returns:
+            requests.Response: The last response (may still be an error status).
+        """
+        kwargs.setdefault("timeout", REQUEST_TIMEOUT)
+        for attempt in range(MAX_RETRIES + 1):
+            if rate_limited:
+                self.limiter.acquire()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == MAX_RETRIES:
+                    raise
+                time.sleep(self._backoff(attempt))
+                continue
+
+            if rate_limited:
+                self.limiter.update(response.headers)
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+
+            delay = self._backoff(attempt, response)
+            if response.status_code == 429 and rate_limited:
+                self.limiter.block_for(delay)
+            print(f"Pexels request returned {response.status_code}, retrying in {delay:.1f}s...")
+            response.close()
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def _search(self, params):
+        headers = {"Authorization": self.api_key}
+        response = self.get(PEXELS_API_URL, rate_limited=True, headers=headers, params=params)
+        if response.status_code != 200:
+            raise PexelsError(response.status_code, response.text)
+        return response.json().get("videos", [])
+
+    def search_videos(self, query, **params):
+        """
+        Searches Pexels videos, sharing results between identical queries.
+
+        One search requests `per_page` results, which are memoized for
+        SEARCH_CACHE_TTL; concurrent callers with the same query wait for the
+        single in-flight request instead of sending their own.
+
+        Args:
+            query (str): Search query.
+            **params: Extra search parameters (orientation, size, ...).
+
+        Returns:
+            list: Video dicts from the Pexels response.
+
+        Raises:
+            PexelsError: If the API keeps failing after retries.
+        """
+        params = dict(params, query=query, per_page=self.per_page)
+        key = tuple(sorted((k, str(v).lower()) for k, v in params.items()))
+
+        with self._search_lock:
+            cached = self._results.get(key)
+            if cached and time.monotonic() - cached[0] < SEARCH_CACHE_TTL:
+                return cached[1]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            videos = self._search(params)
+            with self._search_lock:
+                if len(self._results) >= SEARCH_CACHE_MAX_ENTRIES:
+                    self._results.pop(next(iter(self._results)))
+                self._results[key] = (time.monotonic(), videos)
+            future.set_result(videos)
+            return videos
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._search_lock:
+                self._inflight.pop(key, None)
@@ -0,0 +1,406 @@
+import os
+import json
+import time
+import asyncio
+from contextlib import contextmanager, ExitStack
+
+import cache
+import manifest
+import metrics
+import utils
+import llm_engine
+import media_gen
+import media_server
+import video_editor
+
+# Job settings chosen in the sidebar; anything missing falls back to these
+DEFAULT_OPTIONS = {
+    "model": "gemini-2.0-flash-lite",
+    "use_script_cache": True,
+    "asset_concurrency": media_gen.DEFAULT_ASSET_CONCURRENCY,
+    "bandwidth_budget_mb": media_gen.BANDWIDTH_BUDGET_MB,
+    "partial_downloads": media_gen.PARTIAL_DOWNLOADS,
+    "parallel_render": True,
+    "stream_script": True,
+    "long_document": llm_engine.LONG_DOCUMENTS,
+    "script_concurrency": llm_engine.SCRIPT_CONCURRENCY,
+    "batch_narration": media_gen.BATCH_NARRATION,
+    "reuse_similar_footage": media_gen.FOOTAGE_REUSE,
+    "render_profile": video_editor.DEFAULT_RENDER_PROFILE,
+    "render_workers": video_editor.RENDER_WORKERS,
+    "render_backend": video_editor.DEFAULT_RENDER_BACKEND,
+    "progressive_output": video_editor.PROGRESSIVE_OUTPUT,
+    # Where playable outputs (HLS playlist, finished video) are published for
+    # the browser (see media_server); None keeps them in the work directory
+    "publish_dir": None,
+}
+
+# Pipeline phases, in order; a job can be limited per phase (see run_pipeline)
+PHASES = ("extract", "script", "assets", "render")
+
+OUTPUT_FILENAME = "output.mp4"
+SCRIPT_FILENAME = "script.json"
+TEXT_FILENAME = "text.txt"
+SEGMENT_DIRNAME = "segments"
+HLS_DIRNAME = "hls"
+
+def _noop_report(**kwargs):
+    pass
+
+def read_document(source_path, max_chars=llm_engine.MAX_INPUT_CHARS):
+    """
+    Reads and cleans a PDF or text document.
+
+    PDF pages are parsed in parallel and cleaned as they stream in; pages past
+    `max_chars` (the LLM input limit) are never parsed.
+
+    Returns:
+        str: Cleaned text ("" if nothing could be extracted).
+    """
+    if source_path.lower().endswith(".pdf"):
+        try:
+            started = time.perf_counter()
+            pages = metrics.TimedIterator(
+                utils.iter_pdf_pages(source_path, max_chars=max_chars, workers=utils.PDF_WORKERS),
+                "extract", format="pdf", bytes=os.path.getsize(source_path)
+            )
+            text = utils.clean_pages(pages)
+            # Cleaning is interleaved with parsing; it gets the time not spent in the parser
+            metrics.record("clean", time.perf_counter() - started - pages.elapsed, chars=len(text))
+            return text
+        except Exception as e:
+            print(f"Error reading PDF: {e}")
+            return ""
+
+    with metrics.span("extract", format="txt", bytes=os.path.getsize(source_path)):
+        with open(source_path, "r", encoding="utf-8") as f:
+            raw_text = f.read()
+    with metrics.span("clean") as clean_span:
+        text = utils.clean_text(raw_text)
+        clean_span["chars"] = len(text)
+    return text
+
+def _audio_input(scene):
+    return cache.make_key("audio", scene["text"])
+
+def _video_input(scene, options, audio_sha):
+    # Partial downloads are cut to the narration length, so they depend on the audio too
+    return cache.make_key(
+        "video",
+        scene.get("stock_video_query", "abstract background"),
+        audio_sha if options["partial_downloads"] else None
+    )
+
+def _segment_input(record, text, profile):
+    audio_sha = record["audio"]["sha256"] if record.get("audio") else None
+    video_sha = record["video"]["sha256"] if record.get("video") else None
+    return cache.make_key("segment", audio_sha, video_sha, text,
+                          profile["size"], profile["fps"], profile["preset"], profile["crf"])
+
+def _render_outputs(profile_name):
+    """
+    Names of a render profile's outputs, so a preview and the final video of
+    the same job are checkpointed side by side from the same assets.
+
+    Returns:
+        tuple: (scene manifest key, phase manifest key, segment dir name,
+            output file name, HLS playlist dir name)
+    """
+    if profile_name == "final":
+        return "segment", "render", SEGMENT_DIRNAME, OUTPUT_FILENAME, HLS_DIRNAME
+    return (f"segment_{profile_name}", f"render_{profile_name}",
+            f"{SEGMENT_DIRNAME}_{profile_name}", f"{profile_name}.mp4", f"{HLS_DIRNAME}_{profile_name}")
+
+async def _stream_scenes(cleaned_text, options, script_data):
+    """Adapts llm_engine.stream_script to an async iterator, collecting scenes into script_data."""
+    loop = asyncio.get_running_loop()
+    if options["long_document"]:
+        stream = llm_engine.stream_long_script(cleaned_text, options["model"], use_cache=options["use_script_cache"],
+                                               max_workers=options["script_concurrency"])
+    else:
+        stream = llm_engine.stream_script(cleaned_text, options["model"], use_cache=options["use_script_cache"])
+    finished = object()
+    while True:
+        # The Gemini client blocks, so pull each scene on a worker thread
+        scene = await loop.run_in_executor(None, metrics.bind(next), stream, finished)
+        if scene is finished:
+            return
+        script_data.append(scene)
+        yield scene
+
+@contextmanager
+def _phase(name, limits, hold=(), **attrs):
+    """
+    Times a phase as a phase_<name> span.
+
+    If `limits` has a semaphore for the phase (or for any extra phase named in
+    `hold`), a slot is taken first; the wait is recorded as a wait_<name> span.
+    """
+    with ExitStack() as stack:
+        semaphores = [limits[n] for n in (name,) + tuple(hold) if limits and limits.get(n)]
+        if semaphores:
+            with metrics.span(f"wait_{name}"):
+                for semaphore in semaphores:
+                    semaphore.acquire()
+                    stack.callback(semaphore.release)
+        with metrics.span(f"phase_{name}", **attrs):
+            yield
+
+def run_pipeline(source_path, work_dir, options=None, report=None, limits=None):
+    """
+    Runs the full document-to-video pipeline for one job.
+
+    Progress is checkpointed in the job's manifest (see manifest.JobManifest):
+    running it again on the same work_dir resumes from the first incomplete
+    phase or scene, and only scenes whose text or query changed (e.g. after the
+    script was edited) get new audio, footage and render segments. Timing spans
+    of the run are written to <work_dir>/metrics.jsonl.
+
+    Args:
+        source_path (str): Path to the uploaded PDF/TXT file.
+        work_dir (str): Job directory; all intermediate files and the output go here.
+        options (dict): Overrides for DEFAULT_OPTIONS.
+        report (callable): Optional report(progress=, message=, warning=, script=, playlist=)
+            callback; playlist is the HLS playlist (relative to the publish_dir option,
+            or work_dir) once its first scene is playable.
+        limits (dict): Optional {phase: threading.Semaphore} shared by concurrent jobs,
+            capping how many of them may be in each phase (see PHASES) at once.
+
+    Returns:
+        tuple: (output_path (str) or None, error_message (str) or None)
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    # Timing spans of this attempt go to the job's metrics.jsonl (see metrics.span)
+    metrics_path = os.path.join(work_dir, metrics.METRICS_FILENAME)
+    if os.path.exists(metrics_path):
+        os.remove(metrics_path)
+    recorder = metrics.Recorder(metrics_path, labels={"job": os.path.basename(os.path.abspath(work_dir))})
+    with metrics.recording(recorder), metrics.span("job"):
+        return _run_pipeline(source_path, work_dir, options, report, limits)
+
+def _run_pipeline(source_path, work_dir, options, report, limits):
+    options = dict(DEFAULT_OPTIONS, **(options or {}))
+    report = report or _noop_report
+    job_manifest = manifest.JobManifest.load(work_dir)
+    profile = video_editor.get_render_profile(options["render_profile"])
+    segment_kind, render_phase, segment_dirname, output_filename, hls_dirname = \
+        _render_outputs(options["render_profile"])
+
+    # Phase 1: Analyze Text
+    with _phase("extract", limits):
+        report(progress=0, message="Phase 1: Analyzing Document...")
+        text_path = os.path.join(work_dir, TEXT_FILENAME)
+        # Long-document mode reads the whole document instead of the first request's worth
+        max_chars = llm_engine.MAX_DOCUMENT_CHARS if options["long_document"] else llm_engine.MAX_INPUT_CHARS
+        extract_input = cache.make_key("extract", manifest.file_sha256(source_path), max_chars)
+        if job_manifest.is_fresh(job_manifest.phase("extract"), extract_input):
+            with open(text_path, "r", encoding="utf-8") as f:
+                cleaned_text = f.read()
+        else:
+            cleaned_text = read_document(source_path, max_chars)
+            if not cleaned_text:
+                return None, "Could not extract text from file."
+            with open(text_path, "w", encoding="utf-8") as f:
+                f.write(cleaned_text)
+            job_manifest.complete_phase("extract", job_manifest.make_entry(text_path, extract_input))
+    report(progress=10)
+
+    # Phase 2: Generate Script
+    script_path = os.path.join(work_dir, SCRIPT_FILENAME)
+    script_input = cache.make_key("script", job_manifest.phase("extract")["sha256"], options["model"],
+                                  options["long_document"])
+    script_fresh = job_manifest.is_fresh(job_manifest.phase("script"), script_input)
+    # Batched narration needs the whole script before the first scene is read
+    streaming = not script_fresh and options["stream_script"] and not options["batch_narration"]
+    # A streamed script is generated during Phase 3, which then also holds its slot
+    with _phase("script", None if streaming else limits, streaming=streaming):
+        if script_fresh:
+            report(message="Phase 2: Reusing the script from the previous attempt...")
+            with open(script_path) as f:
+                script_data = json.load(f)
+        elif streaming:
+            # Scenes are handed to Phase 3 as soon as Gemini has streamed them
+            report(message=f"Phase 2: Streaming Script from {options['model']}; fetching assets as scenes arrive...")
+            script_data = []
+        else:
+            report(message=f"Phase 2: Generating Script with {options['model']}...")
+            if options["long_document"]:
+                # Chunks of a long document are scripted concurrently and merged
+                script_data, error = llm_engine.generate_long_script(
+                    cleaned_text, options["model"], use_cache=options["use_script_cache"],
+                    max_workers=options["script_concurrency"]
+                )
+            else:
+                script_data, error = llm_engine.generate_script(
+                    cleaned_text, options["model"], use_cache=options["use_script_cache"]
+                )
+            if error:
+                return None, f"Failed to generate script: {error}"
+
+    def finish_script():
+        if not script_fresh:
+            with open(script_path, "w") as f:
+                json.dump(script_data, f, indent=2)
+            job_manifest.complete_phase("script", job_manifest.make_entry(script_path, script_input))
+        job_manifest.truncate_scenes(len(script_data))
+        report(script=script_data)
+
+    # Phase 3: Generate Assets (Audio & Stock Video), skipping those already on disk
+    if streaming:
+        scenes = _stream_scenes(cleaned_text, options, script_data)
+    else:
+        finish_script()
+        scenes = script_data
+        report(progress=30, message="Phase 3: Fetching Stock Footage & Generating Audio...")
+
+    existing_by_scene = {}
+
+    def existing_assets(i, scene):
+        record = job_manifest.scene(i)
+        existing = set()
+        if job_manifest.is_fresh(record.get("audio"), _audio_input(scene)):
+            existing.add("audio")
+            if job_manifest.is_fresh(record.get("video"), _video_input(scene, options, record["audio"]["sha256"])):
+                existing.add("video")
+        elif not options["partial_downloads"]:
+            if job_manifest.is_fresh(record.get("video"), _video_input(scene, options, None)):
+                existing.add("video")
+
+        # Stale outputs must not be picked up if regenerating them fails
+        scene_id = scene.get("scene_id", i+1)
+        for kind, filename in (("audio", f"audio_{scene_id}.mp3"), ("video", f"video_{scene_id}.mp4")):
+            if kind not in existing:
+                record.pop(kind, None)
+                stale_path = os.path.join(work_dir, filename)
+                if os.path.exists(stale_path):
+                    os.remove(stale_path)
+        existing_by_scene[i] = existing
+        return existing
+
+    def on_scene_done(i, result, completed, total):
+        scene = script_data[i]
+        scene_id = result["scene_id"]
+        existing = existing_by_scene.get(i, ())
+        if "audio" not in existing and os.path.exists(result["audio_path"]):
+            job_manifest.set_scene_output(i, "audio", job_manifest.make_entry(result["audio_path"], _audio_input(scene)))
+        record = job_manifest.scene(i)
+        audio_sha = record["audio"]["sha256"] if record.get("audio") else None
+        if "video" not in existing and os.path.exists(result["video_path"]) and (audio_sha or not options["partial_downloads"]):
+            video_input = _video_input(scene, options, audio_sha)
+            job_manifest.set_scene_output(i, "video", job_manifest.make_entry(result["video_path"], video_input))
+        for error_msg in result["errors"]:
+            # Video editor handles missing files as black screen
+            report(warning=f"Scene {scene_id}: {error_msg}. Using fallback.")
+        # While the script is still streaming the scene count is not known yet
+        report(
+            progress=30 + int(completed / max(total or 0, completed + 1) * 40),
+            message=f"Phase 3: Processed Scene {scene_id} ({completed}/{total or '?'} done)..."
+        )
+
+    with _phase("assets", limits, hold=("script",) if streaming else ()):
+        try:
+            scene_results = asyncio.run(media_gen.generate_scene_assets(
+                scenes, work_dir,
+                max_concurrency=options["asset_concurrency"],
+                on_scene_done=on_scene_done,
+                bandwidth_budget_mb=options["bandwidth_budget_mb"],
+                partial_downloads=options["partial_downloads"],
+                existing_assets=existing_assets,
+                batch_narration=options["batch_narration"],
+                reuse_similar_footage=options["reuse_similar_footage"]
+            ))
+        except (ValueError, RuntimeError) as e:
+            # Raised by the streaming script generator
+            return None, f"Failed to generate script: {e}"
+
+    if streaming:
+        finish_script()
+
+    # Phase 4: Assemble Video, re-rendering only scenes whose inputs changed
+    with _phase("render", limits, profile=options["render_profile"]):
+        report(progress=70, message=f"Phase 4: Assembling {options['render_profile'].title()} Video (Subtitles & Clips)...")
+        segment_dir = os.path.join(work_dir, segment_dirname)
+        os.makedirs(segment_dir, exist_ok=True)
+
+        to_render = []
+        for i, result in enumerate(scene_results):
+            record = job_manifest.scene(i)
+            if not job_manifest.is_fresh(record.get(segment_kind), _segment_input(record, result["text"], profile)):
+                record.pop(segment_kind, None)
+                segment_path = os.path.join(segment_dir, f"scene_{i+1:04d}.mp4")
+                to_render.append((i, result["audio_path"], result["video_path"], result["text"], segment_path))
+
+        # Progressive output: each scene is published to an HLS playlist as
+        # soon as it and every scene before it are rendered
+        publish_dir = options["publish_dir"] or work_dir
+        playlist = None
+        if options["progressive_output"]:
+            longest = max((media_gen.audio_duration(result["audio_path"]) or 0 for result in scene_results), default=0)
+            playlist = video_editor.HLSPlaylist(os.path.join(publish_dir, hls_dirname), target_duration=longest)
+        pending = {scene[0] for scene in to_render}
+        next_published = 0
+
+        def publish_segments():
+            nonlocal playlist, next_published
+            while playlist and next_published < len(scene_results) and next_published not in pending:
+                entry = job_manifest.scene(next_published).get(segment_kind)
+                next_published += 1
+                if not entry:
+                    continue
+                try:
+                    playlist.append(job_manifest.path(entry))
+                except Exception as e:
+                    report(warning=f"Progressive playback unavailable: {e}")
+                    playlist = None
+                    return
+                if len(playlist.entries) == 1:
+                    report(playlist=os.path.relpath(playlist.path, publish_dir))
+
+        def on_segment_done(i, segment_path):
+            if segment_path:
+                segment_input = _segment_input(job_manifest.scene(i), scene_results[i]["text"], profile)
+                job_manifest.set_scene_output(i, segment_kind, job_manifest.make_entry(segment_path, segment_input))
+            pending.discard(i)
+            publish_segments()
+            rendered = sum(1 for scene in to_render if job_manifest.scene(scene[0]).get(segment_kind))
+            report(
+                progress=70 + int(rendered / len(to_render) * 25),
+                message=f"Phase 4: Rendered Scene {i+1} ({rendered}/{len(to_render)} changed scenes)..."
+            )
+
+        # Scenes kept from the previous attempt are playable right away
+        publish_segments()
+        if to_render:
+            _, error = video_editor.render_scene_segments(
+                to_render, workers=options["render_workers"] if options["parallel_render"] else 1,
+                on_segment_done=on_segment_done,
+                profile=profile,
+                backend=options["render_backend"]
+            )
+            if error:
+                return None, f"Failed to assemble video: {error}"
+
+        segments = [job_manifest.scene(i).get(segment_kind) for i in range(len(scene_results))]
+        segments = [entry for entry in segments if entry]
+        if not segments:
+            return None, "Failed to assemble video: No valid scenes to assemble. All scenes were skipped or failed."
+
+        output_path = os.path.join(work_dir, output_filename)
+        render_input = cache.make_key("render", [entry["sha256"] for entry in segments])
+        if not job_manifest.is_fresh(job_manifest.phase(render_phase), render_input):
+            try:
+                video_editor.concat_segments([job_manifest.path(entry) for entry in segments], output_path)
+            except Exception as e:
+                return None, f"Failed to assemble video: {e}"
+            job_manifest.complete_phase(render_phase, job_manifest.make_entry(output_path, render_input))
+        if playlist:
+            playlist.finish()
+        if options["publish_dir"]:
+            try:
+                # Not published if too large to stream; the app then serves the file itself
+                media_server.publish_file(output_path, options["publish_dir"])
+            except OSError as e:
+                report(warning=f"Could not publish the video for streaming: {e}")
+
+    report(progress=100, message="Video Generation Complete!")
+    return output_path, None
@@ -1,14 +1,15 @@
 
 import os
-from moviepy.editor import TextClip
+import subtitles
 
-def test_text_clip():
+def test_caption():
     try:
-        print("Testing TextClip...")
-        txt_clip = TextClip("Hello World", fontsize=70, color='white')
-        print("TextClip created successfully.")
+        print("Testing subtitle rendering...")
+        print(f"Using font: {subtitles.resolve_font_path() or 'Pillow built-in'}")
+        caption = subtitles.render_caption("Hello World")
+        print(f"Caption rendered successfully: {caption.shape[1]}x{caption.shape[0]}")
     except Exception as e:
-        print(f"Error creating TextClip: {e}")
+        print(f"Error rendering caption: {e}")
 
 if __name__ == "__main__":
-    test_text_clip()
+    test_caption()
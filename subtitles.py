@@ -0,0 +1,135 @@
+import io
+import os
+from functools import lru_cache
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import cache
+
+# TrueType font for captions; the first candidate found on this machine is used
+SUBTITLE_FONT = os.getenv("SUBTITLE_FONT")
+FONT_CANDIDATES = [
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/Library/Fonts/Arial Bold.ttf",
+    "C:\\Windows\\Fonts\\arialbd.ttf",
+    "DejaVuSans-Bold.ttf",
+]
+
+FONT_SIZE = 70
+CAPTION_WIDTH = 1800
+TEXT_COLOR = "white"
+STROKE_COLOR = "black"
+STROKE_WIDTH = 3
+LINE_SPACING = 8
+
+# Rendered caption PNGs, keyed by text, font and size
+CAPTION_CACHE_MAX_BYTES = int(os.getenv("CAPTION_CACHE_MAX_BYTES", str(128 * 1024**2)))
+CAPTION_CACHE = cache.DiskCache("captions", max_bytes=CAPTION_CACHE_MAX_BYTES)
+
+@lru_cache(maxsize=None)
+def resolve_font_path(font_path=None):
+    """
+    Returns the first usable TrueType font path, or None to use Pillow's built-in font.
+    """
+    for candidate in [font_path, SUBTITLE_FONT] + FONT_CANDIDATES:
+        if not candidate:
+            continue
+        try:
+            ImageFont.truetype(candidate, 10)
+            return candidate
+        except OSError:
+            continue
+    return None
+
+@lru_cache(maxsize=8)
+def _load_font(font_path, fontsize):
+    if font_path:
+        return ImageFont.truetype(font_path, fontsize)
+    return ImageFont.load_default(size=fontsize)
+
+def _wrap_lines(text, font, max_width):
+    # Greedy word wrap by rendered pixel width (what ImageMagick's 'caption' method did)
+    lines = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and font.getlength(candidate) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return "\n".join(lines)
+
+def _draw_caption(text, font_path, fontsize, width):
+    font = _load_font(font_path, fontsize)
+    wrapped_text = _wrap_lines(text, font, width - 2 * STROKE_WIDTH)
+
+    measure = ImageDraw.Draw(Image.new("RGBA", (1, 1)))
+    left, top, right, bottom = measure.multiline_textbbox(
+        (0, 0), wrapped_text, font=font, spacing=LINE_SPACING, align="center", stroke_width=STROKE_WIDTH
+    )
+    height = max(1, bottom - top)
+
+    image = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    draw.multiline_text(
+        ((width - (right - left)) / 2 - left, -top),
+        wrapped_text,
+        font=font,
+        fill=TEXT_COLOR,
+        spacing=LINE_SPACING,
+        align="center",
+        stroke_width=STROKE_WIDTH,
+        stroke_fill=STROKE_COLOR
+    )
+    return image
+
+def _caption_png(text, font_path, fontsize, width):
+    caption_key = cache.make_key("caption", text, font_path, fontsize, width,
+                                 TEXT_COLOR, STROKE_COLOR, STROKE_WIDTH, LINE_SPACING)
+    data = CAPTION_CACHE.get_bytes(caption_key)
+    if data is None:
+        buffer = io.BytesIO()
+        _draw_caption(text, font_path, fontsize, width).save(buffer, format="PNG")
+        data = buffer.getvalue()
+        CAPTION_CACHE.put_bytes(caption_key, data)
+    return data
+
+# Decoded captions are several MB each; keep only the few scenes being rendered
+@lru_cache(maxsize=8)
+def _caption_array(text, font_path, fontsize, width):
+    image = Image.open(io.BytesIO(_caption_png(text, font_path, fontsize, width)))
+    return np.array(image.convert("RGBA"))
+
+def render_caption(text, font_path=None, fontsize=FONT_SIZE, width=CAPTION_WIDTH):
+    """
+    Rasterizes a subtitle in-process with Pillow (no ImageMagick).
+
+    Results are memoized in memory and in CAPTION_CACHE on disk.
+
+    Args:
+        text (str): Caption text; wrapped to fit `width`.
+        font_path (str): Optional TrueType font path.
+        fontsize (int): Font size in pixels.
+        width (int): Caption box width in pixels.
+
+    Returns:
+        numpy.ndarray: RGBA image of shape (height, width, 4).
+    """
+    return _caption_array(text, resolve_font_path(font_path), fontsize, width)
+
+def render_caption_file(text, output_filename, font_path=None, fontsize=FONT_SIZE, width=CAPTION_WIDTH):
+    """
+    Writes a rasterized subtitle as a transparent PNG (for encoder overlays).
+
+    Returns:
+        tuple: (width, height) of the image.
+    """
+    data = _caption_png(text, resolve_font_path(font_path), fontsize, width)
+    with open(output_filename, "wb") as f:
+        f.write(data)
+    return Image.open(io.BytesIO(data)).size
@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# media_gen and llm_engine open their caches at import; keep them out of the user's cache
+os.environ.setdefault("CACHE_DIR", tempfile.mkdtemp(prefix="ai_video_storyteller-tests-"))
@@ -0,0 +1,69 @@
+import os
+import time
+
+from cache import DiskCache
+
+
+def put_entry(disk_cache, key, size, tmp_path):
+    src = tmp_path / f"src-{key}"
+    src.write_bytes(b"x" * size)
+    return disk_cache.put(key, str(src))
+
+
+def set_times(path, accessed, modified):
+    os.utime(path, (accessed, modified))
+
+
+def test_evict_without_limits_removes_nothing(tmp_path):
+    disk_cache = DiskCache("test", root=str(tmp_path / "cache"))
+    put_entry(disk_cache, "aa01", 100, tmp_path)
+    assert disk_cache.evict() == 0
+    assert disk_cache.contains("aa01")
+
+
+def test_evict_removes_least_recently_used_past_max_bytes(tmp_path):
+    disk_cache = DiskCache("test", root=str(tmp_path / "cache"))
+    now = time.time()
+    paths = {key: put_entry(disk_cache, key, 100, tmp_path) for key in ("aa01", "bb02", "cc03")}
+    set_times(paths["aa01"], now - 10, now - 30)
+    set_times(paths["bb02"], now - 30, now - 30)
+    set_times(paths["cc03"], now - 20, now - 30)
+
+    disk_cache.max_bytes = 200
+    assert disk_cache.evict() == 1
+    assert not os.path.exists(paths["bb02"])
+    assert os.path.exists(paths["aa01"]) and os.path.exists(paths["cc03"])
+    assert disk_cache.stats()["bytes"] == 200
+
+
+def test_evict_removes_expired_entries(tmp_path):
+    disk_cache = DiskCache("test", root=str(tmp_path / "cache"))
+    now = time.time()
+    old = put_entry(disk_cache, "aa01", 10, tmp_path)
+    fresh = put_entry(disk_cache, "bb02", 10, tmp_path)
+    set_times(old, now, now - 120)
+
+    disk_cache.max_age = 60
+    assert disk_cache.evict() == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
+
+
+def test_put_enforces_max_bytes(tmp_path):
+    disk_cache = DiskCache("test", max_bytes=250, root=str(tmp_path / "cache"))
+    first = put_entry(disk_cache, "aa01", 100, tmp_path)
+    set_times(first, time.time() - 60, time.time() - 60)
+    put_entry(disk_cache, "bb02", 100, tmp_path)
+    put_entry(disk_cache, "cc03", 100, tmp_path)
+    assert not disk_cache.contains("aa01")
+    assert disk_cache.contains("bb02") and disk_cache.contains("cc03")
+
+
+def test_evict_ignores_temp_files(tmp_path):
+    disk_cache = DiskCache("test", max_bytes=0, root=str(tmp_path / "cache"))
+    os.makedirs(os.path.join(disk_cache.directory, "aa"), exist_ok=True)
+    tmp_file = os.path.join(disk_cache.directory, "aa", ".tmp-partial")
+    with open(tmp_file, "wb") as f:
+        f.write(b"x" * 10)
+    assert disk_cache.evict() == 0
+    assert os.path.exists(tmp_file)
@@ -0,0 +1,64 @@
+import pytest
+
+from footage_index import FootageIndex, describe_video, tokenize
+
+
+@pytest.fixture
+def index(tmp_path):
+    footage = FootageIndex(str(tmp_path / "index.sqlite3"), threshold=0.75)
+    footage.add("clip-ocean", "ocean waves", video_id=1, duration=None, width=1920, height=1080,
+                description="sea water beach waves crashing on a beach")
+    footage.add("clip-office", "business meeting", video_id=2, duration=None, width=1920, height=1080,
+                description="business people meeting office teamwork")
+    return footage
+
+
+def test_tokenize_normalizes_order_case_plurals_and_stopwords():
+    assert tokenize("Ocean Waves") == tokenize("the wave of an ocean") == {"ocean", "wave"}
+
+
+def test_describe_video_uses_tags_and_url_slug():
+    video = {"tags": [{"name": "sunset"}, "beach"], "url": "https://www.pexels.com/video/waves-at-dusk-855014/"}
+    assert describe_video(video) == "sunset beach waves at dusk 855014"
+
+
+def test_reworded_query_matches_past_query(index):
+    match = index.find("waves ocean")
+    assert match["clip_key"] == "clip-ocean"
+    assert match["score"] == 1.0
+
+
+def test_one_shared_description_term_is_not_a_match(index):
+    # "people" is one of the office clip's many tags
+    assert index.find("people") is None
+    assert FootageIndex.score(tokenize("people"), ["business meeting"], "business people meeting office") == 0.0
+
+
+def test_two_shared_description_terms_match(index):
+    match = index.find("office teamwork")
+    assert match["clip_key"] == "clip-office"
+    assert match["score"] == pytest.approx(0.9)
+
+
+def test_unrelated_query_does_not_match(index):
+    assert index.find("mountain snow") is None
+    assert index.find("the of") is None
+
+
+def test_excluded_videos_are_skipped(index):
+    assert index.find("ocean waves", exclude={"1"}) is None
+
+
+def test_clip_must_cover_size_and_duration(index):
+    assert index.find("ocean waves", min_size=(3840, 2160)) is None
+    index.add("clip-partial", "city traffic", video_id=3, duration=8)
+    assert index.find("city traffic", min_duration=6)["clip_key"] == "clip-partial"
+    assert index.find("city traffic", min_duration=10) is None
+
+
+def test_add_query_and_remove(index):
+    index.add_query("clip-office", "team discussion")
+    assert index.find("discussion team")["clip_key"] == "clip-office"
+    index.remove("clip-office")
+    assert index.find("business meeting") is None
+    assert index.stats() == {"clips": 1}
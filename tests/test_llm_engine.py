@@ -0,0 +1,57 @@
+import pytest
+
+pytest.importorskip("dotenv")
+from llm_engine import IncrementalJSONArrayParser
+
+
+def feed_all(parser, chunks):
+    elements = []
+    for chunk in chunks:
+        elements += parser.feed(chunk)
+    return elements
+
+
+def test_elements_are_returned_as_soon_as_complete():
+    parser = IncrementalJSONArrayParser()
+    assert parser.feed('[{"scene_id": 1, "text": "One"}, {"scene_id": 2,') == [{"scene_id": 1, "text": "One"}]
+    assert parser.feed(' "text": "Two"}]') == [{"scene_id": 2, "text": "Two"}]
+    assert parser.done
+
+
+def test_code_fence_prefix_is_ignored():
+    parser = IncrementalJSONArrayParser()
+    elements = feed_all(parser, ["```json\n", '[{"text": "a"}]', "\n```"])
+    assert elements == [{"text": "a"}]
+    assert parser.done
+
+
+def test_escaped_quotes_inside_strings():
+    parser = IncrementalJSONArrayParser()
+    elements = feed_all(parser, ['[{"text": "She said \\"hi\\"', ' and left"}]'])
+    assert elements == [{"text": 'She said "hi" and left'}]
+
+
+def test_escaped_backslash_before_closing_quote():
+    parser = IncrementalJSONArrayParser()
+    assert parser.feed('[{"path": "C:\\\\"}, {"path": "D"}]') == [{"path": "C:\\"}, {"path": "D"}]
+
+
+def test_brackets_inside_strings():
+    parser = IncrementalJSONArrayParser()
+    elements = feed_all(parser, ['[{"text": "a ] b }', ' [c] {d"}, {"text": "e"}]'])
+    assert elements == [{"text": "a ] b } [c] {d"}, {"text": "e"}]
+    assert parser.done
+
+
+def test_split_one_character_at_a_time():
+    text = '```json\n[{"q": "x\\"]"}, {"n": [1, 2, {"m": "}"}]}]\n```'
+    parser = IncrementalJSONArrayParser()
+    elements = feed_all(parser, list(text))
+    assert elements == [{"q": 'x"]'}, {"n": [1, 2, {"m": "}"}]}]
+
+
+def test_text_after_the_array_is_ignored():
+    parser = IncrementalJSONArrayParser()
+    assert parser.feed('[{"a": 1}] trailing {"b": 2}') == [{"a": 1}]
+    assert parser.done
+    assert parser.feed('{"c": 3}') == []
@@ -0,0 +1,63 @@
+import json
+import os
+
+from manifest import MANIFEST_FILENAME, JobManifest
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+    return str(path)
+
+
+def test_entry_is_fresh_for_same_file_and_inputs(tmp_path):
+    job_manifest = JobManifest(str(tmp_path))
+    entry = job_manifest.make_entry(write(tmp_path / "audio_1.mp3", "narration"), "input-1")
+    assert entry["path"] == "audio_1.mp3"
+    assert job_manifest.is_fresh(entry, "input-1")
+
+
+def test_entry_is_stale_when_inputs_change(tmp_path):
+    job_manifest = JobManifest(str(tmp_path))
+    entry = job_manifest.make_entry(write(tmp_path / "audio_1.mp3", "narration"), "input-1")
+    assert not job_manifest.is_fresh(entry, "input-2")
+
+
+def test_entry_is_stale_when_file_changes_or_disappears(tmp_path):
+    job_manifest = JobManifest(str(tmp_path))
+    path = write(tmp_path / "audio_1.mp3", "narration")
+    entry = job_manifest.make_entry(path, "input-1")
+    write(path, "different narration")
+    assert not job_manifest.is_fresh(entry, "input-1")
+    os.remove(path)
+    assert not job_manifest.is_fresh(entry, "input-1")
+    assert not job_manifest.is_fresh(None, "input-1")
+
+
+def test_progress_survives_a_reload(tmp_path):
+    job_manifest = JobManifest(str(tmp_path))
+    text_entry = job_manifest.make_entry(write(tmp_path / "text.txt", "text"), "extract-1")
+    job_manifest.complete_phase("extract", text_entry)
+    audio_entry = job_manifest.make_entry(write(tmp_path / "audio_2.mp3", "narration"), "audio-2")
+    job_manifest.set_scene_output(1, "audio", audio_entry)
+
+    reloaded = JobManifest.load(str(tmp_path))
+    assert reloaded.phase("extract") == text_entry
+    assert reloaded.scene(0) == {}
+    assert reloaded.scene(1)["audio"] == audio_entry
+    assert reloaded.is_fresh(reloaded.scene(1)["audio"], "audio-2")
+
+
+def test_truncate_scenes_drops_removed_scenes(tmp_path):
+    job_manifest = JobManifest(str(tmp_path))
+    for i in range(3):
+        job_manifest.set_scene_output(i, "audio", {"path": f"audio_{i}.mp3"})
+    job_manifest.truncate_scenes(1)
+    assert len(JobManifest.load(str(tmp_path)).data["scenes"]) == 1
+
+
+def test_unreadable_or_old_manifest_starts_over(tmp_path):
+    write(tmp_path / MANIFEST_FILENAME, "{not json")
+    assert JobManifest.load(str(tmp_path)).data["phases"] == {}
+    write(tmp_path / MANIFEST_FILENAME, json.dumps({"version": 0, "phases": {"extract": {}}, "scenes": []}))
+    assert JobManifest.load(str(tmp_path)).data["phases"] == {}
@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("requests")
+import media_gen
+from media_gen import NARRATION_SEPARATOR, narration_cut_points, select_rendition
+
+
+def words(texts, pause=0.5, word_seconds=0.3):
+    """Edge TTS-style (offset, duration, word) boundaries, one word every word_seconds."""
+    boundaries = []
+    offset = 0.0
+    for text in texts:
+        for word in text.split():
+            boundaries.append((offset, word_seconds - 0.05, word.strip(".,")))
+            offset += word_seconds
+        offset += pause
+    return boundaries
+
+
+def test_cut_points_fall_in_the_pause_between_scenes():
+    texts = ["Hello there.", "General Kenobi."]
+    cuts = narration_cut_points(texts, words(texts))
+    # First scene ends at 0.3 + 0.25, second starts at 0.6 + 0.5
+    assert cuts == [pytest.approx((0.55 + 1.1) / 2)]
+
+
+def test_repeated_words_are_assigned_to_the_right_scene():
+    texts = ["The city wakes.", "The city sleeps.", "The city wakes again."]
+    boundaries = words(texts)
+    cuts = narration_cut_points(texts, boundaries)
+    assert len(cuts) == 2
+    scene_starts = [b[0] for b in boundaries if b[2] == "The"]
+    assert scene_starts[0] < cuts[0] < scene_starts[1] < cuts[1] < scene_starts[2]
+
+
+def test_scene_without_boundaries_returns_none():
+    texts = ["One two.", "Three four."]
+    assert narration_cut_points(texts, words(texts[:1])) is None
+
+
+def test_normalized_word_stays_with_current_scene():
+    texts = ["It costs 5 dollars.", "Then it ends."]
+    boundaries = words(texts)
+    # Edge TTS speaks "5" as "five", which is not in the text
+    boundaries = [(o, d, "five" if w == "5" else w) for o, d, w in boundaries]
+    cuts = narration_cut_points(texts, boundaries)
+    then = next(o for o, _, w in boundaries if w == "Then")
+    assert cuts[0] < then
+    assert NARRATION_SEPARATOR not in "".join(texts)
+
+
+def rendition(width, height, fps=25, size=None, link="https://example.com/v.mp4"):
+    return {"width": width, "height": height, "fps": fps, "size": size, "link": link}
+
+
+def test_smallest_covering_rendition_is_chosen():
+    files = [rendition(3840, 2160), rendition(1920, 1080), rendition(1280, 720)]
+    assert select_rendition(files, target_size=(1280, 720)) == files[2]
+    assert select_rendition(files, target_size=(1600, 900)) == files[1]
+
+
+def test_largest_rendition_when_none_covers():
+    files = [rendition(640, 360), rendition(1280, 720)]
+    assert select_rendition(files, target_size=(1920, 1080)) == files[1]
+
+
+def test_closest_fps_breaks_ties():
+    files = [rendition(1920, 1080, fps=60), rendition(1920, 1080, fps=24)]
+    assert select_rendition(files, target_size=(1920, 1080), target_fps=24) == files[1]
+
+
+def test_budget_skips_renditions_that_do_not_fit():
+    files = [rendition(1920, 1080, size=5_000_000), rendition(1280, 720, size=2_000_000)]
+    assert select_rendition(files, target_size=(1920, 1080), max_bytes=3_000_000) == files[1]
+    # Nothing fits: the smallest download
+    assert select_rendition(files, target_size=(1920, 1080), max_bytes=1_000) == files[1]
+
+
+def test_unusable_renditions_are_ignored():
+    files = [rendition(1920, 1080, link=None), {"link": "https://example.com/hls.m3u8"}]
+    assert select_rendition(files) is None
+    assert select_rendition([]) is None
+
+
+def test_footage_counters_are_consistent_across_threads(monkeypatch):
+    monkeypatch.setattr(media_gen, "FOOTAGE_STATS", {"hits": 0, "misses": 0})
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: media_gen._count_footage_lookup("hits" if i % 2 else "misses"), range(20000)))
+    assert media_gen.footage_stats() == {"hits": 10000, "misses": 10000}
+
+
+def test_claim_video_skips_results_other_scenes_use():
+    videos = [{"id": 1}, {"id": 2}, {"id": 3}]
+    claims = media_gen.VideoClaims()
+    claims.claim(1)
+    assert media_gen._claim_video(videos, claims) == {"id": 2}
+    assert 2 in claims
+    assert media_gen._claim_video(videos, claims) == {"id": 3}
+    # Every result is taken: reuse the top one rather than go without footage
+    assert media_gen._claim_video(videos, claims) == {"id": 1}
+    assert media_gen._claim_video(videos) == {"id": 1}
+
+
+def test_concurrent_scenes_never_claim_the_same_video():
+    videos = [{"id": i} for i in range(50)]
+    claims = media_gen.VideoClaims()
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        picked = list(executor.map(lambda _: media_gen._claim_video(videos, claims)["id"], range(50)))
+    assert sorted(picked) == list(range(50))
+
+
+def test_partial_download_is_charged_only_for_its_seconds():
+    video_file = rendition(1920, 1080, size=60_000_000)
+    assert media_gen.estimate_rendition_bytes(video_file, 60) == 60_000_000
+    assert media_gen.estimate_rendition_bytes(video_file, 60, download_seconds=6) == 6_000_000
+    assert media_gen.estimate_rendition_bytes(video_file, 60, download_seconds=90) == 60_000_000
+    estimated = rendition(1920, 1080, fps=24)
+    assert (media_gen.estimate_rendition_bytes(estimated, 60, download_seconds=6)
+            == media_gen.estimate_rendition_bytes(estimated, 6))
+
+
+def test_budget_fits_the_partial_download():
+    files = [rendition(1920, 1080, size=60_000_000), rendition(1280, 720, size=20_000_000)]
+    # The full 1080p clip is over budget, its first 6 of 60 seconds are not
+    assert select_rendition(files, target_size=(1920, 1080), max_bytes=10_000_000, duration=60) == files[1]
+    assert select_rendition(files, target_size=(1920, 1080), max_bytes=10_000_000, duration=60,
+                            download_seconds=6) == files[0]
@@ -0,0 +1,118 @@
+import os
+import time
+
+import pytest
+
+import media_server
+from media_server import _parse_range
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=0-0", (0, 0)),
+    ("bytes=99-99", (99, 99)),
+    ("bytes=50-", (50, 99)),
+    ("bytes=0-", (0, 99)),
+    ("bytes=-1", (99, 99)),
+    ("bytes=-100", (0, 99)),
+    # Ends past the file and suffixes longer than it are clamped
+    ("bytes=90-500", (90, 99)),
+    ("bytes=-500", (0, 99)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=100-",
+    "bytes=100-200",
+    "bytes=50-10",
+    "bytes=-",
+    "bytes=0-10,20-30",
+    "items=0-10",
+    "bytes=abc",
+])
+def test_unsatisfiable_or_unsupported_ranges(header):
+    assert _parse_range(header, 100) is None
+
+
+def test_empty_file():
+    assert _parse_range("bytes=0-", 0) is None
+    assert _parse_range("bytes=-10", 0) is None
+
+
+def make_job(root, job_id, size, age=0):
+    directory = root / job_id
+    directory.mkdir(parents=True)
+    video = directory / "output.mp4"
+    video.write_bytes(b"x" * size)
+    modified = time.time() - age
+    os.utime(video, (modified, modified))
+    os.utime(directory, (modified, modified))
+    return directory
+
+
+def test_prune_unpublishes_least_recently_published_past_budget(tmp_path):
+    make_job(tmp_path, "aaaaaaaaaaaa", 100, age=30)
+    make_job(tmp_path, "bbbbbbbbbbbb", 100, age=20)
+    make_job(tmp_path, "cccccccccccc", 100, age=10)
+    removed = media_server.prune(max_bytes=200, max_age=3600, root=str(tmp_path))
+    assert removed == ["aaaaaaaaaaaa"]
+    assert sorted(os.listdir(tmp_path)) == ["bbbbbbbbbbbb", "cccccccccccc"]
+
+
+def test_prune_unpublishes_expired_jobs(tmp_path):
+    make_job(tmp_path, "aaaaaaaaaaaa", 10, age=7200)
+    make_job(tmp_path, "bbbbbbbbbbbb", 10)
+    assert media_server.prune(max_bytes=10**6, max_age=3600, root=str(tmp_path)) == ["aaaaaaaaaaaa"]
+
+
+def test_prune_keeps_the_job_being_published(tmp_path):
+    make_job(tmp_path, "aaaaaaaaaaaa", 100, age=30)
+    make_job(tmp_path, "bbbbbbbbbbbb", 100, age=7200)
+    removed = media_server.prune(keep="bbbbbbbbbbbb", max_bytes=50, max_age=3600, root=str(tmp_path))
+    assert removed == ["aaaaaaaaaaaa"]
+    assert os.listdir(tmp_path) == ["bbbbbbbbbbbb"]
+
+
+def test_publish_file_skips_files_too_large_for_static_serving(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_server, "MEDIA_PORT", 0)
+    monkeypatch.setattr(media_server, "STATIC_MAX_FILE_BYTES", 50)
+    small, large = tmp_path / "small.mp4", tmp_path / "large.mp4"
+    small.write_bytes(b"x" * 50)
+    large.write_bytes(b"x" * 51)
+    directory = tmp_path / "media" / "aaaaaaaaaaaa"
+    assert media_server.publish_file(str(small), str(directory)) == str(directory / "small.mp4")
+    assert media_server.publish_file(str(large), str(directory)) is None
+    assert not (directory / "large.mp4").exists()
+
+    monkeypatch.setattr(media_server, "MEDIA_PORT", 8502)
+    assert media_server.publish_file(str(large), str(directory)) == str(directory / "large.mp4")
+
+
+def test_publish_file_replaces_an_earlier_version(tmp_path, monkeypatch):
+    monkeypatch.setattr(media_server, "MEDIA_PORT", 0)
+    monkeypatch.setattr(media_server, "STATIC_MAX_FILE_BYTES", 50)
+    directory = tmp_path / "media" / "aaaaaaaaaaaa"
+    video = tmp_path / "output.mp4"
+    video.write_bytes(b"x" * 10)
+    media_server.publish_file(str(video), str(directory))
+    # A finalized render over the static limit must not leave the preview published
+    video.unlink()
+    video.write_bytes(b"x" * 100)
+    assert media_server.publish_file(str(video), str(directory)) is None
+    assert not (directory / "output.mp4").exists()
+
+
+def test_static_urls_are_same_origin_and_drop_the_download_flag(monkeypatch):
+    monkeypatch.setattr(media_server, "MEDIA_PORT", 0)
+    url = media_server.media_url("aaaaaaaaaaaa", "output.mp4", {"Host": "example.com"}, download=True)
+    assert url == "app/static/media/aaaaaaaaaaaa/output.mp4"
+
+
+def test_dedicated_server_url_follows_the_app_scheme(monkeypatch):
+    monkeypatch.setattr(media_server, "MEDIA_PORT", 8502)
+    monkeypatch.setattr(media_server, "MEDIA_URL", "")
+    headers = {"Host": "example.com:443", "X-Forwarded-Proto": "https"}
+    url = media_server.media_url("aaaaaaaaaaaa", "output.mp4", headers, download=True)
+    assert url == "https://example.com:8502/media/aaaaaaaaaaaa/output.mp4?download=1"
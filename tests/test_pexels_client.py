@@ -0,0 +1,47 @@
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+from pexels_client import PexelsError, RateLimiter
+
+
+def quota_headers(remaining, reset_in):
+    return {"X-Ratelimit-Remaining": str(remaining), "X-Ratelimit-Reset": str(time.time() + reset_in)}
+
+
+def test_bursts_while_quota_is_left():
+    limiter = RateLimiter(rate=5.0, burst=10)
+    limiter.update(quota_headers(1000, 30 * 24 * 3600))
+    started = time.monotonic()
+    for _ in range(10):
+        limiter.acquire()
+    assert time.monotonic() - started < 0.5
+    assert limiter.remaining == 990
+
+
+def test_remaining_caps_the_burst():
+    limiter = RateLimiter(rate=5.0, burst=10)
+    limiter.update(quota_headers(2, 1))
+    assert limiter.tokens == 2
+    limiter.acquire()
+    limiter.acquire()
+    assert limiter.remaining == 0
+
+
+def test_short_reset_is_waited_for():
+    limiter = RateLimiter(rate=100.0, burst=10)
+    limiter.update(quota_headers(0, 1))
+    started = time.monotonic()
+    limiter.acquire()
+    assert 0.9 <= time.monotonic() - started < 3
+
+
+def test_long_reset_fails_instead_of_blocking():
+    limiter = RateLimiter()
+    limiter.update(quota_headers(0, 20 * 24 * 3600))
+    started = time.monotonic()
+    with pytest.raises(PexelsError) as excinfo:
+        limiter.acquire()
+    assert excinfo.value.status_code == 429
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,142 @@
+import json
+import os
+
+import pytest
+
+import llm_engine
+import media_gen
+import pipeline
+import video_editor
+from manifest import JobManifest
+
+SCRIPT = [
+    {"scene_id": 1, "text": "The ocean at dawn.", "stock_video_query": "ocean sunrise"},
+    {"scene_id": 2, "text": "A city wakes up.", "stock_video_query": "city morning"},
+]
+
+OPTIONS = {
+    "stream_script": False,
+    "long_document": False,
+    "progressive_output": False,
+    "parallel_render": False,
+}
+
+
+def write(path, content):
+    with open(path, "w") as f:
+        f.write(content)
+
+
+@pytest.fixture
+def stages(monkeypatch):
+    """Replaces Gemini, asset fetching and rendering with stand-ins that record their calls."""
+    calls = {"script": 0, "audio": [], "video": [], "render": [], "concat": 0}
+
+    def generate_script(text, model_name, use_cache=True):
+        calls["script"] += 1
+        return [dict(scene) for scene in SCRIPT], None
+
+    async def generate_scene_assets(scenes, output_dir, on_scene_done=None, existing_assets=None, **kwargs):
+        results = []
+        for i, scene in enumerate(scenes):
+            existing = existing_assets(i, scene)
+            result = {
+                "scene_id": scene["scene_id"],
+                "text": scene["text"],
+                "audio_path": os.path.join(output_dir, f"audio_{scene['scene_id']}.mp3"),
+                "video_path": os.path.join(output_dir, f"video_{scene['scene_id']}.mp4"),
+                "errors": [],
+            }
+            if "audio" not in existing:
+                calls["audio"].append(i)
+                write(result["audio_path"], "narration: " + scene["text"])
+            if "video" not in existing:
+                calls["video"].append(i)
+                write(result["video_path"], "footage: " + scene["stock_video_query"])
+            results.append(result)
+            on_scene_done(i, result, i + 1, len(scenes))
+        return results
+
+    def render_scene_segments(scenes, on_segment_done=None, **kwargs):
+        segments = {}
+        for index, audio_path, video_path, text, segment_path in scenes:
+            calls["render"].append(index)
+            write(segment_path, "segment: " + text)
+            segments[index] = segment_path
+            on_segment_done(index, segment_path)
+        return segments, None
+
+    def concat_segments(segment_paths, output_path):
+        calls["concat"] += 1
+        write(output_path, "".join(open(path).read() for path in segment_paths))
+
+    monkeypatch.setattr(llm_engine, "generate_script", generate_script)
+    monkeypatch.setattr(media_gen, "generate_scene_assets", generate_scene_assets)
+    monkeypatch.setattr(video_editor, "render_scene_segments", render_scene_segments)
+    monkeypatch.setattr(video_editor, "concat_segments", concat_segments)
+    return calls
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "document.txt"
+    write(path, "A short document about mornings.")
+    return str(path)
+
+
+def test_first_run_does_every_phase(tmp_path, source, stages):
+    output_path, error = pipeline.run_pipeline(source, str(tmp_path / "job"), OPTIONS)
+    assert error is None
+    assert os.path.exists(output_path)
+    assert stages == {"script": 1, "audio": [0, 1], "video": [0, 1], "render": [0, 1], "concat": 1}
+
+
+def test_rerun_resumes_without_redoing_work(tmp_path, source, stages):
+    work_dir = str(tmp_path / "job")
+    pipeline.run_pipeline(source, work_dir, OPTIONS)
+    for calls in stages.values():
+        if isinstance(calls, list):
+            calls.clear()
+    stages.update(script=0, concat=0)
+
+    output_path, error = pipeline.run_pipeline(source, work_dir, OPTIONS)
+    assert error is None
+    assert stages == {"script": 0, "audio": [], "video": [], "render": [], "concat": 0}
+
+
+def test_missing_segment_is_rendered_again(tmp_path, source, stages):
+    work_dir = str(tmp_path / "job")
+    pipeline.run_pipeline(source, work_dir, OPTIONS)
+    stages["render"].clear()
+    os.remove(os.path.join(work_dir, pipeline.SEGMENT_DIRNAME, "scene_0002.mp4"))
+
+    _, error = pipeline.run_pipeline(source, work_dir, OPTIONS)
+    assert error is None
+    assert stages["render"] == [1]
+    # The segment came out identical, so the joined video is still fresh
+    assert stages["concat"] == 1
+
+
+def test_edited_scene_gets_new_assets(tmp_path, source, stages):
+    work_dir = str(tmp_path / "job")
+    pipeline.run_pipeline(source, work_dir, OPTIONS)
+    stages["audio"].clear()
+    stages["video"].clear()
+    stages["render"].clear()
+
+    # Saved like JobManager.retry saves an edited script; only the changed scene is redone
+    script_path = os.path.join(work_dir, pipeline.SCRIPT_FILENAME)
+    with open(script_path) as f:
+        script = json.load(f)
+    script[1]["text"] = "A city falls asleep."
+    with open(script_path, "w") as f:
+        json.dump(script, f)
+    job_manifest = JobManifest.load(work_dir)
+    entry = job_manifest.phase("script")
+    job_manifest.complete_phase("script", job_manifest.make_entry(script_path, entry["input_hash"]))
+
+    _, error = pipeline.run_pipeline(source, work_dir, OPTIONS)
+    assert error is None
+    assert stages["script"] == 1
+    assert stages["audio"] == [1]
+    assert stages["render"] == [1]
@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from utils import chunk_text, write_atomic
+
+
+def test_short_text_is_one_chunk():
+    assert chunk_text("One sentence.", 100) == ["One sentence."]
+
+
+def test_empty_text():
+    assert chunk_text("", 100) == []
+
+
+def test_cuts_at_sentence_boundary_in_second_half():
+    text = "First sentence here. Second one follows and runs on for a while"
+    chunks = chunk_text(text, 30)
+    assert chunks[0] == "First sentence here."
+    assert " ".join(chunks) == text
+
+
+def test_falls_back_to_word_boundary():
+    # The only sentence end is in the first half of the window
+    text = "Hi. " + "word " * 20
+    chunks = chunk_text(text.strip(), 40)
+    assert chunks[0] != "Hi."
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert " ".join(chunks) == text.strip()
+    assert all(not chunk.endswith("wor") for chunk in chunks)
+
+
+def test_word_longer_than_window_is_hard_split():
+    chunks = chunk_text("a" * 25, 10)
+    assert chunks == ["a" * 10, "a" * 10, "a" * 5]
+
+
+def test_chunks_respect_max_chars():
+    text = " ".join(f"Sentence number {i} is here." for i in range(50))
+    chunks = chunk_text(text, 120)
+    assert all(len(chunk) <= 120 for chunk in chunks)
+    assert " ".join(chunks) == text
+
+
+def test_write_atomic_replaces_the_file(tmp_path):
+    path = tmp_path / "status.json"
+    path.write_text("old")
+    write_atomic(str(path), "new")
+    assert path.read_text() == "new"
+    assert os.listdir(tmp_path) == ["status.json"]
+
+
+def test_write_atomic_failure_keeps_the_old_file_and_no_temp_file(tmp_path):
+    path = tmp_path / "status.json"
+    path.write_text("old")
+    with pytest.raises(TypeError):
+        write_atomic(str(path), b"not text")
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["status.json"]
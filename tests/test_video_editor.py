@@ -0,0 +1,78 @@
+import subprocess
+
+import pytest
+
+import video_editor
+from video_editor import HLSPlaylist
+
+
+@pytest.fixture
+def fake_ffmpeg(monkeypatch):
+    """Stands in for the ffmpeg remux and probe so playlists can be checked without ffmpeg."""
+    durations = {}
+
+    def run(cmd, **kwargs):
+        with open(cmd[-1], "wb") as f:
+            f.write(b"ts")
+        return subprocess.CompletedProcess(cmd, 0, "", "")
+
+    monkeypatch.setattr(video_editor.utils, "ffmpeg_binary", lambda required=False: "ffmpeg")
+    monkeypatch.setattr(video_editor.subprocess, "run", run)
+    monkeypatch.setattr(video_editor, "_probe_duration", lambda path: durations[path])
+    return durations
+
+
+def read_playlist(playlist):
+    with open(playlist.path) as f:
+        return f.read().splitlines()
+
+
+def test_playlist_grows_with_each_segment(tmp_path, fake_ffmpeg):
+    fake_ffmpeg.update({"scene_1.mp4": 4.5, "scene_2.mp4": 3.25})
+    playlist = HLSPlaylist(str(tmp_path / "hls"), target_duration=5)
+
+    playlist.append("scene_1.mp4")
+    lines = read_playlist(playlist)
+    assert lines[:5] == ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-PLAYLIST-TYPE:EVENT",
+                         "#EXT-X-TARGETDURATION:5", "#EXT-X-MEDIA-SEQUENCE:0"]
+    assert lines[5:] == ["#EXTINF:4.500,", "segment_0000.ts"]
+
+    playlist.append("scene_2.mp4")
+    assert read_playlist(playlist)[5:] == [
+        "#EXTINF:4.500,", "segment_0000.ts",
+        "#EXT-X-DISCONTINUITY", "#EXTINF:3.250,", "segment_0001.ts",
+    ]
+    assert (tmp_path / "hls" / "segment_0001.ts").exists()
+
+
+def test_finish_ends_the_playlist(tmp_path, fake_ffmpeg):
+    fake_ffmpeg["scene_1.mp4"] = 2.0
+    playlist = HLSPlaylist(str(tmp_path / "hls"))
+    playlist.append("scene_1.mp4")
+    assert "#EXT-X-ENDLIST" not in read_playlist(playlist)
+    playlist.finish()
+    assert read_playlist(playlist)[-1] == "#EXT-X-ENDLIST"
+
+
+def test_target_duration_covers_the_longest_segment(tmp_path, fake_ffmpeg):
+    fake_ffmpeg["scene_1.mp4"] = 7.2
+    playlist = HLSPlaylist(str(tmp_path / "hls"), target_duration=5)
+    playlist.append("scene_1.mp4")
+    assert "#EXT-X-TARGETDURATION:8" in read_playlist(playlist)
+
+
+def test_existing_directory_is_emptied(tmp_path, fake_ffmpeg):
+    stale = tmp_path / "hls" / "segment_0005.ts"
+    stale.parent.mkdir()
+    stale.write_bytes(b"old")
+    HLSPlaylist(str(tmp_path / "hls"))
+    assert not stale.exists()
+
+
+def test_failed_remux_raises(tmp_path, fake_ffmpeg, monkeypatch):
+    monkeypatch.setattr(video_editor.subprocess, "run",
+                        lambda cmd, **kwargs: subprocess.CompletedProcess(cmd, 1, "", "bad input"))
+    playlist = HLSPlaylist(str(tmp_path / "hls"))
+    with pytest.raises(RuntimeError, match="bad input"):
+        playlist.append("scene_1.mp4")
+    assert playlist.entries == []
@@ -1,34 +1,131 @@
-import PyPDF2
+import io
+import os
 import re
+import itertools
+import shutil
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def extract_text_from_pdf(file_path):
+# Worker processes for page-parallel PDF extraction (0 = one per CPU)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0")) or None
+
+# Documents with fewer pages than this are parsed in-process
+PARALLEL_MIN_PAGES = 16
+
+# ffmpeg used for probing, partial downloads, audio splitting and rendering
+# (default: ffmpeg on PATH, else the one bundled with imageio-ffmpeg)
+FFMPEG_BINARY = os.getenv("FFMPEG_BINARY") or shutil.which("ffmpeg")
+
+_worker_reader = None
+
+def _pdf_reader(pdf_bytes):
+    # PyPDF2 is only loaded once a PDF is actually read
+    import PyPDF2
+    return PyPDF2.PdfReader(io.BytesIO(pdf_bytes))
+
+def _init_page_worker(pdf_bytes):
+    global _worker_reader
+    _worker_reader = _pdf_reader(pdf_bytes)
+
+def _extract_page(index):
+    return _worker_reader.pages[index].extract_text() or ""
+
+def _read_pdf_bytes(file_path):
+    if isinstance(file_path, str):
+        with open(file_path, 'rb') as file:
+            return file.read()
+    if hasattr(file_path, "getvalue"):
+        return file_path.getvalue()
+    file_path.seek(0)
+    return file_path.read()
+
+def iter_pdf_pages(file_path, page_range=None, max_chars=None, workers=None):
+    """
+    Yields the text of each PDF page, in order, as soon as it has been parsed.
+    
+    With more than one worker, pages are parsed in a process pool while earlier
+    pages are already being consumed. Parsing stops once `max_chars` characters
+    have been yielded, so pages past the LLM input limit are never parsed.
+    
+    Args:
+        file_path (str or file-like object): Path to the PDF file or a file-like object.
+        page_range (tuple or range): Optional 0-based (start, stop) range of pages to read.
+        max_chars (int): Optional character budget across all yielded pages.
+        workers (int): Number of worker processes (None = CPU count, 1 = serial).
+        
+    Yields:
+        str: Extracted text of one page.
+    """
+    pdf_bytes = _read_pdf_bytes(file_path)
+    reader = _pdf_reader(pdf_bytes)
+    indices = range(len(reader.pages))
+    if page_range is not None:
+        if not isinstance(page_range, range):
+            page_range = range(*page_range)
+        indices = indices[page_range.start:page_range.stop:page_range.step]
+
+    workers = workers or os.cpu_count() or 1
+    chars = 0
+
+    if workers <= 1 or len(indices) < PARALLEL_MIN_PAGES:
+        for index in indices:
+            page_text = reader.pages[index].extract_text() or ""
+            yield page_text
+            chars += len(page_text)
+            if max_chars is not None and chars >= max_chars:
+                return
+        return
+
+    # Keep a bounded window of pages in flight so an early stop wastes little work
+    window = workers * 2
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_page_worker,
+        initargs=(pdf_bytes,)
+    )
+    try:
+        pending = deque()
+        remaining = iter(indices)
+        for index in itertools.islice(remaining, window):
+            pending.append(executor.submit(_extract_page, index))
+
+        while pending:
+            page_text = pending.popleft().result()
+            next_index = next(remaining, None)
+            if next_index is not None:
+                pending.append(executor.submit(_extract_page, next_index))
+
+            yield page_text
+            chars += len(page_text)
+            if max_chars is not None and chars >= max_chars:
+                return
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def extract_text_from_pdf(file_path, page_range=None, max_chars=None, workers=1):
     """
     Extracts text from a PDF file.
     
     Args:
         file_path (str or file-like object): Path to the PDF file or a file-like object.
+        page_range (tuple or range): Optional 0-based (start, stop) range of pages to read.
+        max_chars (int): Optional character budget; later pages are not parsed.
+        workers (int): Number of worker processes (None = CPU count, 1 = serial).
         
     Returns:
         str: Extracted text from the PDF.
     """
-    text = ""
     try:
         # Handle both file path string and file-like objects (from Streamlit)
-        if isinstance(file_path, str):
-            with open(file_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                for page in reader.pages:
-                    text += page.extract_text() + "\n"
-        else:
-            reader = PyPDF2.PdfReader(file_path)
-            for page in reader.pages:
-                text += page.extract_text() + "\n"
+        pages = iter_pdf_pages(file_path, page_range=page_range, max_chars=max_chars, workers=workers)
+        return "".join(page_text + "\n" for page_text in pages)
                 
     except Exception as e:
         print(f"Error reading PDF: {e}")
         return None
-        
-    return text
 
 def clean_text(text):
     """
@@ -51,3 +148,89 @@ def clean_text(text):
     text = text.strip()
     
     return text
+
+def chunk_text(text, max_chars):
+    """
+    Splits cleaned text into chunks of at most `max_chars` characters.
+    
+    Chunks end at a sentence boundary where one falls in the second half of
+    the window, otherwise at a word boundary.
+    
+    Args:
+        text (str): Cleaned text (see clean_text).
+        max_chars (int): Maximum characters per chunk.
+        
+    Returns:
+        list: Chunks, in order (empty for empty text).
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = start + max_chars
+        if end >= len(text):
+            chunks.append(text[start:])
+            break
+        window = text[start:end]
+        cut = max(window.rfind(". "), window.rfind("? "), window.rfind("! ")) + 1
+        if cut <= max_chars // 2:
+            cut = window.rfind(" ")
+            if cut <= 0:
+                cut = max_chars
+        chunks.append(text[start:start + cut])
+        start += cut
+    return [chunk.strip() for chunk in chunks if chunk.strip()]
+
+def clean_pages(pages):
+    """
+    Cleans page texts as they arrive, so cleaning overlaps with extraction.
+    
+    Equivalent to clean_text("\\n".join(pages)) but consumes a stream.
+    
+    Args:
+        pages (iterable): Raw page texts (e.g. from iter_pdf_pages).
+        
+    Returns:
+        str: Cleaned text.
+    """
+    parts = []
+    for page_text in pages:
+        cleaned = clean_text(page_text)
+        if cleaned:
+            parts.append(cleaned)
+    return " ".join(parts)
+
+def write_atomic(path, text):
+    """
+    Writes a text file through a temp file in the same directory and a rename,
+    so readers never see it half-written (e.g. a status being polled, or a
+    report when the process is killed). The temp file is removed on failure.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def ffmpeg_binary(required=False):
+    """
+    Returns the path of the ffmpeg executable (see FFMPEG_BINARY).
+
+    Args:
+        required (bool): Raise instead of returning None when none is found.
+
+    Returns:
+        str: The executable, or None.
+    """
+    if FFMPEG_BINARY:
+        return FFMPEG_BINARY
+    try:
+        import imageio_ffmpeg
+        return imageio_ffmpeg.get_ffmpeg_exe()
+    except Exception:
+        if required:
+            raise RuntimeError("ffmpeg not found (install it or imageio-ffmpeg).")
+        return None
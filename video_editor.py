@@ -1,113 +1,484 @@
 import os
-import textwrap
-import PIL.Image
-
-# Monkey-patch ANTIALIAS for Pillow 10+ compatibility
-if not hasattr(PIL.Image, 'ANTIALIAS'):
-    PIL.Image.ANTIALIAS = PIL.Image.LANCZOS
-from moviepy.editor import (
-    AudioFileClip,
-    VideoFileClip,
-    TextClip,
-    CompositeVideoClip,
-    concatenate_videoclips,
-    ColorClip,
-    vfx
-)
-from moviepy.config import change_settings
-
-# Try to detect ImageMagick (required for TextClip)
-# On Render/Linux, it's usually just 'convert' or 'magick'
-# If not found, TextClip might fail.
-# change_settings({"IMAGEMAGICK_BINARY": "/usr/bin/convert"}) 
-
-def create_video(audio_paths, video_paths, text_scripts, output_path):
+import re
+import math
+import time
+import shutil
+import tempfile
+import subprocess
+import functools
+import multiprocessing
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+import utils
+import metrics
+
+# Output format shared by every render path; per-scene segments must match
+# exactly so they can be joined with a stream-copy concat.
+OUTPUT_SIZE = (1920, 1080)
+OUTPUT_FPS = 24
+VIDEO_CODEC = "libx264"
+AUDIO_CODEC = "aac"
+AUDIO_FPS = 44100
+SEGMENT_FFMPEG_PARAMS = ["-pix_fmt", "yuv420p", "-ac", "2"]
+
+# Encoder settings per render quality. "preview" is a quick low-resolution
+# draft; "final" is the full-quality output. threads=None splits the CPUs
+# between concurrently rendered segments.
+RENDER_PROFILES = {
+    "preview": {"size": (854, 480), "fps": 12, "preset": "ultrafast", "crf": 32, "threads": None},
+    "final": {"size": OUTPUT_SIZE, "fps": OUTPUT_FPS, "preset": "medium", "crf": 23, "threads": None},
+}
+DEFAULT_RENDER_PROFILE = os.getenv("RENDER_PROFILE", "final")
+
+# Gap between the subtitle and the bottom edge
+SUBTITLE_MARGIN = 50
+
+# How scene segments are rendered: "ffmpeg" compiles each scene into one
+# native ffmpeg filtergraph; "moviepy" composites every frame in Python. Both
+# write identical codec parameters, so their segments can be joined together.
+RENDER_BACKENDS = ("ffmpeg", "moviepy")
+DEFAULT_RENDER_BACKEND = os.getenv("RENDER_BACKEND", "ffmpeg")
+
+# Progressive output: finished scene segments are also published as an HLS
+# playlist while the rest of the video renders (see HLSPlaylist)
+PROGRESSIVE_OUTPUT = os.getenv("PROGRESSIVE_OUTPUT", "1") == "1"
+PLAYLIST_FILENAME = "playlist.m3u8"
+
+# Worker processes for parallel scene rendering (0 = one per CPU)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "0")) or None
+
+@functools.lru_cache(maxsize=None)
+def _moviepy():
+    """
+    Imports moviepy.editor on first use.
+
+    It takes seconds to load, so the UI and the earlier pipeline phases never pay for it.
+    """
+    import PIL.Image
+
+    # Monkey-patch ANTIALIAS for Pillow 10+ compatibility
+    if not hasattr(PIL.Image, 'ANTIALIAS'):
+        PIL.Image.ANTIALIAS = PIL.Image.LANCZOS
+    import moviepy.editor
+    return moviepy.editor
+
+def get_render_profile(profile=None):
+    """
+    Returns the encoder settings of a render profile.
+
+    Args:
+        profile (str or dict): A RENDER_PROFILES name, or a dict overriding
+            fields of the "final" profile (None = DEFAULT_RENDER_PROFILE).
+
+    Returns:
+        dict: size, fps, preset, crf and threads.
+    """
+    if isinstance(profile, dict):
+        return dict(RENDER_PROFILES["final"], **profile)
+    name = profile or DEFAULT_RENDER_PROFILE
+    if name not in RENDER_PROFILES:
+        raise ValueError(f"Unknown render profile: {name!r} (expected one of {', '.join(RENDER_PROFILES)})")
+    return dict(RENDER_PROFILES[name])
+
+def _build_scene_clip(audio_path, video_path, text, index, resources, profile=None):
+    """
+    Builds the composite clip (footage + narration + subtitles) for one scene.
+    
+    Footage and subtitles are scaled to the profile's output size. Every
+    ffmpeg reader opened for the scene is registered on `resources`, which the
+    caller closes as soon as the clip has been written.
+
+    Args:
+        resources (contextlib.ExitStack): Collects the source clips to close.
+
+    Returns:
+        CompositeVideoClip or None if the scene has no usable audio.
+    """
+    # Load Audio
+    if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+         print(f"Skipping scene {index+1}: Invalid audio file {audio_path}")
+         return None
+
+    import subtitles
+
+    editor = _moviepy()
+    profile = get_render_profile(profile)
+    width, height = profile["size"]
+    audio_clip = editor.AudioFileClip(audio_path)
+    resources.callback(audio_clip.close)
+    duration = audio_clip.duration
+    
+    # Load Video
+    if os.path.exists(video_path):
+        # Narration comes from audio_path, so the footage's own audio track is never read
+        video_clip = editor.VideoFileClip(video_path, audio=False)
+        resources.callback(video_clip.close)
+        # Resize/Crop to the output size (Landscape)
+        # First resize to cover it
+        target_ratio = width / height
+        current_ratio = video_clip.w / video_clip.h
+        
+        if current_ratio > target_ratio:
+            # Too wide, resize by height
+            video_clip = video_clip.resize(height=height)
+        else:
+            # Too tall/square, resize by width
+            video_clip = video_clip.resize(width=width)
+            
+        # Crop center
+        video_clip = video_clip.crop(x1=video_clip.w/2 - width/2, y1=video_clip.h/2 - height/2,
+                                     width=width, height=height)
+    else:
+        # Fallback: Solid Color
+        print(f"Video file missing for scene {index+1}, using fallback.")
+        video_clip = editor.ColorClip(size=(width, height), color=(0, 0, 0), duration=duration)
+
+    # Loop video if shorter than audio
+    if video_clip.duration < duration:
+        video_clip = video_clip.loop(duration=duration)
+    else:
+        video_clip = video_clip.subclip(0, duration)
+    
+    video_clip = video_clip.set_audio(audio_clip)
+    
+    # Create Subtitles (rasterized in-process and cached, no ImageMagick)
+    scale = height / OUTPUT_SIZE[1]
+    caption = subtitles.render_caption(
+        text, fontsize=round(subtitles.FONT_SIZE * scale), width=round(subtitles.CAPTION_WIDTH * scale)
+    )
+    txt_clip = (
+        editor.ImageClip(caption)
+        .set_position(("center", height - caption.shape[0] - round(SUBTITLE_MARGIN * scale)))
+        .set_duration(duration)
+    )
+    
+    # Composite Video + Text
+    return editor.CompositeVideoClip([video_clip, txt_clip])
+
+def _probe_duration(path):
+    """Returns a media file's duration in seconds, read from ffmpeg's header probe."""
+    result = subprocess.run([utils.ffmpeg_binary(required=True), "-hide_banner", "-i", path],
+                            capture_output=True, text=True)
+    match = re.search(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)", result.stderr)
+    if not match:
+        raise RuntimeError(f"Could not read the duration of {path}")
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+def _scene_filtergraph(profile, caption_size):
+    """
+    Builds the filtergraph of one scene: cover-scale and center-crop the
+    footage to the output size, resample it to the output fps and overlay the
+    subtitle above the bottom margin (what _build_scene_clip does with MoviePy).
+    """
+    width, height = profile["size"]
+    margin = round(SUBTITLE_MARGIN * height / OUTPUT_SIZE[1])
+    caption_width, caption_height = caption_size
+    return (
+        f"[0:v]scale={width}:{height}:force_original_aspect_ratio=increase,"
+        f"crop={width}:{height},setsar=1,fps={profile['fps']}[footage];"
+        f"[footage][2:v]overlay=x={(width - caption_width) // 2}:y={height - caption_height - margin},"
+        f"format=yuv420p[video]"
+    )
+
+def _render_scene_ffmpeg(audio_path, video_path, text, index, segment_path, threads, profile):
+    """
+    Renders one scene with a single ffmpeg invocation, without decoding any
+    frame in Python.
+
+    The footage is looped (or cut) to the narration's length with
+    -stream_loop/-t; a missing clip becomes a black background like the
+    MoviePy fallback.
+
+    Returns:
+        float or None: The scene's duration in seconds, or None if the scene
+            has no usable audio.
+    """
+    if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
+        print(f"Skipping scene {index+1}: Invalid audio file {audio_path}")
+        return None
+
+    import subtitles
+
+    width, height = profile["size"]
+    duration = _probe_duration(audio_path)
+    if os.path.exists(video_path):
+        footage_input = ["-stream_loop", "-1", "-i", video_path]
+    else:
+        print(f"Video file missing for scene {index+1}, using fallback.")
+        footage_input = ["-f", "lavfi", "-i", f"color=c=black:s={width}x{height}:r={profile['fps']}"]
+
+    scale = height / OUTPUT_SIZE[1]
+    caption_path = segment_path + ".caption.png"
+    caption_size = subtitles.render_caption_file(
+        text, caption_path, fontsize=round(subtitles.FONT_SIZE * scale), width=round(subtitles.CAPTION_WIDTH * scale)
+    )
+    try:
+        cmd = [
+            utils.ffmpeg_binary(required=True), "-y", "-loglevel", "error",
+            *footage_input, "-i", audio_path, "-i", caption_path,
+            "-filter_complex", _scene_filtergraph(profile, caption_size),
+            "-map", "[video]", "-map", "1:a", "-t", f"{duration:.3f}",
+            "-c:v", VIDEO_CODEC, "-preset", profile["preset"], "-crf", str(profile["crf"]),
+            "-threads", str(profile["threads"] or threads or 0), "-r", str(profile["fps"]),
+            "-c:a", AUDIO_CODEC, "-ar", str(AUDIO_FPS), *SEGMENT_FFMPEG_PARAMS, segment_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg render failed: {result.stderr.strip()}")
+    finally:
+        os.remove(caption_path)
+    return duration
+
+def _write_clip(clip, output_path, threads=None, logger="bar", profile=None):
+    profile = get_render_profile(profile)
+    # Keep MoviePy's temp audio next to the output instead of the working directory
+    base, _ = os.path.splitext(output_path)
+    clip.write_videofile(
+        output_path,
+        fps=profile["fps"],
+        codec=VIDEO_CODEC,
+        preset=profile["preset"],
+        audio_codec=AUDIO_CODEC,
+        audio_fps=AUDIO_FPS,
+        temp_audiofile=base + "_temp_audio.m4a",
+        threads=profile["threads"] or threads,
+        ffmpeg_params=SEGMENT_FFMPEG_PARAMS + ["-crf", str(profile["crf"])],
+        logger=logger
+    )
+
+def _render_scene_segment(task):
+    """
+    Renders one scene to its own segment file (runs in a worker process).
+    
+    The ffmpeg backend falls back to MoviePy for a scene it cannot render.
+
+    Args:
+        task (tuple): (index, audio_path, video_path, text, segment_path, threads, profile, backend)
+        
+    Returns:
+        tuple: (index, segment_path or None if skipped, error_message or None,
+            stats dict with the worker's duration_s, frames, backend and peak_rss_mb)
+    """
+    index, audio_path, video_path, text, segment_path, threads, profile, backend = task
+    started = time.perf_counter()
+    stats = {"frames": 0, "backend": backend}
+    try:
+        if backend == "ffmpeg":
+            try:
+                duration = _render_scene_ffmpeg(audio_path, video_path, text, index, segment_path, threads, profile)
+                if duration is None:
+                    return index, None, None, stats
+                stats["frames"] = int(round(duration * profile["fps"]))
+                return index, segment_path, None, stats
+            except Exception as e:
+                print(f"ffmpeg backend failed for scene {index+1}, falling back to MoviePy: {e}")
+                stats["backend"] = "moviepy"
+
+        # The scene's readers are closed before the next scene opens its own
+        with ExitStack() as resources:
+            scene_clip = _build_scene_clip(audio_path, video_path, text, index, resources, profile)
+            if scene_clip is None:
+                return index, None, None, stats
+            _write_clip(scene_clip, segment_path, threads=threads, logger=None, profile=profile)
+            stats["frames"] = int(round(scene_clip.duration * profile["fps"]))
+        return index, segment_path, None, stats
+    except Exception as e:
+        return index, None, f"Error processing scene {index+1}: {str(e)}", stats
+    finally:
+        # Spans can only be recorded in the parent, so report the worker's numbers back
+        stats["duration_s"] = time.perf_counter() - started
+        stats["peak_rss_mb"] = metrics.peak_rss_mb()
+        stats["open_fds"] = metrics.open_fds()
+
+def concat_segments(segment_paths, output_path):
+    """
+    Joins segments with identical codec parameters using ffmpeg's concat demuxer
+    and stream copy (no re-encode).
+    
+    Args:
+        segment_paths (list): Ordered list of segment files.
+        output_path (str): Path to save the joined video.
+    """
+    with metrics.span("concat", segments=len(segment_paths)) as concat_span:
+        _concat_segments(segment_paths, output_path)
+        concat_span["bytes"] = os.path.getsize(output_path)
+
+def _concat_segments(segment_paths, output_path):
+    list_path = output_path + ".concat.txt"
+    with open(list_path, "w") as f:
+        for path in segment_paths:
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+    try:
+        cmd = [
+            utils.ffmpeg_binary(required=True), "-y", "-loglevel", "error",
+            "-f", "concat", "-safe", "0", "-i", list_path,
+            "-c", "copy", "-movflags", "+faststart", output_path
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg concat failed: {result.stderr.strip()}")
+    finally:
+        os.remove(list_path)
+
+class HLSPlaylist:
+    """
+    An HLS event playlist that grows as scene segments finish rendering, so a
+    player can start on the first scenes while later ones are still rendering.
+
+    Each segment is remuxed to MPEG-TS with stream copy (no re-encode) and the
+    playlist is rewritten atomically after every append. Segments each start
+    their own timeline, so every one after the first follows a discontinuity
+    tag. finish() marks the playlist complete.
+
+    Args:
+        directory (str): Where the playlist and its segments go; emptied first.
+        target_duration (float): Expected longest segment in seconds. The
+            playlist's target duration must not change while players poll it.
+    """
+
+    def __init__(self, directory, target_duration=None):
+        self.directory = directory
+        self.path = os.path.join(directory, PLAYLIST_FILENAME)
+        self.target_duration = math.ceil(target_duration or 1)
+        self.entries = []
+        self.complete = False
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+
+    def append(self, segment_path):
+        """Publishes the next segment (in playback order)."""
+        name = f"segment_{len(self.entries):04d}.ts"
+        cmd = [
+            utils.ffmpeg_binary(required=True), "-y", "-loglevel", "error", "-i", segment_path,
+            "-c", "copy", "-f", "mpegts", os.path.join(self.directory, name)
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg HLS remux failed: {result.stderr.strip()}")
+        self.entries.append((name, _probe_duration(segment_path)))
+        self._write()
+
+    def finish(self):
+        self.complete = True
+        self._write()
+
+    def _write(self):
+        target = max([self.target_duration] + [math.ceil(duration) for _, duration in self.entries])
+        lines = ["#EXTM3U", "#EXT-X-VERSION:3", "#EXT-X-PLAYLIST-TYPE:EVENT",
+                 f"#EXT-X-TARGETDURATION:{target}", "#EXT-X-MEDIA-SEQUENCE:0"]
+        for i, (name, duration) in enumerate(self.entries):
+            if i:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines += [f"#EXTINF:{duration:.3f},", name]
+        if self.complete:
+            lines.append("#EXT-X-ENDLIST")
+        # Atomic replace, so a polling player never reads a half-written playlist
+        utils.write_atomic(self.path, "\n".join(lines) + "\n")
+
+def create_video(audio_paths, video_paths, text_scripts, output_path, parallel=False, workers=RENDER_WORKERS,
+                 profile=None, backend=None):
     """
     Assembles video clips, audio, and subtitles into a final video.
     
+    Every scene is rendered to its own segment and the segments are joined
+    with a stream-copy concat. Only the scenes being rendered have their
+    footage and narration open, and their readers are closed as soon as the
+    segment is written, so memory and file handles stay flat however long the
+    video is. In parallel mode the scenes are rendered in a process pool, so
+    render time scales with the number of cores.
+    
     Args:
         audio_paths (list): List of paths to audio files.
         video_paths (list): List of paths to video files.
         text_scripts (list): List of narration text strings for subtitles.
         output_path (str): Path to save the final video.
+        parallel (bool): Render scenes in parallel worker processes.
+        workers (int): Number of worker processes (None = CPU count).
+        profile (str or dict): Render profile (see RENDER_PROFILES).
+        backend (str): Render backend (see RENDER_BACKENDS; None = DEFAULT_RENDER_BACKEND).
         
     Returns:
         tuple: (output_path (str) or None, error_message (str) or None)
     """
-    try:
-        clips = []
-        
-        for i, (audio_path, video_path, text) in enumerate(zip(audio_paths, video_paths, text_scripts)):
-            try:
-                # Load Audio
-                if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-                     print(f"Skipping scene {i+1}: Invalid audio file {audio_path}")
-                     continue
-
-                audio_clip = AudioFileClip(audio_path)
-                duration = audio_clip.duration
-                
-                # Load Video
-                if os.path.exists(video_path):
-                    video_clip = VideoFileClip(video_path)
-                    # Resize/Crop to 1920x1080 (Landscape)
-                    # First resize to cover 1920x1080
-                    target_ratio = 16/9
-                    current_ratio = video_clip.w / video_clip.h
-                    
-                    if current_ratio > target_ratio:
-                        # Too wide, resize by height
-                        video_clip = video_clip.resize(height=1080)
-                    else:
-                        # Too tall/square, resize by width
-                        video_clip = video_clip.resize(width=1920)
-                        
-                    # Crop center
-                    video_clip = video_clip.crop(x1=video_clip.w/2 - 960, y1=video_clip.h/2 - 540, 
-                                                 width=1920, height=1080)
-                else:
-                    # Fallback: Solid Color
-                    print(f"Video file missing for scene {i+1}, using fallback.")
-                    video_clip = ColorClip(size=(1920, 1080), color=(0, 0, 0), duration=duration)
-
-                # Loop video if shorter than audio
-                if video_clip.duration < duration:
-                    video_clip = video_clip.loop(duration=duration)
-                else:
-                    video_clip = video_clip.subclip(0, duration)
-                
-                video_clip = video_clip.set_audio(audio_clip)
-                
-                # Create Subtitles
-                # Wrap text to fit screen width (approx 50 chars for 1920px with large font)
-                wrapped_text = textwrap.fill(text, width=50)
-                
-                txt_clip = TextClip(
-                    wrapped_text, 
-                    fontsize=70, 
-                    color='white', 
-                    font='Arial-Bold', 
-                    stroke_color='black', 
-                    stroke_width=3,
-                    method='caption',
-                    size=(1800, None), # Constrain width
-                    align='center'
-                ).set_pos(('center', 'bottom')).set_duration(duration).margin(bottom=50, opacity=0)
-                
-                # Composite Video + Text
-                final_scene_clip = CompositeVideoClip([video_clip, txt_clip])
-                clips.append(final_scene_clip)
-                
-            except Exception as e:
-                return None, f"Error processing scene {i+1}: {str(e)}"
-        
-        # Concatenate all clips
-        if not clips:
-            return None, "No valid scenes to assemble. All scenes were skipped or failed."
+    return _create_video_segmented(
+        audio_paths, video_paths, text_scripts, output_path, workers if parallel else 1, profile, backend
+    )
 
-        final_video = concatenate_videoclips(clips, method="compose")
-        final_video.write_videofile(output_path, fps=24, codec="libx264", audio_codec="aac")
+def render_scene_segments(scenes, workers=None, on_segment_done=None, profile=None, backend=None):
+    """
+    Renders scenes to individual segment files that can later be joined with
+    concat_segments.
+    
+    Args:
+        scenes (list): (index, audio_path, video_path, text, segment_path) tuples.
+        workers (int): Worker processes (None = CPU count, 1 = render in-process).
+        on_segment_done (callable): Optional callback(index, segment_path or None),
+            called in this process as each scene finishes.
+        profile (str or dict): Render profile (see RENDER_PROFILES); every
+            segment that is concatenated together must use the same one.
+        backend (str): Render backend (see RENDER_BACKENDS; None = DEFAULT_RENDER_BACKEND).
         
+    Returns:
+        tuple: ({index: segment_path or None if skipped}, error_message or None)
+    """
+    workers = workers or os.cpu_count() or 1
+    profile = get_render_profile(profile)
+    backend = backend or DEFAULT_RENDER_BACKEND
+    if backend not in RENDER_BACKENDS:
+        raise ValueError(f"Unknown render backend: {backend!r} (expected one of {', '.join(RENDER_BACKENDS)})")
+    # Split encoder threads between concurrently running segments
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    tasks = [scene + (threads, profile, backend) for scene in scenes]
+    segments = {}
+
+    if workers == 1:
+        results = map(_render_scene_segment, tasks)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        results = executor.map(_render_scene_segment, tasks)
+
+    try:
+        for index, segment_path, error, stats in results:
+            duration_s = stats.pop("duration_s")
+            metrics.record(
+                "render", duration_s, scene=index + 1, error=bool(error), preset=profile["preset"],
+                bytes=os.path.getsize(segment_path) if segment_path else 0,
+                fps=round(stats["frames"] / duration_s, 2) if duration_s else None, **stats
+            )
+            if error:
+                return segments, error
+            segments[index] = segment_path
+            if on_segment_done:
+                on_segment_done(index, segment_path)
+        return segments, None
+    finally:
+        if executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def _create_video_segmented(audio_paths, video_paths, text_scripts, output_path, workers=None, profile=None,
+                            backend=None):
+    try:
+        output_dir = os.path.dirname(os.path.abspath(output_path))
+
+        with tempfile.TemporaryDirectory(dir=output_dir, prefix=".segments-") as segment_dir:
+            scenes = [
+                (i, audio_path, video_path, text, os.path.join(segment_dir, f"scene_{i+1:04d}.mp4"))
+                for i, (audio_path, video_path, text) in enumerate(zip(audio_paths, video_paths, text_scripts))
+            ]
+            segments, error = render_scene_segments(scenes, workers, profile=profile, backend=backend)
+            if error:
+                return None, error
+
+            segment_paths = [segments[i] for i in sorted(segments) if segments[i]]
+            if not segment_paths:
+                return None, "No valid scenes to assemble. All scenes were skipped or failed."
+
+            concat_segments(segment_paths, output_path)
+
         return output_path, None
 
     except Exception as e: